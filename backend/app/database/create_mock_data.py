@@ -2,7 +2,7 @@
 """Simple script to create mock student data and seed the database"""
 
 import random
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import sys
 from pathlib import Path
 
@@ -11,6 +11,7 @@ backend_path = str(Path(__file__).parent.parent.parent)
 sys.path.insert(0, backend_path)
 
 from app.database.db import SessionLocal, test_connection
+from app.database.crud import rebuild_rollups
 from app.models import Student
 
 
@@ -62,9 +63,9 @@ def create_mock_students(count=50):
 
             # Random prediction date within last 3 months
             days_ago = random.randint(1, 90)
-            student_data["last_prediction_date"] = datetime.now() - timedelta(
-                days=days_ago
-            )
+            student_data["last_prediction_date"] = datetime.now(
+                timezone.utc
+            ) - timedelta(days=days_ago)
 
         students.append(student_data)
 
@@ -100,6 +101,9 @@ def seed_database(students_data, clear_existing=False):
 
         db.commit()
 
+        # Mock rows bypass the API write paths, so recompute the dashboard rollups
+        rebuild_rollups(db)
+
         # Verify insertion
         total_count = db.query(Student).count()
         print(f" Successfully seeded {len(students_data)} students!")
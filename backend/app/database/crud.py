@@ -0,0 +1,563 @@
+"""
+Database read/write helpers shared by the API endpoints and batch jobs.
+
+These are plain synchronous functions taking a Session; async endpoints run
+them through db.run_in_db_pool so they never block the event loop.
+"""
+
+import json
+import base64
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Float,
+    String,
+    cast,
+    column,
+    func,
+    insert,
+    text,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.orm import Query, Session
+
+from ..models import BatchUpload, PredictionLog, RiskRollup, Student
+
+logger = logging.getLogger(__name__)
+
+AT_RISK_CATEGORIES = ["medium", "high"]
+RISK_CATEGORIES = ["high", "medium", "low"]
+
+# Rollup key for students stored without a risk category
+UNSCORED_CATEGORY = "unscored"
+
+TREND_BUCKETS = ("day", "week")
+
+# Accepted values for the `count` option of list endpoints
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+def encode_cursor(created_at: datetime, student_id) -> str:
+    """Opaque cursor pointing just past the given row"""
+    payload = json.dumps([created_at.isoformat(), str(student_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, student_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(student_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _estimate_count(db: Session, query: Query) -> Optional[int]:
+    """
+    Planner row estimate for the query (PostgreSQL only). Returns None when
+    no estimate is available so the caller can fall back to an exact count.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        statement = query.statement.compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"Row estimate failed, using exact count: {e}")
+        return None
+
+
+def list_students(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    at_risk_only: bool = False,
+    cursor: Optional[str] = None,
+    count: str = "exact",
+) -> dict:
+    """
+    Page of students, newest first.
+
+    Pages are keyed on (created_at, id): pass the previous page's next_cursor
+    as `cursor` to continue, which costs the same at any depth. `skip` still
+    works for offset paging and is ignored when a cursor is given. `count`
+    selects how `total` is computed: "exact", "estimate" (planner estimate on
+    PostgreSQL, exact elsewhere) or "none" (total is null).
+    """
+    if count not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+
+    query = db.query(Student)
+    if at_risk_only:
+        query = query.filter(Student.risk_category.in_(AT_RISK_CATEGORIES))
+
+    page = query
+    if cursor:
+        created_at, student_id = decode_cursor(cursor)
+        # Row-value comparison, so the planner can seek the (created_at, id) index
+        page = page.filter(
+            tuple_(Student.created_at, Student.id) < tuple_(created_at, student_id)
+        )
+        skip = 0
+
+    # One extra row tells us whether another page follows
+    rows = (
+        page.order_by(Student.created_at.desc(), Student.id.desc())
+        .offset(skip)
+        .limit(limit + 1)
+        .all()
+    )
+    students = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and students and students[-1].created_at is not None:
+        next_cursor = encode_cursor(students[-1].created_at, students[-1].id)
+
+    total = None
+    if count == "estimate":
+        total = _estimate_count(db, query)
+    if count == "exact" or (count == "estimate" and total is None):
+        total = query.count()
+
+    return {
+        "students": [student.to_dict() for student in students],
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "next_cursor": next_cursor,
+    }
+
+
+def student_row(
+    student_data, prediction: dict, student_id: Optional[UUID] = None
+) -> dict:
+    """
+    Column values for a new Student from a validated StudentCreate and its
+    prediction, mapped exactly as /students/create-with-prediction does.
+    """
+    return {
+        "id": student_id or uuid4(),
+        "age_at_enrollment": student_data.age_at_enrollment,
+        "gender": "male" if student_data.gender == 1 else "female",
+        "total_units_approved": student_data.total_units_approved,
+        "average_grade": student_data.average_grade,
+        "total_units_evaluated": student_data.total_units_evaluated,
+        "total_units_enrolled": student_data.total_units_enrolled,
+        "previous_qualification_grade": student_data.previous_qualification_grade,
+        "tuition_fees_up_to_date": not bool(student_data.tuition_fees_up_to_date),
+        "scholarship_holder": not bool(student_data.scholarship_holder),
+        "debtor": bool(student_data.debtor),
+        "uploaded_by": student_data.uploaded_by,
+        "created_at": datetime.now(timezone.utc),
+        "risk_score": prediction["probability"]["dropout"],
+        "risk_category": prediction["risk_category"],
+        "last_prediction_date": datetime.now(timezone.utc),
+    }
+
+
+def prediction_log_row(student_id: UUID, prediction: dict, created_by: str) -> dict:
+    """
+    Column values for the PredictionLog recorded alongside a new student,
+    tagged with the registry version that produced the prediction
+    """
+    return {
+        "id": uuid4(),
+        "student_id": student_id,
+        "risk_score": prediction["probability"]["dropout"],
+        "risk_category": prediction["risk_category"],
+        "model_version": prediction["model_version"],
+        "created_by": created_by,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def insert_students_with_logs(
+    db: Session, student_rows: List[dict], log_rows: List[dict]
+):
+    """
+    Bulk-insert students and their prediction logs with multi-row INSERTs,
+    and fold them into the dashboard rollups in the same transaction.
+    Ids are generated client-side, so nothing is read back; the caller
+    owns the transaction.
+    """
+    if student_rows:
+        db.execute(insert(Student), student_rows)
+    if log_rows:
+        db.execute(insert(PredictionLog), log_rows)
+    apply_rollup_deltas(db, rollup_deltas(student_rows, log_rows))
+
+
+def student_model_input(student) -> dict:
+    """
+    Prediction input a stored student was scored from: the inverse of
+    student_row's encoding (gender strings, flipped tuition/scholarship flags).
+    """
+    return {
+        "total_units_approved": student.total_units_approved,
+        "average_grade": student.average_grade,
+        "age_at_enrollment": student.age_at_enrollment,
+        "total_units_evaluated": student.total_units_evaluated,
+        "total_units_enrolled": student.total_units_enrolled,
+        "previous_qualification_grade": student.previous_qualification_grade,
+        "tuition_fees_up_to_date": 0 if student.tuition_fees_up_to_date else 1,
+        "scholarship_holder": 0 if student.scholarship_holder else 1,
+        "debtor": 1 if student.debtor else 0,
+        "gender": 1 if student.gender == "male" else 0,
+    }
+
+
+def update_student_scores(
+    db: Session,
+    score_rows: List[dict],
+    log_rows: List[dict],
+    category_changes: List[Tuple[Optional[datetime], Optional[str], str]],
+):
+    """
+    Store new scores for existing students: one bulk UPDATE, one multi-row
+    INSERT of prediction logs and one rollup upsert. score_rows hold id,
+    risk_score, risk_category and last_prediction_date. The caller owns the
+    transaction.
+    """
+    if score_rows:
+        if db.get_bind().dialect.name == "postgresql":
+            # UPDATE ... FROM (VALUES ...): one statement for the whole chunk
+            scores = values(
+                column("id", Student.id.type),
+                column("risk_score", Float()),
+                column("risk_category", String()),
+                column("last_prediction_date", DateTime(timezone=True)),
+                name="scores",
+            ).data(
+                [
+                    (
+                        row["id"],
+                        row["risk_score"],
+                        row["risk_category"],
+                        row["last_prediction_date"],
+                    )
+                    for row in score_rows
+                ]
+            )
+            db.execute(
+                update(Student)
+                .where(Student.id == scores.c.id)
+                .values(
+                    risk_score=scores.c.risk_score,
+                    risk_category=scores.c.risk_category,
+                    last_prediction_date=scores.c.last_prediction_date,
+                )
+            )
+        else:
+            # ORM bulk UPDATE by primary key (executemany)
+            db.execute(update(Student), score_rows)
+    if log_rows:
+        db.execute(insert(PredictionLog), log_rows)
+    apply_rollup_deltas(
+        db, rollup_deltas(log_rows=log_rows, category_changes=category_changes)
+    )
+
+
+def create_batch_upload(db: Session, filename: str, uploaded_by: str) -> dict:
+    """Register a new upload in the processing state"""
+    batch = BatchUpload(filename=filename, uploaded_by=uploaded_by)
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+    return batch.to_dict()
+
+
+def get_batch_upload(db: Session, batch_id: UUID) -> Optional[dict]:
+    batch = db.get(BatchUpload, batch_id)
+    return batch.to_dict() if batch is not None else None
+
+
+RollupKey = Tuple[date, str]
+
+
+def _bucket_date(timestamp: Optional[datetime]) -> date:
+    """UTC day a row is counted under"""
+    if timestamp is None:
+        return datetime.now(timezone.utc).date()
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+
+def _as_date(value) -> date:
+    # SQLite hands dates back as ISO strings
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def rollup_deltas(
+    student_rows: Iterable[dict] = (),
+    log_rows: Iterable[dict] = (),
+    category_changes: Iterable[Tuple[Optional[datetime], Optional[str], str]] = (),
+) -> Dict[RollupKey, List[float]]:
+    """
+    Rollup increments for newly written rows:
+    (day, category) -> [students, predictions, risk score sum].
+    category_changes are (created_at, old, new) for re-scored students, which
+    move between categories within their creation day.
+    """
+    deltas: Dict[RollupKey, List[float]] = {}
+    for created_at, old, new in category_changes:
+        old = old or UNSCORED_CATEGORY
+        if old == new:
+            continue
+        day = _bucket_date(created_at)
+        deltas.setdefault((day, old), [0, 0, 0.0])[0] -= 1
+        deltas.setdefault((day, new), [0, 0, 0.0])[0] += 1
+    for row in student_rows:
+        key = (
+            _bucket_date(row.get("created_at")),
+            row.get("risk_category") or UNSCORED_CATEGORY,
+        )
+        deltas.setdefault(key, [0, 0, 0.0])[0] += 1
+    for row in log_rows:
+        key = (_bucket_date(row.get("created_at")), row["risk_category"])
+        delta = deltas.setdefault(key, [0, 0, 0.0])
+        delta[1] += 1
+        delta[2] += row["risk_score"]
+    return deltas
+
+
+def _rollup_insert(db: Session):
+    """INSERT ... ON CONFLICT for the current dialect, or None if unsupported"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(RiskRollup)
+
+
+def apply_rollup_deltas(db: Session, deltas: Dict[RollupKey, List[float]]):
+    """
+    Add deltas to the rollup rows with a single upsert. Keys are written in
+    sorted order so concurrent transactions lock rows in the same order.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    rows = [
+        {
+            "bucket_date": bucket_date,
+            "risk_category": category,
+            "student_count": int(students),
+            "prediction_count": int(predictions),
+            "risk_score_sum": float(score_sum),
+        }
+        for (bucket_date, category), (students, predictions, score_sum) in sorted(
+            deltas.items()
+        )
+    ]
+
+    statement = _rollup_insert(db)
+    if statement is None:
+        # Portable fallback: update, then insert the rows that did not exist
+        for row in rows:
+            updated = db.execute(
+                update(RiskRollup)
+                .where(
+                    RiskRollup.bucket_date == row["bucket_date"],
+                    RiskRollup.risk_category == row["risk_category"],
+                )
+                .values(
+                    student_count=RiskRollup.student_count + row["student_count"],
+                    prediction_count=RiskRollup.prediction_count
+                    + row["prediction_count"],
+                    risk_score_sum=RiskRollup.risk_score_sum + row["risk_score_sum"],
+                )
+            )
+            if updated.rowcount == 0:
+                db.execute(insert(RiskRollup), [row])
+        return
+
+    statement = statement.values(rows)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[RiskRollup.bucket_date, RiskRollup.risk_category],
+            set_={
+                "student_count": RiskRollup.student_count
+                + statement.excluded.student_count,
+                "prediction_count": RiskRollup.prediction_count
+                + statement.excluded.prediction_count,
+                "risk_score_sum": RiskRollup.risk_score_sum
+                + statement.excluded.risk_score_sum,
+            },
+        )
+    )
+
+
+def _day_expression(db: Session, column):
+    """SQL expression for the UTC day of a timestamp column"""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    return func.date(column)
+
+
+def _week_expression(db: Session, column):
+    """SQL expression for the Monday starting the week of a date column"""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc("week", column), Date)
+    return func.date(column, "-6 days", "weekday 1")
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recompute the rollup table from students and prediction_logs with two
+    GROUP BY queries. Used after writes that bypass the normal write paths
+    (seeding, manual SQL). Returns the number of rollup rows written.
+    """
+    deltas: Dict[RollupKey, List[float]] = {}
+
+    student_day = _day_expression(db, Student.created_at)
+    for day, category, students in (
+        db.query(student_day, Student.risk_category, func.count(Student.id))
+        .group_by(student_day, Student.risk_category)
+        .all()
+    ):
+        key = (_as_date(day), category or UNSCORED_CATEGORY)
+        deltas.setdefault(key, [0, 0, 0.0])[0] += students
+
+    log_day = _day_expression(db, PredictionLog.created_at)
+    for day, category, predictions, score_sum in (
+        db.query(
+            log_day,
+            PredictionLog.risk_category,
+            func.count(PredictionLog.id),
+            func.sum(PredictionLog.risk_score),
+        )
+        .group_by(log_day, PredictionLog.risk_category)
+        .all()
+    ):
+        delta = deltas.setdefault((_as_date(day), category), [0, 0, 0.0])
+        delta[1] += predictions
+        delta[2] += score_sum or 0.0
+
+    db.query(RiskRollup).delete(synchronize_session=False)
+    apply_rollup_deltas(db, deltas)
+    db.commit()
+    return len(deltas)
+
+
+def backfill_rollups(db: Session) -> Optional[int]:
+    """
+    Build the rollups for a database that has students but no rollup rows,
+    e.g. one created before the rollup table existed. Returns the number of
+    rollup rows written, or None when nothing needed backfilling.
+    """
+    if db.query(RiskRollup.bucket_date).first() is not None:
+        return None
+    if db.query(Student.id).first() is None:
+        return None
+    return rebuild_rollups(db)
+
+
+def get_risk_distribution(db: Session) -> dict:
+    """Current number of students per risk category, from the rollups"""
+    counts = dict(
+        db.query(RiskRollup.risk_category, func.sum(RiskRollup.student_count))
+        .group_by(RiskRollup.risk_category)
+        .all()
+    )
+    total = int(sum(counts.values()))
+    categories = RISK_CATEGORIES + sorted(set(counts) - set(RISK_CATEGORIES))
+    return {
+        "distribution": [
+            {
+                "risk_category": category,
+                "count": int(counts.get(category, 0)),
+                "percentage": (
+                    round(100.0 * counts.get(category, 0) / total, 2) if total else 0.0
+                ),
+            }
+            for category in categories
+        ],
+        "total": total,
+    }
+
+
+def get_risk_trends(
+    db: Session,
+    bucket: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> dict:
+    """
+    New students per risk category and prediction volume per day or week,
+    from the rollups. start/end are inclusive UTC dates.
+    """
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(TREND_BUCKETS)}")
+
+    period = (
+        RiskRollup.bucket_date
+        if bucket == "day"
+        else _week_expression(db, RiskRollup.bucket_date)
+    )
+    query = db.query(
+        period.label("period"),
+        RiskRollup.risk_category,
+        func.sum(RiskRollup.student_count),
+        func.sum(RiskRollup.prediction_count),
+        func.sum(RiskRollup.risk_score_sum),
+    )
+    if start is not None:
+        query = query.filter(RiskRollup.bucket_date >= start)
+    if end is not None:
+        query = query.filter(RiskRollup.bucket_date <= end)
+
+    periods: Dict[date, dict] = {}
+    for period_start, category, students, predictions, score_sum in (
+        query.group_by(period, RiskRollup.risk_category).order_by(period).all()
+    ):
+        entry = periods.setdefault(
+            _as_date(period_start),
+            {
+                "students": {category: 0 for category in RISK_CATEGORIES},
+                "predictions": 0,
+                "risk_score_sum": 0.0,
+            },
+        )
+        entry["students"][category] = int(students or 0)
+        entry["predictions"] += int(predictions or 0)
+        entry["risk_score_sum"] += float(score_sum or 0.0)
+
+    trends = []
+    for period_start in sorted(periods):
+        entry = periods[period_start]
+        predictions = entry["predictions"]
+        trends.append(
+            {
+                "bucket": period_start.isoformat(),
+                "students": entry["students"],
+                "total_students": sum(entry["students"].values()),
+                "predictions": predictions,
+                "average_risk_score": (
+                    round(entry["risk_score_sum"] / predictions, 4)
+                    if predictions
+                    else None
+                ),
+            }
+        )
+    return {"bucket": bucket, "trends": trends}
@@ -1,11 +1,15 @@
-from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy import create_engine, event, MetaData, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import os
-from typing import Generator
+from typing import Callable, Generator, Optional, TypeVar
 import logging
+import time
+import anyio
 from dotenv import load_dotenv
 
+from ..metrics import counter, histogram, metric_family, register_collector
+
 # Load environment variables
 load_dotenv()
 
@@ -15,22 +19,83 @@ logger = logging.getLogger(__name__)
 DATABASE_URL = os.getenv("DATABASE_URL")
 DB_SSLMODE = os.getenv("DB_SSLMODE", "prefer")
 
-logger.info("Using PostgreSQL database")
+# Connection pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+# Worker threads for database calls made from async endpoints. Defaults to
+# the pool capacity so threads never queue on an exhausted pool.
+DB_THREADPOOL_SIZE = int(
+    os.getenv("DB_THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW))
+)
+
+if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
+    # Local SQLite (benchmarks, development): no PostgreSQL connect options
+    logger.info("Using SQLite database")
+    connect_args = {"check_same_thread": False}
+else:
+    logger.info("Using PostgreSQL database")
+    connect_args = {
+        "connect_timeout": 5,
+        "sslmode": DB_SSLMODE,
+    }
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=5,
-    max_overflow=10,
-    connect_args={
-        "connect_timeout": 5,
-        "sslmode": DB_SSLMODE,
-    },
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    connect_args=connect_args,
     echo=False,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+DB_QUERY_SECONDS = histogram(
+    "ews_db_query_duration_seconds",
+    "Database statement execution time by SQL verb",
+    ("operation",),
+)
+DB_QUERY_ERRORS = counter(
+    "ews_db_query_errors_total", "Database statements that raised", ("operation",)
+)
+DB_CALL_SECONDS = histogram(
+    "ews_db_call_duration_seconds",
+    "Blocking database calls from async endpoints, including the wait for a thread",
+    ("call",),
+)
+
+
+def _operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, _operation(statement))
+
+
+@event.listens_for(engine, "handle_error")
+def _count_query_error(context):
+    started = (
+        context.connection.info.get("query_started") if context.connection else None
+    )
+    if started:
+        started.pop()
+    DB_QUERY_ERRORS.inc(_operation(context.statement or ""))
+
+
 Base = declarative_base()
 
 metadata = MetaData()
@@ -52,6 +117,62 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+T = TypeVar("T")
+
+_db_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_db_limiter() -> anyio.CapacityLimiter:
+    """Lazily create the limiter (needs a running event loop)"""
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(DB_THREADPOOL_SIZE)
+    return _db_limiter
+
+
+async def run_in_db_pool(func: Callable[..., T], *args) -> T:
+    """
+    Run a blocking database call from an async endpoint on a worker thread,
+    so slow queries never stall the event loop. At most DB_THREADPOOL_SIZE
+    calls run at once; the rest wait without blocking the loop.
+    """
+    started = time.perf_counter()
+    try:
+        return await anyio.to_thread.run_sync(func, *args, limiter=_get_db_limiter())
+    finally:
+        DB_CALL_SECONDS.observe(
+            time.perf_counter() - started, getattr(func, "__name__", "call")
+        )
+
+
+def get_pool_status() -> dict:
+    """Current connection pool usage"""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
+def _pool_metrics():
+    status = get_pool_status()
+    return metric_family(
+        "ews_db_pool_connections",
+        "gauge",
+        "Connection pool usage by state",
+        [
+            ({"state": state}, status[state])
+            for state in ("size", "checkedin", "checkedout", "overflow")
+            if state in status
+        ],
+    )
+
+
+register_collector(_pool_metrics)
+
+
 def create_tables():
     """
     Create all tables in the database.
@@ -59,12 +180,44 @@ def create_tables():
     """
     try:
         Base.metadata.create_all(bind=engine)
+        create_missing_indexes()
+        backfill_dashboard_rollups()
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         raise
 
 
+def create_missing_indexes():
+    """
+    Create indexes declared on the models but missing from existing tables.
+    create_all only adds indexes together with a new table, so indexes added
+    to a model later would otherwise never reach an existing database.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def backfill_dashboard_rollups():
+    """
+    Fill an empty risk_rollups table from existing students, so dashboards
+    on an upgraded database do not read zeros until rebuild-stats is run.
+    """
+    from .crud import backfill_rollups
+
+    db = SessionLocal()
+    try:
+        rows = backfill_rollups(db)
+        if rows is not None:
+            logger.info(f"Backfilled dashboard rollups ({rows} rows)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def drop_tables():
     """
     Drop all tables in the database.
@@ -105,6 +258,7 @@ def get_db_health():
                 "status": "healthy",
                 "database": "connected",
                 "engine": str(engine.url).split("@")[0] + "@***",
+                "pool": get_pool_status(),
             }
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
@@ -115,13 +269,27 @@ def get_db_health():
 def _import_models():
     """Import all models to register them with Base.metadata"""
     try:
-        from ..models import Student, PredictionLog, BatchUpload
+        from ..models import (
+            Student,
+            PredictionLog,
+            BatchUpload,
+            ExplanationCacheEntry,
+            RiskRollup,
+            BackgroundJob,
+        )
 
         logger.info("Models imported successfully (relative import)")
     except ImportError:
         # If running from db_manager.py, use absolute import
         try:
-            from app.models import Student, PredictionLog, BatchUpload
+            from app.models import (
+                Student,
+                PredictionLog,
+                BatchUpload,
+                ExplanationCacheEntry,
+                RiskRollup,
+                BackgroundJob,
+            )
 
             logger.info("Models imported successfully (absolute import)")
         except ImportError as e:
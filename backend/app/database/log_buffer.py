@@ -0,0 +1,186 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import List, Optional
+
+from .db import SessionLocal
+from .crud import insert_students_with_logs
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_LOG_WRITE_BEHIND: bool = (
+    os.getenv("PREDICTION_LOG_WRITE_BEHIND", "false").lower() == "true"
+)
+PREDICTION_LOG_FLUSH_SIZE: int = int(os.getenv("PREDICTION_LOG_FLUSH_SIZE", "500"))
+PREDICTION_LOG_FLUSH_INTERVAL_MS: float = float(
+    os.getenv("PREDICTION_LOG_FLUSH_INTERVAL_MS", "1000")
+)
+PREDICTION_LOG_BUFFER_MAX: int = int(os.getenv("PREDICTION_LOG_BUFFER_MAX", "50000"))
+
+
+class PredictionLogBuffer:
+    """
+    Write-behind buffer for PredictionLog rows.
+
+    Request handlers add() fully built rows and return; a flusher thread
+    writes them with one multi-row INSERT once flush_size rows are pending or
+    flush_interval_ms has passed. Rows from a failed flush stay pending and
+    are retried on the next one. add() returns False when max_pending rows
+    are already waiting so the caller can write the row itself instead.
+    close() stops the thread and flushes whatever is left.
+    """
+
+    def __init__(
+        self,
+        flush_size: int = 500,
+        flush_interval_ms: float = 1000.0,
+        max_pending: int = 50000,
+    ):
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.01, flush_interval_ms / 1000.0)
+        self.max_pending = max(self.flush_size, max_pending)
+        self._pending: List[dict] = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._last_flush_failed = False
+        self._worker: Optional[threading.Thread] = None
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.rejected = 0
+
+    def _ensure_worker(self):
+        """Start the flusher thread on first use"""
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name="prediction-log-flusher", daemon=True
+            )
+            self._worker.start()
+
+    def add(self, row: dict) -> bool:
+        """Queue one PredictionLog row; False if the buffer is full or closed."""
+        with self._condition:
+            if self._closed or len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._ensure_worker()
+            self._pending.append(row)
+            if len(self._pending) >= self.flush_size:
+                self._condition.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._pending) < self.flush_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+            if self._last_flush_failed:
+                # Back off instead of hammering an unavailable database
+                with self._condition:
+                    if not self._closed:
+                        self._condition.wait(self.flush_interval)
+
+    def flush(self) -> int:
+        """Write all pending rows now; returns the number written."""
+        with self._flush_lock:
+            with self._condition:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+
+            db = SessionLocal()
+            try:
+                insert_students_with_logs(db, [], rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._last_flush_failed = True
+                self.flush_errors += 1
+                logger.error(f"Failed to write {len(rows)} prediction logs: {e}")
+                with self._condition:
+                    # Keep them for the next attempt, ahead of newer rows
+                    self._pending[:0] = rows
+                return 0
+            finally:
+                db.close()
+
+            self._last_flush_failed = False
+            self.rows_written += len(rows)
+            self.flushes += 1
+            return len(rows)
+
+    def close(self):
+        """Stop the flusher and write the remaining rows (retrying once)."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=self.flush_interval + 5.0)
+
+        self.flush()
+        if self.pending():
+            self.flush()
+        if self.pending():
+            logger.error(
+                f"{self.pending()} prediction logs could not be written at shutdown"
+            )
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": PREDICTION_LOG_WRITE_BEHIND,
+            "pending": self.pending(),
+            "flush_size": self.flush_size,
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "rejected": self.rejected,
+        }
+
+
+_buffer: Optional[PredictionLogBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_prediction_log_buffer() -> Optional[PredictionLogBuffer]:
+    """
+    The process-wide write-behind buffer, or None when write-behind is off
+    and prediction logs should be written in the request's own transaction.
+    """
+    global _buffer
+    if not PREDICTION_LOG_WRITE_BEHIND:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = PredictionLogBuffer(
+                    flush_size=PREDICTION_LOG_FLUSH_SIZE,
+                    flush_interval_ms=PREDICTION_LOG_FLUSH_INTERVAL_MS,
+                    max_pending=PREDICTION_LOG_BUFFER_MAX,
+                )
+                # Also flush on interpreter exit outside of the app lifecycle
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def close_prediction_log_buffer():
+    """Flush and stop the buffer (called on application shutdown)"""
+    if _buffer is not None:
+        _buffer.close()
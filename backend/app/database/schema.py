@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from uuid import UUID, uuid4
-from typing import List, Union
+from typing import Any, Dict, List, Optional, Union
 
 
 class Student(BaseModel):
@@ -309,3 +309,75 @@ class BatchCreate(BaseModel):
     students: List[StudentCreate] = Field(
         ..., min_items=1, description="List of students to create"
     )
+
+
+class BatchCreateRequest(BaseModel):
+    """Request body for POST /students/batch
+
+    Rows are validated against BatchCreate by the endpoint so that failures
+    can be reported per row instead of rejecting the whole request.
+    """
+
+    students: List[Dict[str, Any]] = Field(
+        ..., min_items=1, description="Student records (StudentCreate fields)"
+    )
+    allow_partial: bool = Field(
+        False,
+        description="Create the valid rows even when some rows fail validation",
+    )
+
+
+class SweepAxis(BaseModel):
+    """One swept feature: explicit values, or a start/stop/step grid"""
+
+    feature: str = Field(
+        ...,
+        description="PredicitonInput field to vary",
+        example="average_grade"
+    )
+    values: Optional[List[float]] = Field(
+        None, description="Grid values (overrides start/stop/step)"
+    )
+    start: Optional[float] = Field(
+        None, description="First grid value (default: the feature minimum)", example=0
+    )
+    stop: Optional[float] = Field(
+        None, description="Last grid value (default: the feature maximum)", example=100
+    )
+    step: Optional[float] = Field(
+        None, gt=0, description="Grid spacing (default: 1/20 of the range)", example=5
+    )
+
+
+class SweepRequest(BaseModel):
+    """Request body for POST /simulate/sweep"""
+
+    base: PredicitonInput = Field(..., description="Student the sweep starts from")
+    axes: List[SweepAxis] = Field(
+        ...,
+        min_items=1,
+        max_items=2,
+        description="One axis for a risk curve, two for a heatmap"
+    )
+    explain: bool = Field(
+        False, description="Also return the SHAP explanation of the base student"
+    )
+
+
+class CounterfactualRequest(BaseModel):
+    """Request body for POST /counterfactuals"""
+
+    base: PredicitonInput = Field(..., description="Student to find changes for")
+    target: str = Field(
+        "low",
+        description="Category to reach: 'low' (below 0.50) or 'medium' (below 0.75)",
+        example="low"
+    )
+    max_results: int = Field(
+        3, ge=1, le=10, description="Alternative change sets to return"
+    )
+    budget_ms: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Search time budget (default COUNTERFACTUAL_BUDGET_MS)"
+    )
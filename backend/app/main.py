@@ -1,18 +1,95 @@
-from fastapi import FastAPI, Depends, UploadFile, File
+from fastapi import (
+    FastAPI,
+    Depends,
+    UploadFile,
+    File,
+    Form,
+    BackgroundTasks,
+    Header,
+    HTTPException,
+    Query,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 import uvicorn
+import asyncio
+import json
 import logging
-import numpy as np
 import os
+import secrets
+import tempfile
+from uuid import UUID
 from dotenv import load_dotenv
 
-from .scripts.prediction import predict
-from .scripts.explainability import predict_with_explanation
-from .database.db import get_db, create_tables, test_connection, get_db_health
-from .models import Student, PredictionLog
-from .database.schema import PredicitonInput, StudentCreate, StudentWithPrediction
-from datetime import datetime
+from .scripts.prediction import predict_batch
+from .scripts.model_registry import get_registry
+from .scripts.explainability import (
+    predict_with_explanation,
+    predict_with_explanation_batch,
+    get_explanation_cache_stats,
+    predict_with_pending_explanation,
+)
+from .scripts.explanation_jobs import (
+    get_job_manager,
+    shutdown_job_manager,
+    ExplanationQueueFull,
+)
+from .scripts.batching import (
+    BATCHING_ENABLED,
+    enqueue_prediction,
+    predict_coalesced,
+    predict_uncached,
+    get_batching_stats,
+)
+from .scripts.prediction_cache import cached_prediction, get_prediction_cache_stats
+from .scripts.inference_executor import (
+    InferenceRejected,
+    run_inference,
+    run_enqueued,
+    get_inference_executor_stats,
+    shutdown_inference_executor,
+)
+from .scripts.simulation import sweep
+from .scripts.counterfactuals import find_counterfactuals
+from .scripts.ingestion import process_upload, SUPPORTED_EXTENSIONS
+from .scripts.rescoring import start_rescore_job, get_rescore_status
+from .scripts.warmup import start_warmup, get_warmup_state
+from .serve import serving_workers, worker_memory_report
+from .metrics import CONTENT_TYPE, METRICS_ENABLED, TimedRoute, render_metrics
+from .database.db import (
+    get_db,
+    create_tables,
+    test_connection,
+    get_db_health,
+    run_in_db_pool,
+)
+from .database.log_buffer import (
+    get_prediction_log_buffer,
+    close_prediction_log_buffer,
+)
+from .database.crud import (
+    list_students,
+    create_batch_upload,
+    get_batch_upload,
+    student_row,
+    prediction_log_row,
+    insert_students_with_logs,
+    get_risk_distribution,
+    get_risk_trends,
+)
+from .database.schema import (
+    PredicitonInput,
+    StudentCreate,
+    StudentWithPrediction,
+    BatchCreate,
+    BatchCreateRequest,
+    SweepRequest,
+    CounterfactualRequest,
+)
+from pydantic import ValidationError
+from datetime import date
+from typing import Dict, List, Optional
 
 load_dotenv()
 
@@ -27,6 +104,9 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# Count and time every route (see metrics.py); set before routes are added
+app.router.route_class = TimedRoute
+
 cors_origins_env = os.getenv("CORS_ORIGINS", "")
 if cors_origins_env:
     allowed_origins = [origin.strip() for origin in cors_origins_env.split(",")]
@@ -79,11 +159,17 @@ async def startup_event():
     else:
         logger.error("Database connection failed - application may not work properly")
 
+    if start_warmup():
+        logger.info("Model warm-up started; /ready reports ready when it finishes")
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on application shutdown"""
     logger.info("Shutting down EWS API application...")
+    shutdown_job_manager()
+    shutdown_inference_executor()
+    close_prediction_log_buffer()
 
 
 @app.get("/")
@@ -97,20 +183,24 @@ async def root():
 
 
 @app.get("/students")
-async def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get students from the database with pagination, ordered by newest first"""
+async def get_students(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    db: Session = Depends(get_db),
+):
+    """
+    Get students from the database, ordered by newest first.
+    Pass next_cursor from the previous page as `cursor` to page through;
+    count=estimate|none avoids counting the whole table on every page.
+    """
     try:
-        students = db.query(Student).order_by(Student.created_at.desc()).offset(skip).limit(limit).all()
-        total_count = db.query(Student).count()
-
-        students_data = [student.to_dict() for student in students]
-
-        return {
-            "students": students_data,
-            "total": total_count,
-            "skip": skip,
-            "limit": limit,
-        }
+        return await run_in_db_pool(
+            list_students, db, skip, limit, False, cursor, count
+        )
+    except ValueError as e:
+        return {"error": "Invalid pagination parameters", "details": str(e)}
     except Exception as e:
         logger.error(f"Error getting students: {e}")
         return {"error": "Failed to get students", "details": str(e)}
@@ -118,44 +208,101 @@ async def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(ge
 
 @app.get("/students/at-risk")
 async def get_at_risk_students(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    db: Session = Depends(get_db),
 ):
     """Get students with Medium or High risk categories, ordered by newest first"""
     try:
-        students = (
-            db.query(Student)
-            .filter(Student.risk_category.in_(["medium", "high"]))
-            .order_by(Student.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        return await run_in_db_pool(list_students, db, skip, limit, True, cursor, count)
+    except ValueError as e:
+        return {"error": "Invalid pagination parameters", "details": str(e)}
+    except Exception as e:
+        logger.error(f"Error getting at-risk students: {e}")
+        return {"error": "Failed to get at-risk students", "details": str(e)}
 
-        total_count = (
-            db.query(Student)
-            .filter(Student.risk_category.in_(["medium", "high"]))
-            .count()
-        )
 
-        students_data = [student.to_dict() for student in students]
+@app.get("/stats/risk-distribution")
+async def risk_distribution(db: Session = Depends(get_db)):
+    """Number and share of students per risk category"""
+    try:
+        return await run_in_db_pool(get_risk_distribution, db)
+    except Exception as e:
+        logger.error(f"Error getting risk distribution: {e}")
+        return {"error": "Failed to get risk distribution", "details": str(e)}
 
-        return {
-            "students": students_data,
-            "total": total_count,
-            "skip": skip,
-            "limit": limit,
-        }
+
+@app.get("/stats/trends")
+async def risk_trends(
+    bucket: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+):
+    """New students per risk category and prediction volume per day or week"""
+    try:
+        return await run_in_db_pool(get_risk_trends, db, bucket, start, end)
+    except ValueError as e:
+        return {"error": "Invalid trend parameters", "details": str(e)}
     except Exception as e:
-        logger.error(f"Error getting at-risk students: {e}")
-        return {"error": "Failed to get at-risk students", "details": str(e)}
+        logger.error(f"Error getting risk trends: {e}")
+        return {"error": "Failed to get risk trends", "details": str(e)}
+
+
+def _inference_rejected(error: InferenceRejected) -> JSONResponse:
+    """503 + Retry-After when a lane is full, 504 when the deadline passed"""
+    if error.status_code == 504:
+        content = {
+            "error": "Deadline exceeded",
+            "message": str(error),
+            "hint": "Retry later or raise the X-Deadline-Ms header",
+        }
+        return JSONResponse(status_code=504, content=content)
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error": "Server overloaded",
+            "message": str(error),
+            "hint": f"Retry after {error.retry_after} seconds",
+        },
+        headers={"Retry-After": str(error.retry_after)},
+    )
 
 
 @app.post("/predict")
-def predict_student(input_data: PredicitonInput):
-    """Predict student risk status with percentile grades and 0-20 scale units"""
+async def predict_student(
+    input_data: PredicitonInput,
+    engine: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+):
+    """
+    Predict student risk status with percentile grades and 0-20 scale units.
+    engine selects keras, numpy or xgboost for this request (default: the
+    deployment's INFERENCE_ENGINE).
+    """
     try:
-        result = predict(input_data.model_dump())
-        return result
+        user_input = input_data.model_dump()
+        # The one cache lookup for this request; hits are answered on the
+        # event loop, without a thread hop
+        cached = cached_prediction(user_input, engine)
+        if cached is not None:
+            return cached
+        if BATCHING_ENABLED:
+            # Await the micro-batch on the event loop instead of a lane thread
+            return await run_enqueued(
+                "predict",
+                enqueue_prediction,
+                user_input,
+                engine,
+                timeout_ms=x_deadline_ms,
+            )
+        return await run_inference(
+            "predict", predict_uncached, user_input, engine, timeout_ms=x_deadline_ms
+        )
+    except InferenceRejected as e:
+        return _inference_rejected(e)
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return {
@@ -165,12 +312,119 @@ def predict_student(input_data: PredicitonInput):
         }
 
 
+@app.post("/predict/batch")
+async def predict_students_batch(
+    input_data: List[PredicitonInput],
+    engine: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+):
+    """Predict risk status for a list of students in a single forward pass"""
+    try:
+        results = await run_inference(
+            "batch",
+            predict_batch,
+            [item.model_dump() for item in input_data],
+            None,
+            engine,
+            timeout_ms=x_deadline_ms,
+        )
+        return {"predictions": results, "total": len(results)}
+    except InferenceRejected as e:
+        return _inference_rejected(e)
+    except Exception as e:
+        logger.error(f"Batch prediction error: {e}")
+        return {
+            "error": "Batch prediction failed",
+            "message": str(e),
+            "hint": "Check /predict/input-guide for correct input format",
+        }
+
+
+@app.get("/predict/batching-stats")
+def predict_batching_stats():
+    """Micro-batching stats: batch sizes and queue waits for /predict traffic"""
+    return get_batching_stats()
+
+
+@app.get("/predict/cache-stats")
+def predict_cache_stats():
+    """Prediction cache hit rate, size, eviction and invalidation counters"""
+    return get_prediction_cache_stats()
+
+
+@app.get("/predict/executor-stats")
+def predict_executor_stats():
+    """Per-lane inference executor load: queue depth, shed requests, latencies"""
+    return get_inference_executor_stats()
+
+
+def _predict_with_async_explanation(user_input: dict, engine: Optional[str]):
+    """
+    Prediction now; explanation from the cache or queued as a background job
+    that explains with the same model version as the prediction.
+    """
+    prediction, cached, bundle = predict_with_pending_explanation(user_input, engine)
+    if cached is not None:
+        return {"prediction": prediction, "explanation": cached}
+
+    try:
+        job = get_job_manager().submit(user_input, engine, bundle)
+    except ExplanationQueueFull as e:
+        return {
+            "prediction": prediction,
+            "explanation": {
+                "status": "unavailable",
+                "error": f"Explanation queue is full: {e}",
+                "feature_impacts": [],
+            },
+        }
+
+    return {
+        "prediction": prediction,
+        "explanation": {
+            "status": job.status,
+            "job_id": job.id,
+            "status_url": f"/explanations/{job.id}",
+            "events_url": f"/explanations/{job.id}/events",
+            "feature_impacts": [],
+        },
+    }
+
+
 @app.post("/predict_with_xai")
-def predict_with_xai(input_data: PredicitonInput):
-    """Predict student risk status with SHAP explanations"""
+async def predict_with_xai(
+    input_data: PredicitonInput,
+    async_explanation: bool = True,
+    engine: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+):
+    """
+    Predict student risk status with SHAP explanations. Tree engines
+    (engine=xgboost) are explained with exact TreeSHAP.
+
+    The prediction is returned immediately and, unless already cached, the
+    explanation is computed in the background: poll /explanations/{job_id}
+    or stream /explanations/{job_id}/events. async_explanation=false waits
+    for the explanation and returns both in one response.
+    """
     try:
-        result = predict_with_explanation(input_data.model_dump())
-        return result
+        if not async_explanation:
+            return await run_inference(
+                "explain",
+                predict_with_explanation,
+                input_data.model_dump(),
+                engine,
+                timeout_ms=x_deadline_ms,
+            )
+        return await run_inference(
+            "predict",
+            _predict_with_async_explanation,
+            input_data.model_dump(),
+            engine,
+            timeout_ms=x_deadline_ms,
+        )
+    except InferenceRejected as e:
+        return _inference_rejected(e)
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return {
@@ -180,13 +434,201 @@ def predict_with_xai(input_data: PredicitonInput):
         }
 
 
+@app.post("/predict_with_xai/batch")
+async def predict_with_xai_batch(
+    input_data: List[PredicitonInput],
+    engine: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+):
+    """Predict and explain a cohort of students with one batched SHAP pass"""
+    try:
+        return await run_inference(
+            "batch",
+            predict_with_explanation_batch,
+            [item.model_dump() for item in input_data],
+            engine,
+            timeout_ms=x_deadline_ms,
+        )
+    except InferenceRejected as e:
+        return _inference_rejected(e)
+    except Exception as e:
+        logger.error(f"Batch explanation error: {e}")
+        return {
+            "error": "Batch prediction failed",
+            "message": str(e),
+            "hint": "Check /predict/input-guide for correct input format",
+        }
+
+
+@app.post("/simulate/sweep")
+async def simulate_sweep(
+    request: SweepRequest,
+    engine: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+):
+    """
+    What-if sweep: vary one or two features of a base student over value
+    grids and score every point in one forward pass (risk curve or heatmap).
+    Set explain=true to also explain the base student.
+    """
+    try:
+        return await run_inference(
+            "explain" if request.explain else "predict",
+            sweep,
+            request.base.model_dump(),
+            [axis.model_dump() for axis in request.axes],
+            engine,
+            request.explain,
+            timeout_ms=x_deadline_ms,
+        )
+    except InferenceRejected as e:
+        return _inference_rejected(e)
+    except ValueError as e:
+        return {
+            "error": "Invalid sweep",
+            "message": str(e),
+            "hint": "Axes need a PredicitonInput feature and values within its range",
+        }
+    except Exception as e:
+        logger.error(f"Simulation sweep error: {e}")
+        return {
+            "error": "Simulation failed",
+            "message": str(e),
+            "hint": "Check /predict/input-guide for correct input format",
+        }
+
+
+@app.post("/counterfactuals")
+async def counterfactuals(
+    request: CounterfactualRequest,
+    engine: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+):
+    """
+    Smallest changes to units approved, average grade, tuition status and
+    debtor status that bring the student below the target risk threshold
+    """
+    try:
+        return await run_inference(
+            "batch",
+            find_counterfactuals,
+            request.base.model_dump(),
+            request.target,
+            request.max_results,
+            request.budget_ms,
+            engine,
+            timeout_ms=x_deadline_ms,
+        )
+    except InferenceRejected as e:
+        return _inference_rejected(e)
+    except ValueError as e:
+        return {
+            "error": "Invalid counterfactual request",
+            "message": str(e),
+            "hint": "target must be 'low' or 'medium'",
+        }
+    except Exception as e:
+        logger.error(f"Counterfactual search error: {e}")
+        return {
+            "error": "Counterfactual search failed",
+            "message": str(e),
+            "hint": "Check /predict/input-guide for correct input format",
+        }
+
+
+@app.get("/explanations/cache/stats")
+def explanation_cache_stats():
+    """Explanation cache size, hit/miss and eviction counters"""
+    return get_explanation_cache_stats()
+
+
+@app.get("/explanations/jobs/stats")
+def explanation_job_stats():
+    """Background explanation queue depth and job status counts of this worker"""
+    return get_job_manager().stats()
+
+
+@app.get("/explanations/{job_id}")
+def get_explanation_job(job_id: str):
+    """Poll a background explanation job (submitted to any worker)"""
+    state = get_job_manager().lookup(job_id)
+    if state is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Explanation job not found", "job_id": job_id},
+        )
+    return state
+
+
+def _sse_message(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SSE_KEEPALIVE_SECONDS = 15.0
+# How often a stream re-reads a job that another worker is running
+SSE_POLL_SECONDS = 1.0
+
+
+@app.get("/explanations/{job_id}/events")
+async def stream_explanation_job(job_id: str):
+    """Server-sent events for a background explanation job: status, then result"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    state = job.to_dict() if job is not None else None
+    if state is None:
+        state = await run_in_db_pool(manager.lookup, job_id)
+    if state is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Explanation job not found", "job_id": job_id},
+        )
+
+    async def local_events():
+        yield _sse_message("status", job.to_dict())
+        waiter = asyncio.wrap_future(job.future)
+        while not waiter.done():
+            done, _ = await asyncio.wait({waiter}, timeout=SSE_KEEPALIVE_SECONDS)
+            if not done:
+                yield ": keepalive\n\n"
+        yield _sse_message(job.status, job.to_dict())
+
+    async def shared_events(state: dict):
+        # The job runs in another worker: follow its shared state
+        finished = ("completed", "failed")
+        yield _sse_message("status", state)
+        waited = 0.0
+        while state["status"] not in finished:
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            waited += SSE_POLL_SECONDS
+            latest = await run_in_db_pool(manager.lookup, job_id)
+            if latest is None:
+                state = {**state, "status": "failed", "error": "Job expired"}
+                break
+            changed = latest["status"] != state["status"]
+            if changed and latest["status"] not in finished:
+                yield _sse_message("status", latest)
+                waited = 0.0
+            elif waited >= SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                waited = 0.0
+            state = latest
+        yield _sse_message(state["status"], state)
+
+    return StreamingResponse(
+        local_events() if job is not None else shared_events(state),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/students/create-with-prediction", response_model=StudentWithPrediction)
 def create_student_with_prediction(
     student_data: StudentCreate, db: Session = Depends(get_db)
 ):
     """Create a new student record and automatically generate prediction"""
     try:
-        prediction_result = predict(student_data.model_dump())
+        prediction_result = predict_coalesced(student_data.model_dump())
 
         if "error" in prediction_result:
             return {
@@ -195,61 +637,44 @@ def create_student_with_prediction(
                 "details": prediction_result,
             }
 
-        gender_str = "male" if student_data.gender == 1 else "female"
-
-        new_student = Student(
-            age_at_enrollment=student_data.age_at_enrollment,
-            gender=gender_str,
-            total_units_approved=student_data.total_units_approved,
-            average_grade=student_data.average_grade,
-            total_units_evaluated=student_data.total_units_evaluated,
-            total_units_enrolled=student_data.total_units_enrolled,
-            previous_qualification_grade=student_data.previous_qualification_grade,
-            tuition_fees_up_to_date=not bool(student_data.tuition_fees_up_to_date),
-            scholarship_holder=not bool(student_data.scholarship_holder),
-            debtor=bool(student_data.debtor),
-            uploaded_by=student_data.uploaded_by,
-            risk_score=prediction_result["probability"]["dropout"],
-            risk_category=prediction_result["risk_category"],
-            last_prediction_date=datetime.now(),
+        # Client-side id and timestamps: one transaction, nothing to read back
+        values = student_row(student_data, prediction_result)
+        prediction_log = prediction_log_row(
+            values["id"], prediction_result, student_data.uploaded_by
         )
 
-        db.add(new_student)
-        db.commit()
-        db.refresh(new_student)
-
-        prediction_log = PredictionLog(
-            student_id=new_student.id,
-            risk_score=prediction_result["probability"]["dropout"],
-            risk_category=prediction_result["risk_category"],
-            model_version="nn_b_model_v1",
-            created_by=student_data.uploaded_by,
+        log_buffer = get_prediction_log_buffer()
+        insert_students_with_logs(
+            db, [values], [] if log_buffer is not None else [prediction_log]
         )
-
-        db.add(prediction_log)
         db.commit()
+        if log_buffer is not None and not log_buffer.add(prediction_log):
+            # Buffer full: write this log now rather than drop it
+            insert_students_with_logs(db, [], [prediction_log])
+            db.commit()
+
         response_data = {
-            "id": str(new_student.id),
-            "age_at_enrollment": new_student.age_at_enrollment,
-            "gender": new_student.gender,
-            "total_units_approved": new_student.total_units_approved,
-            "average_grade": new_student.average_grade,
-            "total_units_evaluated": new_student.total_units_evaluated,
-            "total_units_enrolled": new_student.total_units_enrolled,
-            "previous_qualification_grade": new_student.previous_qualification_grade,
-            "tuition_fees_up_to_date": new_student.tuition_fees_up_to_date,
-            "scholarship_holder": new_student.scholarship_holder,
-            "debtor": new_student.debtor,
-            "uploaded_by": new_student.uploaded_by,
-            "created_at": new_student.created_at.isoformat(),
-            "risk_score": new_student.risk_score,
-            "risk_category": new_student.risk_category,
+            "id": str(values["id"]),
+            "age_at_enrollment": values["age_at_enrollment"],
+            "gender": values["gender"],
+            "total_units_approved": values["total_units_approved"],
+            "average_grade": values["average_grade"],
+            "total_units_evaluated": values["total_units_evaluated"],
+            "total_units_enrolled": values["total_units_enrolled"],
+            "previous_qualification_grade": values["previous_qualification_grade"],
+            "tuition_fees_up_to_date": values["tuition_fees_up_to_date"],
+            "scholarship_holder": values["scholarship_holder"],
+            "debtor": values["debtor"],
+            "uploaded_by": values["uploaded_by"],
+            "created_at": values["created_at"].isoformat(),
+            "risk_score": values["risk_score"],
+            "risk_category": values["risk_category"],
             "prediction_label": prediction_result["label"],
-            "last_prediction_date": new_student.last_prediction_date.isoformat(),
+            "last_prediction_date": values["last_prediction_date"].isoformat(),
         }
 
         logger.info(
-            f"Created student {new_student.id} with prediction: {prediction_result['risk_category']}"
+            f"Created student {values['id']} with prediction: {prediction_result['risk_category']}"
         )
         return response_data
 
@@ -263,33 +688,285 @@ def create_student_with_prediction(
         }
 
 
+# Largest number of rows accepted by POST /students/batch
+BATCH_CREATE_MAX_ROWS = int(os.getenv("BATCH_CREATE_MAX_ROWS", "10000"))
+
+
+def _batch_row_errors(e: ValidationError) -> Dict[int, List[dict]]:
+    """Group BatchCreate validation errors by the index of the failing row"""
+    errors: Dict[int, List[dict]] = {}
+    for detail in e.errors():
+        index, field = detail["loc"][1], detail["loc"][2:]
+        errors.setdefault(index, []).append(
+            {"field": ".".join(str(part) for part in field), "message": detail["msg"]}
+        )
+    return errors
+
+
+@app.post("/students/batch")
+def create_students_batch(request: BatchCreateRequest, db: Session = Depends(get_db)):
+    """
+    Create many students at once: rows are validated together, scored with a
+    single batched prediction and inserted with their prediction logs in one
+    transaction. Invalid rows reject the whole batch unless allow_partial is
+    set, in which case the valid rows are created and the rest reported.
+    """
+    rows = request.students
+    if len(rows) > BATCH_CREATE_MAX_ROWS:
+        return {
+            "error": "Batch too large",
+            "message": f"{len(rows)} students sent, at most {BATCH_CREATE_MAX_ROWS} allowed",
+            "hint": "Split the request or upload a file to /upload/file",
+        }
+
+    results: List[Optional[dict]] = [None] * len(rows)
+    valid_indices = list(range(len(rows)))
+    try:
+        try:
+            students = BatchCreate.model_validate({"students": rows}).students
+        except ValidationError as e:
+            row_errors = _batch_row_errors(e)
+            for index, errors in row_errors.items():
+                results[index] = {"index": index, "status": "failed", "errors": errors}
+            if not request.allow_partial:
+                return {
+                    "error": "Validation failed",
+                    "message": f"{len(row_errors)} of {len(rows)} students are invalid; nothing was created",
+                    "hint": "Fix the listed rows or set allow_partial to create the valid ones",
+                    "created": 0,
+                    "failed": len(row_errors),
+                    "results": [r for r in results if r is not None],
+                }
+            valid_indices = [i for i in valid_indices if i not in row_errors]
+            students = (
+                BatchCreate.model_validate(
+                    {"students": [rows[i] for i in valid_indices]}
+                ).students
+                if valid_indices
+                else []
+            )
+
+        predictions = predict_batch([student.model_dump() for student in students])
+
+        student_rows, log_rows = [], []
+        for student, prediction in zip(students, predictions):
+            values = student_row(student, prediction)
+            student_rows.append(values)
+            log_rows.append(
+                prediction_log_row(values["id"], prediction, student.uploaded_by)
+            )
+
+        insert_students_with_logs(db, student_rows, log_rows)
+        db.commit()
+
+        for index, values, prediction in zip(valid_indices, student_rows, predictions):
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "id": str(values["id"]),
+                "risk_score": values["risk_score"],
+                "risk_category": values["risk_category"],
+                "prediction_label": prediction["label"],
+            }
+
+        logger.info(
+            f"Created {len(student_rows)} students in batch, {len(rows) - len(student_rows)} failed"
+        )
+        return {
+            "created": len(student_rows),
+            "failed": len(rows) - len(student_rows),
+            "results": results,
+        }
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating students in batch: {e}")
+        return {
+            "error": "Failed to create students",
+            "message": str(e),
+            "hint": "No students were created; check your input data and try again",
+        }
+
+
+# Bytes read from the request per write while spooling an upload to disk
+UPLOAD_READ_SIZE = 1024 * 1024
+
+
 @app.post("/upload/file")
-async def file_upload(file: UploadFile = File(...)):
-    """Endpoint for uploading data files"""
+async def file_upload(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    uploaded_by: str = Form("file_upload"),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload a CSV or Excel file of students for ingestion.
+    The file is processed in the background; poll /upload/{batch_id} for progress.
+    """
+    path = None
     try:
-        if not file.filename.endswith((".csv", ".xlsx", ".xls")):
+        if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
             return {
                 "error": "Invalid file type. Please upload CSV or Excel files only."
             }
 
-        # Here you would process the uploaded file
-        # For now, returning upload confirmation
+        # Spool to disk so the background task can stream it after we respond
+        suffix = os.path.splitext(file.filename)[1].lower()
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+            while chunk := await file.read(UPLOAD_READ_SIZE):
+                spool.write(chunk)
+            path = spool.name
+
+        batch = await run_in_db_pool(
+            create_batch_upload, db, file.filename, uploaded_by
+        )
+        background_tasks.add_task(
+            process_upload, UUID(batch["id"]), path, file.filename
+        )
+
         return {
-            "status": "success",
+            "status": "processing",
             "message": "File uploaded successfully",
+            "batch_id": batch["id"],
+            "status_url": f"/upload/{batch['id']}",
             "filename": file.filename,
             "content_type": file.content_type,
             "size": file.size if hasattr(file, "size") else "unknown",
         }
     except Exception as e:
         logger.error(f"Error in file upload: {e}")
+        if path is not None:
+            os.remove(path)
         return {"error": "Failed to upload file", "details": str(e)}
 
 
+@app.get("/upload/{batch_id}")
+async def get_upload_status(batch_id: UUID, db: Session = Depends(get_db)):
+    """Progress and row errors for an uploaded file"""
+    batch = await run_in_db_pool(get_batch_upload, db, batch_id)
+    if batch is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "error": "Upload not found",
+                "message": f"No upload with id {batch_id}",
+            },
+        )
+    return batch
+
+
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints require the X-Admin-Token header when ADMIN_API_TOKEN is set"""
+    if ADMIN_API_TOKEN and not secrets.compare_digest(
+        x_admin_token or "", ADMIN_API_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/rescore", dependencies=[Depends(require_admin)])
+def start_rescore(
+    workers: Optional[int] = None,
+    force: bool = False,
+    resume: bool = True,
+    model_version: Optional[str] = None,
+):
+    """
+    Re-score all stored students with the current model in the background.
+    Students already scored by the model version are skipped unless force is set.
+    Only one re-score runs at a time across all workers.
+    """
+    if model_version is not None:
+        try:
+            get_registry().spec(model_version)
+        except KeyError as e:
+            return _unknown_model_version(e)
+    options = {"force": force, "resume": resume, "model_version": model_version}
+    if workers is not None:
+        options["workers"] = workers
+    if not start_rescore_job(**options):
+        return JSONResponse(
+            status_code=409,
+            content={
+                "error": "Re-score already running",
+                "message": "Wait for the current re-score to finish",
+                "status": get_rescore_status(),
+            },
+        )
+    return {"status": "started", "status_url": "/admin/rescore"}
+
+
+@app.get("/admin/rescore", dependencies=[Depends(require_admin)])
+def rescore_status():
+    """Progress of the current or last re-score, whichever worker started it"""
+    return get_rescore_status() or {"status": "idle"}
+
+
+def _unknown_model_version(error: KeyError) -> JSONResponse:
+    return JSONResponse(
+        status_code=404,
+        content={
+            "error": "Unknown model version",
+            "message": str(error.args[0]),
+            "hint": "GET /admin/models lists the registered versions",
+        },
+    )
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+def list_models():
+    """Registered model versions, the one serving requests and reload state"""
+    return get_registry().status()
+
+
+@app.post("/admin/models/reload", dependencies=[Depends(require_admin)])
+def reload_model(version: Optional[str] = None, persist: bool = False):
+    """
+    Load a model version (default: the manifest's active one) in the
+    background, warm it up and swap it in. Requests already running finish on
+    the previous version. persist=true also makes it the manifest's active
+    version for restarts and other workers. Under python -m app.serve with
+    several workers the version is always persisted: the other workers poll
+    the manifest and load it too.
+    """
+    persist = persist or serving_workers() > 1
+    registry = get_registry()
+    try:
+        started = registry.reload_async(version, persist)
+    except KeyError as e:
+        return _unknown_model_version(e)
+    if not started:
+        return JSONResponse(
+            status_code=409,
+            content={
+                "error": "Model reload already running",
+                "message": f"Version {registry.reloading} is still loading",
+                "status": registry.status(),
+            },
+        )
+    return {
+        "status": "loading",
+        "version": version or registry.manifest()["active"],
+        "persist": persist,
+        "status_url": "/admin/models",
+    }
+
+
+@app.get("/admin/workers", dependencies=[Depends(require_admin)])
+def worker_memory():
+    """
+    RSS/PSS of the serving processes (all pre-fork workers when started with
+    python -m app.serve); PSS counts shared model pages once across workers
+    """
+    return worker_memory_report()
+
+
 @app.get("/health")
 async def health_check():
     """Enhanced health check endpoint with database status"""
-    db_health = get_db_health()
+    db_health = await run_in_db_pool(get_db_health)
     return {
         "status": "healthy" if db_health["status"] == "healthy" else "degraded",
         "service": "EWSS API",
@@ -297,10 +974,42 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+def metrics():
+    """
+    Stage and request latency histograms, request counters, DB pool usage,
+    model load times and cache/executor counters in Prometheus text format
+    """
+    if not METRICS_ENABLED:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "error": "metrics_disabled",
+                "message": "Metrics are disabled",
+                "hint": "Set METRICS_ENABLED=true",
+            },
+        )
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness for load balancers: 503 until the startup model warm-up
+    (MODEL_WARMUP=true) has finished, 200 afterwards or when it is disabled
+    """
+    state = get_warmup_state()
+    if not state["ready"]:
+        return JSONResponse(
+            status_code=503, content={"status": "not_ready", "warmup": state}
+        )
+    return {"status": "ready", "warmup": state}
+
+
 @app.get("/db/test")
 async def test_db_connection():
     """Test database connection endpoint"""
-    if test_connection():
+    if await run_in_db_pool(test_connection):
         return {"status": "success", "message": "Database connection successful"}
     else:
         return {"status": "error", "message": "Database connection failed"}
@@ -0,0 +1,366 @@
+"""
+In-process metrics in the Prometheus text format, served at GET /metrics.
+
+No client library or push gateway is involved. Histograms, counters and
+gauges live in this process and are rendered on each scrape. Modules that
+already keep their own counters (caches, executor lanes, the connection
+pool) register a collector that reports them at scrape time.
+
+ews_stage_duration_seconds times each stage of a request by `stage`:
+
+- request_validation: body parsing and pydantic validation (for sync
+  endpoints also the wait for a thread pool thread)
+- preprocess, model_predict: feature transform and forward pass
+- explanation_cache, shap, explanation_build: cache lookups, the SHAP
+  computation and turning SHAP values into feature impacts
+- response_serialization: response model validation, encoding and JSON
+  rendering
+
+With the pre-fork server (app/serve.py) every worker keeps its own metrics
+and a scrape reports the worker that answers it.
+"""
+
+import os
+import math
+import time
+import bisect
+import asyncio
+import logging
+import functools
+import threading
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Upper bounds in seconds; fine at the low end, where cached answers land
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(value)
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: Optional[tuple] = None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in items
+        ]
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Last set value per label combination"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram(_Metric):
+    """Bucketed observations with their sum and count per label combination"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        # Per-bucket (not cumulative) counts, then the sum; cumulated on render
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._values[labels] = series
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (labels, list(series)) for labels, series in self._values.items()
+            )
+        lines = self._header()
+        for labels, series in items:
+            count = 0
+            for bound, in_bucket in zip(self.buckets + (math.inf,), series):
+                count += in_bucket
+                bucket_labels = _labels(self.labelnames, labels, ("le", _number(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            series_labels = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series_labels} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+
+_metrics: Dict[str, _Metric] = {}
+_collectors: List[Callable[[], Iterable[str]]] = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric_class, name: str, *args, **kwargs):
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = metric_class(name, *args, **kwargs)
+            _metrics[name] = metric
+    return metric
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    """The process-wide counter `name` (created on first call)"""
+    return _register(Counter, name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """The process-wide gauge `name` (created on first call)"""
+    return _register(Gauge, name, help, labelnames)
+
+
+def histogram(
+    name: str,
+    help: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    """The process-wide histogram `name` (created on first call)"""
+    return _register(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    """Call `collector` on every scrape; it returns exposition lines"""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def metric_family(
+    name: str, kind: str, help: str, samples: Iterable[Tuple[dict, float]]
+) -> List[str]:
+    """Exposition lines for one metric from (labels, value) pairs"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(
+            f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}"
+        )
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics of this process in the Prometheus text format"""
+    lines: List[str] = []
+    for metric in list(_metrics.values()):
+        lines.extend(metric.render())
+    for collector in list(_collectors):
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            logger.warning(f"Metrics collector {collector!r} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram(
+    "ews_stage_duration_seconds",
+    "Time spent in each processing stage of a request",
+    ("stage",),
+)
+HTTP_REQUESTS = counter(
+    "ews_http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_SECONDS = histogram(
+    "ews_http_request_duration_seconds",
+    "Time from routing a request to returning its response",
+    ("method", "route"),
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage)
+
+
+class stage_timer(ContextDecorator):
+    """
+    Time a with-block, or every call of a decorated function, as `stage`
+    (also when it raises). A class rather than @contextmanager: it costs a
+    fraction of a generator-based one on the cached prediction path.
+    """
+
+    __slots__ = ("stage", "_started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def _recreate_cm(self):
+        # One timer per decorated call, so concurrent calls do not share it
+        return stage_timer(self.stage)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self._started)
+        return False
+
+
+# Per-request timestamps shared by TimedRoute and the endpoint wrapper. The
+# dict itself is shared, so sync endpoints can fill it from a worker thread.
+_request_timing: ContextVar[Optional[dict]] = ContextVar("request_timing", default=None)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Record when `endpoint` starts and returns in the request's timing dict"""
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            timing = _request_timing.get()
+            if timing is not None:
+                timing["entered"] = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timing is not None:
+                    timing["returned"] = time.perf_counter()
+
+    else:
+
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            timing = _request_timing.get()
+            if timing is not None:
+                timing["entered"] = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if timing is not None:
+                    timing["returned"] = time.perf_counter()
+
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that counts requests and times them by route template. The time
+    before the endpoint runs is recorded as request_validation, the time
+    after it returns as response_serialization.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint=_timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            if not METRICS_ENABLED:
+                return await handler(request)
+            timing: dict = {}
+            token = _request_timing.set(timing)
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                finished = time.perf_counter()
+                _request_timing.reset(token)
+                HTTP_REQUESTS.inc(request.method, route, str(status))
+                HTTP_REQUEST_SECONDS.observe(finished - started, request.method, route)
+                if "entered" in timing:
+                    STAGE_SECONDS.observe(
+                        timing["entered"] - started, "request_validation"
+                    )
+                if "returned" in timing:
+                    STAGE_SECONDS.observe(
+                        finished - timing["returned"], "response_serialization"
+                    )
+
+        return timed_handler
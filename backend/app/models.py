@@ -1,7 +1,20 @@
-from sqlalchemy import Column, String, Integer, Boolean, Float, DateTime, Text
+import json
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Boolean,
+    Float,
+    Date,
+    DateTime,
+    Text,
+    Index,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from uuid import uuid4
+from datetime import datetime, timezone
 from .database.db import Base
 
 
@@ -13,6 +26,19 @@ class Student(Base):
 
     __tablename__ = "students"
 
+    # Composite indexes backing keyset pagination (newest first, id tie-break)
+    __table_args__ = (
+        Index("ix_students_created_at_id", "created_at", "id"),
+        # Partial index for the at-risk list: rows come back already in order
+        Index(
+            "ix_students_at_risk_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=text("risk_category IN ('medium', 'high')"),
+            sqlite_where=text("risk_category IN ('medium', 'high')"),
+        ),
+    )
+
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True)
 
@@ -40,8 +66,11 @@ class Student(Base):
 
     # Metadata
     uploaded_by = Column(String(255), nullable=False, doc="User who uploaded the data")
+    # Set in Python as well so every row carries a full-precision timestamp,
+    # which keyset pagination compares exactly
     created_at = Column(
         DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
         server_default=func.now(),
         doc="Record creation timestamp",
     )
@@ -99,6 +128,13 @@ class PredictionLog(Base):
 
     __tablename__ = "prediction_logs"
 
+    # Lets re-scoring skip students already scored by a model version
+    __table_args__ = (
+        Index(
+            "ix_prediction_logs_student_id_model_version", "student_id", "model_version"
+        ),
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True)
     student_id = Column(
         UUID(as_uuid=True), nullable=False, index=True, doc="Reference to student"
@@ -160,3 +196,99 @@ class BatchUpload(Base):
 
     def __repr__(self):
         return f"<BatchUpload(id={self.id}, status='{self.status}', total_records={self.total_records})>"
+
+    def to_dict(self):
+        """Convert model instance to dictionary"""
+        return {
+            "id": str(self.id),
+            "filename": self.filename,
+            "total_records": self.total_records,
+            "successful_records": self.successful_records,
+            "failed_records": self.failed_records,
+            "status": self.status,
+            "error_log": json.loads(self.error_log) if self.error_log else None,
+            "uploaded_by": self.uploaded_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "completed_at": (
+                self.completed_at.isoformat() if self.completed_at else None
+            ),
+        }
+
+
+class ExplanationCacheEntry(Base):
+    """
+    SQLAlchemy model for cached SHAP explanations.
+    Keyed by a hash of the preprocessed features plus model/background version.
+    """
+
+    __tablename__ = "explanation_cache"
+
+    cache_key = Column(String(64), primary_key=True, doc="SHA-256 content key")
+    model_version = Column(String(50), nullable=True, doc="ML model version used")
+    shap_values = Column(
+        Text, nullable=False, doc="JSON SHAP values (features x classes)"
+    )
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        index=True,
+        doc="Cache entry timestamp",
+    )
+
+    def __repr__(self):
+        return f"<ExplanationCacheEntry(cache_key={self.cache_key}, model_version='{self.model_version}')>"
+
+
+class RiskRollup(Base):
+    """
+    SQLAlchemy model for the dashboard summary table.
+    One row per (UTC day, risk category), updated in the same transaction as
+    the student and prediction log writes it summarizes.
+    """
+
+    __tablename__ = "risk_rollups"
+
+    bucket_date = Column(Date, primary_key=True, doc="UTC day")
+    risk_category = Column(String(50), primary_key=True, doc="Risk category")
+    student_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        doc="Students created that day, by current risk category",
+    )
+    prediction_count = Column(
+        Integer, nullable=False, default=0, doc="Predictions logged that day"
+    )
+    risk_score_sum = Column(
+        Float, nullable=False, default=0.0, doc="Sum of logged risk scores"
+    )
+
+    def __repr__(self):
+        return f"<RiskRollup(bucket_date={self.bucket_date}, risk_category='{self.risk_category}', student_count={self.student_count})>"
+
+
+class BackgroundJob(Base):
+    """
+    SQLAlchemy model for background job state (explanation jobs, re-scores).
+    Shared by every server worker, so any of them can answer a status poll.
+    """
+
+    __tablename__ = "background_jobs"
+
+    __table_args__ = (
+        Index("ix_background_jobs_kind_updated_at", "kind", "updated_at"),
+    )
+
+    id = Column(String(64), primary_key=True, doc="Job id")
+    kind = Column(String(20), nullable=False, doc="explanation or rescore")
+    status = Column(String(20), nullable=False, doc="Job status")
+    state = Column(Text, nullable=False, doc="JSON job state as served to clients")
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        doc="Last state change",
+    )
+
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, kind='{self.kind}', status='{self.status}')>"
@@ -0,0 +1,286 @@
+import os
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..metrics import metric_family, register_collector
+from .engines import get_engine_class
+from .prediction import predict, predict_batch
+from .prediction_cache import cached_prediction, remember_prediction
+
+logger = logging.getLogger(__name__)
+
+BATCHING_ENABLED: bool = os.getenv("PREDICT_BATCHING_ENABLED", "true").lower() == "true"
+BATCH_MAX_SIZE: int = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS: float = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "2"))
+# Longest a blocking submit() waits for its batch before giving up
+BATCH_RESULT_TIMEOUT_MS: float = float(
+    os.getenv("PREDICT_BATCH_RESULT_TIMEOUT_MS", "10000")
+)
+
+# Number of recent queue waits kept for percentile stats
+_STATS_WINDOW = 2048
+
+# Queued request: (user_input, future, enqueue time, engine)
+_Item = Tuple[dict, Future, float, Optional[str]]
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent predict() calls into batched forward passes.
+
+    Callers enqueue() a row and get a Future (async endpoints await it
+    without holding a thread) or block in submit(). A single worker thread
+    gathers requests that arrive within max_wait_ms of the first queued one
+    (or until max_batch_size rows are waiting), scores them with
+    predict_batch (one call per requested engine) and hands each caller its
+    own row. Requests cancelled before their batch starts are dropped.
+    """
+
+    def __init__(self, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_Item]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+        self._total_requests = 0
+        self._total_batches = 0
+        self._max_batch_seen = 0
+        self._batch_sizes: deque = deque(maxlen=_STATS_WINDOW)
+        self._queue_waits_ms: deque = deque(maxlen=_STATS_WINDOW)
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="prediction-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def start(self):
+        """Start the worker thread now rather than on the first submit()"""
+        self._ensure_worker()
+
+    def enqueue(self, user_input: dict, engine: Optional[str] = None) -> Future:
+        """Queue one input without blocking; the Future holds its prediction."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((user_input, future, time.perf_counter(), engine))
+        return future
+
+    def submit(
+        self,
+        user_input: dict,
+        engine: Optional[str] = None,
+        timeout_ms: Optional[float] = None,
+    ) -> dict:
+        """Queue one input and block until its prediction is ready."""
+        future = self.enqueue(user_input, engine)
+        timeout_ms = BATCH_RESULT_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        timeout = timeout_ms / 1000.0 if timeout_ms > 0 else None
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(
+                f"No batched prediction within {timeout_ms:.0f} ms"
+            ) from None
+
+    def _collect(self) -> List[_Item]:
+        """Block for the first request, then gather more until the window closes."""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip requests whose caller gave up (cancelled) while queued
+            batch = [
+                item
+                for item in self._collect()
+                if item[1].set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            self._record(batch, started)
+            self._process(batch)
+
+    def _process(self, batch: List[_Item]):
+        by_engine: Dict[Optional[str], List[_Item]] = {}
+        for item in batch:
+            by_engine.setdefault(item[3], []).append(item)
+        for engine, items in by_engine.items():
+            self._process_engine(engine, items)
+
+    def _process_engine(self, engine: Optional[str], batch: List[_Item]):
+        inputs = [item[0] for item in batch]
+        try:
+            results = predict_batch(inputs, engine=engine)
+        except Exception as e:
+            # One malformed row should not fail its neighbours: retry singly
+            logger.warning(f"Batched prediction failed, retrying per row: {e}")
+            for user_input, future, _, _ in batch:
+                try:
+                    future.set_result(predict(user_input, engine=engine))
+                except Exception as row_error:
+                    future.set_exception(row_error)
+            return
+
+        for (_, future, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _record(self, batch: List[_Item], started: float):
+        with self._lock:
+            self._total_requests += len(batch)
+            self._total_batches += 1
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._batch_sizes.append(len(batch))
+            for _, _, enqueued, _ in batch:
+                self._queue_waits_ms.append((started - enqueued) * 1000.0)
+
+    def stats(self) -> dict:
+        """Batch-size and queue-wait statistics over recent batches"""
+        with self._lock:
+            sizes = np.array(self._batch_sizes, dtype=float)
+            waits = np.array(self._queue_waits_ms, dtype=float)
+            total_requests = self._total_requests
+            total_batches = self._total_batches
+            max_batch_seen = self._max_batch_seen
+
+        def _percentiles(values: np.ndarray) -> dict:
+            if values.size == 0:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {
+                "mean": round(float(values.mean()), 4),
+                "p50": round(float(p50), 4),
+                "p95": round(float(p95), 4),
+                "p99": round(float(p99), 4),
+                "max": round(float(values.max()), 4),
+            }
+
+        return {
+            "enabled": BATCHING_ENABLED,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "total_requests": total_requests,
+            "total_batches": total_batches,
+            "max_batch_size_seen": max_batch_seen,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": _percentiles(sizes),
+            "queue_wait_ms": _percentiles(waits),
+        }
+
+
+_batcher: Optional[PredictionBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> PredictionBatcher:
+    """Lazily create the process-wide batcher from the configured settings"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = PredictionBatcher(
+                    max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS
+                )
+    return _batcher
+
+
+def predict_coalesced(user_input: dict, engine: Optional[str] = None) -> dict:
+    """
+    Drop-in replacement for predict() that goes through the micro-batcher.
+    Cached inputs skip the queue; batching disabled falls back to predict().
+    """
+    if engine is not None:
+        get_engine_class(engine)
+    cached = cached_prediction(user_input, engine)
+    if cached is not None:
+        return cached
+    return predict_uncached(user_input, engine)
+
+
+def predict_uncached(user_input: dict, engine: Optional[str] = None) -> dict:
+    """
+    predict_coalesced() for callers that already missed the cache: score the
+    input (batched when enabled) and cache the result, without a lookup.
+    """
+    if engine is not None:
+        get_engine_class(engine)
+    if BATCHING_ENABLED:
+        result = get_batcher().submit(user_input, engine)
+    else:
+        result = predict(user_input, engine=engine)
+    remember_prediction(user_input, result)
+    return result
+
+
+def enqueue_prediction(user_input: dict, engine: Optional[str] = None) -> Future:
+    """
+    Non-blocking predict_uncached() for async endpoints: queue the input on
+    the batcher and return a Future to await (asyncio.wrap_future).
+    """
+    if engine is not None:
+        get_engine_class(engine)
+    future = get_batcher().enqueue(user_input, engine)
+
+    def _remember(done: Future):
+        if not done.cancelled() and done.exception() is None:
+            remember_prediction(user_input, done.result())
+
+    future.add_done_callback(_remember)
+    return future
+
+
+def get_batching_stats() -> dict:
+    """Stats for the process-wide batcher"""
+    return get_batcher().stats()
+
+
+def _batching_metrics():
+    stats = get_batching_stats()
+    return (
+        metric_family(
+            "ews_batching_requests_total",
+            "counter",
+            "Single predictions scored through the batcher",
+            [({}, stats["total_requests"])],
+        )
+        + metric_family(
+            "ews_batching_batches_total",
+            "counter",
+            "Batches scored by the batcher",
+            [({}, stats["total_batches"])],
+        )
+        + metric_family(
+            "ews_batching_queue_depth",
+            "gauge",
+            "Predictions waiting for the next batch",
+            [({}, stats["queue_depth"])],
+        )
+    )
+
+
+register_collector(_batching_metrics)
@@ -0,0 +1,240 @@
+"""
+Counterfactual search: the smallest actionable changes that move a student
+below a risk threshold.
+
+Only features an advisor can act on are changed, and only in the improving
+direction:
+
+- total_units_approved: up, at most to total_units_enrolled
+- average_grade: up, at most to 100
+- tuition_fees_up_to_date: 0 -> 1
+- debtor: 1 -> 0
+
+Every combination of these changes on a fixed grid is enumerated up front
+(a few thousand rows), sorted by effort and scored in large batches,
+cheapest first, until the time budget runs out. The first feasible
+candidate per set of changed features is therefore the cheapest one for
+that set. Results that another result dominates (same or fewer changes, each
+no larger) are dropped. Effort is each change relative to the feature's
+range, and a flat cost per flipped flag.
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from .model_registry import ModelBundle, get_active_bundle
+from .prediction import (
+    HIGH_RISK_THRESHOLD,
+    LOW_RISK_THRESHOLD,
+    _categorize_risk,
+    _format_prediction,
+)
+from .preprocess import FEATURE_SPECS, raw_feature_vector
+
+# Default and largest search time per request
+COUNTERFACTUAL_BUDGET_MS: float = float(os.getenv("COUNTERFACTUAL_BUDGET_MS", "250"))
+COUNTERFACTUAL_MAX_BUDGET_MS: float = float(
+    os.getenv("COUNTERFACTUAL_MAX_BUDGET_MS", "2000")
+)
+
+# Candidates scored per model call
+COUNTERFACTUAL_BATCH_SIZE: int = int(os.getenv("COUNTERFACTUAL_BATCH_SIZE", "2048"))
+
+# Dropout probability to get below, per target category
+TARGET_THRESHOLDS = {"low": LOW_RISK_THRESHOLD, "medium": HIGH_RISK_THRESHOLD}
+
+# Grid spacing of the continuous features (user units)
+_UNITS_STEP = 1.0
+_GRADE_STEP = 1.0
+
+# Effort of flipping a flag; a continuous change costs its share of the range
+_FLAG_COST = 0.25
+
+ACTIONABLE_FEATURES = [
+    "total_units_approved",
+    "average_grade",
+    "tuition_fees_up_to_date",
+    "debtor",
+]
+
+_COLUMNS = {spec[0]: i for i, spec in enumerate(FEATURE_SPECS)}
+
+
+def _steps(current: float, limit: float, step: float) -> np.ndarray:
+    """current, current + step, ... up to and including limit"""
+    if limit <= current:
+        return np.array([current])
+    values = np.arange(current, limit, step)
+    return np.append(values, limit)
+
+
+def _candidates(raw: np.ndarray) -> Dict[str, np.ndarray]:
+    """All improving combinations of the actionable features, cheapest first"""
+    units = raw[_COLUMNS["total_units_approved"]]
+    enrolled = raw[_COLUMNS["total_units_enrolled"]]
+    grade = raw[_COLUMNS["average_grade"]]
+    tuition = raw[_COLUMNS["tuition_fees_up_to_date"]]
+    debtor = raw[_COLUMNS["debtor"]]
+
+    grids = [
+        _steps(units, max(units, min(20.0, enrolled)), _UNITS_STEP),
+        _steps(grade, 100.0, _GRADE_STEP),
+        np.array([tuition, 1.0]) if tuition == 0 else np.array([tuition]),
+        np.array([debtor, 0.0]) if debtor == 1 else np.array([debtor]),
+    ]
+    values = [column.ravel() for column in np.meshgrid(*grids, indexing="ij")]
+
+    deltas = [
+        (values[0] - units) / 20.0,
+        (values[1] - grade) / 100.0,
+        (values[2] != tuition) * _FLAG_COST,
+        (values[3] != debtor) * _FLAG_COST,
+    ]
+    cost = np.sum(deltas, axis=0)
+    changed = np.stack([delta > 0 for delta in deltas], axis=1)
+    # Bit i set when ACTIONABLE_FEATURES[i] changes
+    mask = changed @ (1 << np.arange(len(ACTIONABLE_FEATURES)))
+
+    # Cheapest first; among equal costs, fewer changes first
+    order = np.lexsort((changed.sum(axis=1), cost))
+    order = order[mask[order] != 0]
+    return {
+        "values": np.stack(values, axis=1)[order],
+        "cost": cost[order],
+        "mask": mask[order],
+    }
+
+
+def _dominates(a: dict, b: dict) -> bool:
+    """a asks for no more than b on every feature (and is not b)"""
+    return a is not b and all(
+        a["deltas"][feature] <= b["deltas"][feature] for feature in a["deltas"]
+    )
+
+
+def find_counterfactuals(
+    user_input: dict,
+    target: str = "low",
+    max_results: int = 3,
+    budget_ms: Optional[float] = None,
+    engine: Optional[str] = None,
+    bundle: Optional[ModelBundle] = None,
+) -> dict:
+    """
+    Smallest changes to the actionable features that bring the dropout
+    probability below the `target` category's threshold ("low": below
+    LOW_RISK_THRESHOLD, "medium": below HIGH_RISK_THRESHOLD).
+    """
+    if target not in TARGET_THRESHOLDS:
+        raise ValueError(
+            f"Unknown target: {target} (choose from {', '.join(TARGET_THRESHOLDS)})"
+        )
+    if max_results < 1:
+        raise ValueError("max_results must be at least 1")
+    threshold = TARGET_THRESHOLDS[target]
+    budget_ms = min(
+        COUNTERFACTUAL_MAX_BUDGET_MS,
+        COUNTERFACTUAL_BUDGET_MS if budget_ms is None else budget_ms,
+    )
+
+    bundle = bundle or get_active_bundle()
+    model = bundle.get_engine(engine)
+    model_version = bundle.model_tag(model.name)
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+
+    base_raw = np.asarray(raw_feature_vector(user_input), dtype=np.float64)
+    base_proba = model.predict_proba(bundle.preprocessor.transform_raw(base_raw))[0]
+    result = {
+        "current": _format_prediction(base_proba, model_version, model.name),
+        "target": target,
+        "threshold": threshold,
+        "already_met": bool(base_proba[0] < threshold),
+        "counterfactuals": [],
+        "model_version": model_version,
+        "engine": model.name,
+    }
+    if result["already_met"]:
+        result["search"] = {"candidates": 0, "evaluated": 0, "complete": True}
+        return result
+
+    candidates = _candidates(base_raw)
+    total = len(candidates["cost"])
+    open_masks = set(np.unique(candidates["mask"]).tolist())
+    found: Dict[int, dict] = {}
+    columns = [_COLUMNS[feature] for feature in ACTIONABLE_FEATURES]
+
+    evaluated = 0
+    while evaluated < total and open_masks:
+        if evaluated and time.perf_counter() >= deadline:
+            break
+        chunk = slice(evaluated, evaluated + COUNTERFACTUAL_BATCH_SIZE)
+        values = candidates["values"][chunk]
+        raw = np.tile(base_raw, (len(values), 1))
+        raw[:, columns] = values
+        dropout = model.predict_proba(
+            bundle.preprocessor.transform_raw(raw),
+            batch_size=COUNTERFACTUAL_BATCH_SIZE,
+        )[:, 0]
+        evaluated += len(values)
+
+        for i in np.flatnonzero(dropout < threshold):
+            mask = int(candidates["mask"][chunk][i])
+            if mask not in open_masks:
+                continue
+            open_masks.discard(mask)
+            found[mask] = {
+                "values": values[i],
+                "dropout": float(dropout[i]),
+                "cost": float(candidates["cost"][chunk][i]),
+                "deltas": dict(
+                    zip(ACTIONABLE_FEATURES, np.abs(values[i] - base_raw[columns]))
+                ),
+            }
+
+    options = sorted(found.values(), key=lambda option: option["cost"])
+    options = [
+        option
+        for option in options
+        if not any(_dominates(other, option) for other in options)
+    ]
+
+    for option in options[:max_results]:
+        changed_input = dict(user_input)
+        changes = []
+        for feature, column, value in zip(
+            ACTIONABLE_FEATURES, columns, option["values"]
+        ):
+            if value == base_raw[column]:
+                continue
+            value = (
+                int(value)
+                if feature in ("tuition_fees_up_to_date", "debtor")
+                else float(value)
+            )
+            changes.append(
+                {"feature": feature, "from": user_input.get(feature), "to": value}
+            )
+            changed_input[feature] = value
+        dropout = option["dropout"]
+        result["counterfactuals"].append(
+            {
+                "changes": changes,
+                "input": changed_input,
+                "dropout_probability": round(dropout, 6),
+                "risk_category": _categorize_risk(dropout),
+                "cost": round(option["cost"], 4),
+            }
+        )
+
+    result["search"] = {
+        "candidates": total,
+        "evaluated": evaluated,
+        "complete": evaluated >= total or not open_masks,
+        "budget_ms": budget_ms,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 3),
+    }
+    return result
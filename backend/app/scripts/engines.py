@@ -0,0 +1,139 @@
+"""
+Inference engines: one class per way of serving a model version.
+
+Every engine takes the preprocessed float32 matrix (preprocess.ALL_FEATURES
+column order) and returns class probabilities as an (n, 2) array of
+[dropout, graduate], so prediction.py formats all of them identically.
+
+- keras: the TensorFlow network from the manifest's "model" artifact
+- numpy: the same network exported to "numpy_model" (see numpy_engine.py)
+- xgboost: the gradient-boosted trees in "xgboost_model"
+
+Tree engines (tree = True) are explained with TreeSHAP in explainability.py;
+the others with the exact Shapley or KernelExplainer engines.
+"""
+
+from typing import Dict, Optional, Type
+
+import joblib
+import numpy as np
+
+from .preprocess import ALL_FEATURES
+
+
+class InferenceEngine:
+    """Base class; subclasses set name/artifact and implement load()."""
+
+    name: str = ""
+    # Manifest key of the artifact this engine loads
+    artifact: str = ""
+    tree: bool = False
+
+    def __init__(self, model):
+        self.model = model
+
+    @classmethod
+    def load(cls, path: str) -> "InferenceEngine":
+        raise NotImplementedError
+
+    def predict_proba(self, X: np.ndarray, batch_size: Optional[int] = None):
+        """[dropout, graduate] probabilities for a preprocessed matrix."""
+        return self.model.predict(X, verbose=0, batch_size=batch_size)
+
+    def predict(self, X, verbose: int = 0, batch_size: Optional[int] = None):
+        """Keras-style alias, so an engine can stand in for the model (SHAP)."""
+        return self.predict_proba(np.asarray(X, dtype=np.float32), batch_size)
+
+
+class KerasEngine(InferenceEngine):
+    name = "keras"
+    artifact = "model"
+
+    @classmethod
+    def load(cls, path: str) -> "KerasEngine":
+        try:
+            import tensorflow as tf
+
+            return cls(joblib.load(path))
+        except Exception as e:
+            raise RuntimeError(f"Failed to load model from {path}: {e}") from e
+
+
+class NumpyEngine(InferenceEngine):
+    name = "numpy"
+    artifact = "numpy_model"
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyEngine":
+        try:
+            from .numpy_engine import load_numpy_model
+
+            return cls(load_numpy_model(path))
+        except Exception as e:
+            raise RuntimeError(f"Failed to load NumPy model from {path}: {e}") from e
+
+
+class XGBoostEngine(InferenceEngine):
+    """
+    XGBoost booster (binary:logistic, class 0 = Dropout) scored through its
+    in-place predict, which skips DMatrix construction.
+
+    The artifact is the booster's own JSON/UBJ format (Booster.save_model),
+    not a pickle: a pickled model only loads reliably in the xgboost release
+    that wrote it. The trees were trained on the dataset's column order;
+    columns are permuted by name from ALL_FEATURES order before scoring.
+    """
+
+    name = "xgboost"
+    artifact = "xgboost_model"
+    tree = True
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.booster = model
+        names = self.booster.feature_names or ALL_FEATURES
+        self.feature_names = [str(name) for name in names]
+        self.column_order = np.array(
+            [ALL_FEATURES.index(name) for name in self.feature_names]
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "XGBoostEngine":
+        try:
+            import xgboost
+        except ImportError as e:
+            raise RuntimeError(
+                "The xgboost engine requires xgboost (pip install xgboost)"
+            ) from e
+        try:
+            booster = xgboost.Booster()
+            booster.load_model(path)
+            return cls(booster)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load XGBoost model from {path}: {e}") from e
+
+    def to_model_order(self, X: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(np.asarray(X)[:, self.column_order])
+
+    def predict_proba(self, X: np.ndarray, batch_size: Optional[int] = None):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        graduate = self.booster.inplace_predict(self.to_model_order(X))
+        graduate = np.asarray(graduate, dtype=np.float32).reshape(-1)
+        return np.column_stack([1.0 - graduate, graduate])
+
+
+ENGINES: Dict[str, Type[InferenceEngine]] = {
+    engine.name: engine for engine in (KerasEngine, NumpyEngine, XGBoostEngine)
+}
+
+
+def get_engine_class(name: str) -> Type[InferenceEngine]:
+    """Engine class for `name`; ValueError for unknown engines."""
+    engine = ENGINES.get(str(name).lower())
+    if engine is None:
+        raise ValueError(
+            f"Unknown inference engine: {name} (choose from {', '.join(ENGINES)})"
+        )
+    return engine
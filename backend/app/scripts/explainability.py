@@ -1,14 +1,31 @@
-import shap
-import joblib
+import os
+import logging
 import numpy as np
-from pathlib import Path
-from typing import Optional, Tuple
-from .prediction import predict, _get_model
-from .preprocess import preprocess_input, NUM_FEATURES, BINARY_FEATURES
-
-MODEL_DIR: Path = Path(__file__).parent.parent / "models"
-
-BACKGROUND_PATH = str(MODEL_DIR / "background_data.pkl")
+from typing import List, Optional, Tuple
+from ..metrics import counter, metric_family, register_collector, stage_timer
+from .prediction import predict_matrix, PREDICT_BATCH_SIZE
+from .prediction_cache import cached_prediction, remember_prediction
+from .model_registry import ModelBundle, get_active_bundle, get_registry
+from .engines import InferenceEngine
+from .preprocess import NUM_FEATURES, BINARY_FEATURES
+from .shapley import ExactShapleyExplainer
+from .explanation_cache import (
+    EXPLANATION_CACHE_ENABLED,
+    get_explanation_cache,
+    make_cache_key,
+)
+
+logger = logging.getLogger(__name__)
+
+# "exact" enumerates all feature coalitions (see shapley.py); "kernel" uses
+# shap.KernelExplainer. Exact falls back to kernel if it fails.
+SHAP_ENGINE: str = os.getenv("SHAP_ENGINE", "exact").lower()
+
+SHAP_FALLBACKS = counter(
+    "ews_shap_fallbacks_total",
+    "SHAP computations that failed and fell back to KernelExplainer",
+    ("method",),
+)
 
 FEATURE_NAMES = [
     "Total Units Approved",
@@ -23,9 +40,6 @@ FEATURE_NAMES = [
     "Gender",
 ]
 
-_explainer: Optional[shap.KernelExplainer] = None
-_background_data: Optional[np.ndarray] = None
-
 
 def _ensure_2d(array: np.ndarray) -> np.ndarray:
     """Ensure array is 2D by reshaping if needed."""
@@ -34,41 +48,229 @@ def _ensure_2d(array: np.ndarray) -> np.ndarray:
     return array
 
 
-def _load_resources():
-    """Lazy load the explainer and background data on first use."""
-    global _explainer, _background_data
+def _get_background(bundle: ModelBundle) -> np.ndarray:
+    """The bundle's SHAP background data (at most 100 rows)."""
+    if bundle.background is None:
+        raise RuntimeError(f"Model version {bundle.version} has no background data")
+    return bundle.background
+
 
-    if _explainer is None:
+def _load_resources(model: InferenceEngine, bundle: ModelBundle):
+    """The KernelExplainer for one engine of the bundle, built on first use."""
+
+    def build():
         try:
-            model = _get_model()
-            if _background_data is None:
-                _background_data = joblib.load(BACKGROUND_PATH)
-                _background_data = _ensure_2d(_background_data)
-                max_samples = min(100, len(_background_data))
-                _background_data = _background_data[:max_samples]
-            _explainer = shap.KernelExplainer(model.predict, _background_data)
+            import shap
+
+            return shap.KernelExplainer(model.predict, _get_background(bundle))
         except Exception as e:
             raise RuntimeError(f"Failed to load explainer resources: {e}") from e
 
+    return bundle.derived(f"kernel_explainer:{model.name}", build)
+
+
+def _load_exact_explainer(
+    model: InferenceEngine, bundle: ModelBundle
+) -> ExactShapleyExplainer:
+    """The exact Shapley explainer for one engine of the bundle."""
+
+    def build():
+        try:
+            return ExactShapleyExplainer(
+                lambda X: model.predict_proba(X, batch_size=PREDICT_BATCH_SIZE),
+                np.asarray(_get_background(bundle), dtype=np.float32),
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to build exact explainer: {e}") from e
+
+    return bundle.derived(f"exact_explainer:{model.name}", build)
+
+
+def _load_tree_explainer(model: InferenceEngine, bundle: ModelBundle):
+    """
+    shap.TreeExplainer for a tree engine, in probability space with the
+    bundle's background as the interventional reference distribution.
+    """
+
+    def build():
+        try:
+            import shap
+
+            return shap.TreeExplainer(
+                model.model,
+                data=model.to_model_order(_get_background(bundle)),
+                model_output="probability",
+                feature_perturbation="interventional",
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to build tree explainer: {e}") from e
+
+    return bundle.derived(f"tree_explainer:{model.name}", build)
+
+
+def _tree_shap_values(input_data: np.ndarray, model: InferenceEngine, bundle):
+    """
+    Exact TreeSHAP values in the per-class list layout. The explainer returns
+    the graduate-probability attribution in the model's column order; the
+    dropout attribution is its negation (the two probabilities sum to 1).
+    """
+    explainer = _load_tree_explainer(model, bundle)
+    graduate = np.asarray(
+        explainer.shap_values(model.to_model_order(input_data), check_additivity=False)
+    )
+    if graduate.ndim == 3:
+        graduate = graduate[:, :, -1]
+    graduate = _ensure_2d(graduate)
+    reordered = np.empty_like(graduate)
+    reordered[:, model.column_order] = graduate
+    return [-reordered, reordered]
+
+
+def _kernel_shap_values(input_data: np.ndarray, model: InferenceEngine, bundle):
+    """SHAP values from KernelExplainer (sampled approximation)."""
+    explainer = _load_resources(model, bundle)
+    try:
+        return explainer.shap_values(input_data, nsamples=100)
+    except Exception as e:
+        raise RuntimeError(f"SHAP computation failed: {e}") from e
+
 
-def explain_instance(input_data: np.ndarray):
+def _shap_method(model: InferenceEngine) -> str:
+    """SHAP method used for an engine when nothing fails"""
+    return "tree" if model.tree else SHAP_ENGINE
+
+
+@stage_timer("shap")
+def _shap_values_with_engine(
+    input_data: np.ndarray, bundle: ModelBundle, engine: Optional[str] = None
+) -> Tuple[object, str]:
+    """SHAP values plus the name of the method that produced them."""
+    model = bundle.get_engine(engine)
+    method = _shap_method(model)
+    if method == "tree":
+        try:
+            return _tree_shap_values(input_data, model, bundle), "tree"
+        except Exception as e:
+            SHAP_FALLBACKS.inc("tree")
+            logger.error(f"Tree SHAP failed, falling back to KernelExplainer: {e}")
+    elif method == "exact":
+        try:
+            shap_array = _load_exact_explainer(model, bundle).shap_values(input_data)
+            # Same per-class list layout as KernelExplainer's legacy output
+            return [shap_array[:, :, c] for c in range(shap_array.shape[2])], "exact"
+        except Exception as e:
+            SHAP_FALLBACKS.inc("exact")
+            logger.error(f"Exact SHAP failed, falling back to KernelExplainer: {e}")
+
+    return _kernel_shap_values(input_data, model, bundle), "kernel"
+
+
+def explain_instance(
+    input_data: np.ndarray,
+    bundle: Optional[ModelBundle] = None,
+    engine: Optional[str] = None,
+):
     """
-    Compute SHAP values for a single input instance.
+    Compute SHAP values for one or more input rows.
+
+    Tree engines use exact TreeSHAP. Other engines use the exact Shapley
+    engine unless SHAP_ENGINE=kernel. Both fall back to KernelExplainer if
+    the computation fails.
 
     Args:
         input_data: Input array (1D or 2D)
+        bundle: Model version to explain (default: the active one)
+        engine: Inference engine to explain (default: the deployment's)
 
     Returns:
         SHAP values (list or array)
     """
-    _load_resources()
-    input_data = _ensure_2d(input_data)
+    bundle = bundle or get_active_bundle()
+    shap_values, _ = _shap_values_with_engine(_ensure_2d(input_data), bundle, engine)
+    return shap_values
 
-    try:
-        shap_values = _explainer.shap_values(input_data, nsamples=100)
-        return shap_values
-    except Exception as e:
-        raise RuntimeError(f"SHAP computation failed: {e}") from e
+
+def _cache_key(row: np.ndarray, bundle: ModelBundle, model: InferenceEngine) -> str:
+    """Explanation cache key for one preprocessed row."""
+    version = f"{_shap_method(model)}:{bundle.background_version}"
+    return make_cache_key(row, bundle.model_tag(model.name), version)
+
+
+def explain_rows(
+    x_input: np.ndarray,
+    bundle: Optional[ModelBundle] = None,
+    engine: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Normalized SHAP values (samples, features, classes) for preprocessed rows,
+    served from the explanation cache where possible.
+
+    Only rows that miss the cache are sent to the explainer, in one call.
+    Kernel fallback results are not cached under the primary method's key.
+    """
+    bundle = bundle or get_active_bundle()
+    x_input = _ensure_2d(x_input)
+    if not EXPLANATION_CACHE_ENABLED:
+        return _normalize_shap_values(explain_instance(x_input, bundle, engine))[0]
+
+    model = bundle.get_engine(engine)
+    cache = get_explanation_cache()
+    with stage_timer("explanation_cache"):
+        keys = [_cache_key(row, bundle, model) for row in x_input]
+        rows = cache.get_many(keys)
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        shap_values, method = _shap_values_with_engine(
+            x_input[missing], bundle, model.name
+        )
+        shap_array, _ = _normalize_shap_values(shap_values)
+        for j, i in enumerate(missing):
+            rows[i] = shap_array[j]
+        if method == _shap_method(model):
+            cache.put_many(
+                [(keys[i], shap_array[j]) for j, i in enumerate(missing)],
+                bundle.model_tag(model.name),
+            )
+
+    return np.stack(rows)
+
+
+def _drop_stale_explanations(bundle: ModelBundle):
+    # Cache keys include the model version, so entries for the previous
+    # version can never be hit again; free the in-process tier
+    get_explanation_cache().clear()
+
+
+get_registry().register_reload_hook(_drop_stale_explanations)
+
+
+def get_explanation_cache_stats() -> dict:
+    """Hit/miss/eviction counters for the explanation cache"""
+    stats = get_explanation_cache().stats()
+    stats["enabled"] = EXPLANATION_CACHE_ENABLED
+    return stats
+
+
+def _explanation_cache_metrics():
+    stats = get_explanation_cache_stats()
+    lines = metric_family(
+        "ews_explanation_cache_entries",
+        "gauge",
+        "Explanations held in the in-process cache",
+        [({}, stats["size"])],
+    )
+    for key in ("memory_hits", "db_hits", "misses", "evictions"):
+        lines += metric_family(
+            f"ews_explanation_cache_{key}_total",
+            "counter",
+            f"Explanation cache {key.replace('_', ' ')}",
+            [({}, stats[key])],
+        )
+    return lines
+
+
+register_collector(_explanation_cache_metrics)
 
 
 def _normalize_shap_values(shap_values) -> Tuple[np.ndarray, bool]:
@@ -98,7 +300,10 @@ def _normalize_shap_values(shap_values) -> Tuple[np.ndarray, bool]:
 
 
 def _extract_impacts(
-    shap_array: np.ndarray, has_two_classes: bool, feature_idx: int
+    shap_array: np.ndarray,
+    has_two_classes: bool,
+    feature_idx: int,
+    sample_idx: int = 0,
 ) -> Tuple[float, float]:
     """
     Extract dropout and graduate impacts from normalized SHAP array.
@@ -110,21 +315,23 @@ def _extract_impacts(
         Tuple of (dropout_impact, graduate_impact)
     """
     if shap_array.ndim == 3:
-        dropout_impact = float(shap_array[0, feature_idx, 0])
+        dropout_impact = float(shap_array[sample_idx, feature_idx, 0])
         if shap_array.shape[2] >= 2:
-            graduate_impact = float(shap_array[0, feature_idx, 1])
+            graduate_impact = float(shap_array[sample_idx, feature_idx, 1])
         else:
             graduate_impact = 0.0
     else:
         if shap_array.ndim == 2:
-            dropout_impact = float(shap_array[0, feature_idx])
+            dropout_impact = float(shap_array[sample_idx, feature_idx])
             if (
                 has_two_classes
                 and shap_array.shape[1] > feature_idx + shap_array.shape[0]
             ):
                 num_features = shap_array.shape[1] // 2
                 if feature_idx < num_features:
-                    graduate_impact = float(shap_array[0, feature_idx + num_features])
+                    graduate_impact = float(
+                        shap_array[sample_idx, feature_idx + num_features]
+                    )
                 else:
                     graduate_impact = 0.0
             else:
@@ -182,104 +389,242 @@ def _compute_summary(feature_explanations: list) -> dict:
     }
 
 
-def predict_with_explanation(user_input: dict) -> dict:
+def _get_original_value(feature_key: str, user_input: dict):
     """
-    Returns model prediction with SHAP explanations for a single input.
+    Get original value from user_input by trying multiple key variations.
+    Handles mismatches between feature names and actual input keys.
     """
-    pred = predict(user_input)
-
-    x_input_df = preprocess_input(user_input)
-    x_input = _ensure_2d(x_input_df.values)
-
-    def _get_original_value(feature_key: str, user_input: dict):
-        """
-        Get original value from user_input by trying multiple key variations.
-        Handles mismatches between feature names and actual input keys.
-        """
-        # Try exact match (case-insensitive)
-        key_lower = feature_key.lower()
-        if key_lower in user_input:
-            return user_input[key_lower]
-        if feature_key in user_input:
-            return user_input[feature_key]
-
-        # Try variations for special cases
-        # "Previous_qualification_(grade)" -> "previous_qualification_grade"
-        normalized_key = key_lower.replace("_(", "_").replace("(", "").replace(")", "")
-        if normalized_key in user_input:
-            return user_input[normalized_key]
-
-        # Try removing underscores and parentheses
-        simple_key = key_lower.replace("_", "").replace("(", "").replace(")", "")
-        for k in user_input.keys():
-            if (
-                k.lower().replace("_", "").replace("(", "").replace(")", "")
-                == simple_key
-            ):
-                return user_input[k]
+    # Try exact match (case-insensitive)
+    key_lower = feature_key.lower()
+    if key_lower in user_input:
+        return user_input[key_lower]
+    if feature_key in user_input:
+        return user_input[feature_key]
+
+    # Try variations for special cases
+    # "Previous_qualification_(grade)" -> "previous_qualification_grade"
+    normalized_key = key_lower.replace("_(", "_").replace("(", "").replace(")", "")
+    if normalized_key in user_input:
+        return user_input[normalized_key]
+
+    # Try removing underscores and parentheses
+    simple_key = key_lower.replace("_", "").replace("(", "").replace(")", "")
+    for k in user_input.keys():
+        if k.lower().replace("_", "").replace("(", "").replace(")", "") == simple_key:
+            return user_input[k]
+
+    return None
+
+
+@stage_timer("explanation_build")
+def _build_explanation(
+    shap_array: np.ndarray,
+    has_two_classes: bool,
+    sample_idx: int,
+    preprocessed_values: np.ndarray,
+    user_input: dict,
+) -> dict:
+    """
+    Build the feature_impacts/summary explanation for one row of a
+    normalized SHAP array.
+    """
+    all_feature_keys = NUM_FEATURES + BINARY_FEATURES
+    original_values = [_get_original_value(key, user_input) for key in all_feature_keys]
 
-        return None
+    feature_explanations = []
+
+    num_features = min(
+        len(FEATURE_NAMES),
+        shap_array.shape[1] if shap_array.ndim >= 2 else len(shap_array),
+    )
+
+    for i in range(num_features):
+        try:
+            dropout_impact, graduate_impact = _extract_impacts(
+                shap_array, has_two_classes, i, sample_idx
+            )
+
+            feature_explanations.append(
+                {
+                    "feature": FEATURE_NAMES[i],
+                    "original_value": (
+                        original_values[i] if i < len(original_values) else None
+                    ),
+                    "preprocessed_value": (
+                        round(float(preprocessed_values[i]), 4)
+                        if i < len(preprocessed_values)
+                        else 0.0
+                    ),
+                    "dropout_impact": round(dropout_impact, 4),
+                    "graduate_impact": round(graduate_impact, 4),
+                    "interpretation": _get_interpretation(dropout_impact),
+                }
+            )
+        except (IndexError, ValueError) as e:
+            continue
+
+    if not feature_explanations:
+        raise ValueError("No feature explanations could be generated")
+
+    feature_explanations.sort(key=lambda x: abs(x["dropout_impact"]), reverse=True)
+
+    return {
+        "feature_impacts": feature_explanations,
+        "summary": _compute_summary(feature_explanations),
+    }
+
+
+def _explanation_error(e: Exception) -> dict:
+    """Explanation payload returned when SHAP values cannot be computed."""
+    return {
+        "error": f"Could not generate explanation: {str(e)}",
+        "feature_impacts": [],
+    }
 
-    all_feature_keys = NUM_FEATURES + BINARY_FEATURES
-    original_values = []
-    for key in all_feature_keys:
-        value = _get_original_value(key, user_input)
-        original_values.append(value)
+
+def explain_user_input(
+    user_input: dict,
+    bundle: Optional[ModelBundle] = None,
+    engine: Optional[str] = None,
+    x_input: Optional[np.ndarray] = None,
+) -> dict:
+    """
+    Returns the SHAP explanation (feature_impacts and summary) for a single
+    input, without the prediction. Pass x_input when the caller already
+    preprocessed the input.
+    """
+    bundle = bundle or get_active_bundle()
+    if x_input is None:
+        x_input = bundle.preprocessor.transform(user_input)
+    x_input = _ensure_2d(x_input)
 
     try:
-        shap_values = explain_instance(x_input)
-        shap_array, has_two_classes = _normalize_shap_values(shap_values)
+        shap_array = explain_rows(x_input, bundle, engine)
+        return _build_explanation(shap_array, True, 0, x_input[0], user_input)
+    except Exception as e:
+        return _explanation_error(e)
 
-        feature_explanations = []
-        preprocessed_values = x_input[0]
 
-        num_features = min(
-            len(FEATURE_NAMES),
-            shap_array.shape[1] if shap_array.ndim >= 2 else len(shap_array),
-        )
+def get_cached_explanation(
+    user_input: dict,
+    engine: Optional[str] = None,
+    bundle: Optional[ModelBundle] = None,
+    x_input: Optional[np.ndarray] = None,
+) -> Optional[dict]:
+    """
+    Returns the explanation for a single input if it is already cached,
+    otherwise None. Never runs the explainer.
+    """
+    if not EXPLANATION_CACHE_ENABLED:
+        return None
 
-        for i in range(num_features):
-            try:
-                dropout_impact, graduate_impact = _extract_impacts(
-                    shap_array, has_two_classes, i
-                )
-
-                feature_explanations.append(
-                    {
-                        "feature": FEATURE_NAMES[i],
-                        "original_value": (
-                            original_values[i] if i < len(original_values) else None
-                        ),
-                        "preprocessed_value": (
-                            round(float(preprocessed_values[i]), 4)
-                            if i < len(preprocessed_values)
-                            else 0.0
-                        ),
-                        "dropout_impact": round(dropout_impact, 4),
-                        "graduate_impact": round(graduate_impact, 4),
-                        "interpretation": _get_interpretation(dropout_impact),
-                    }
-                )
-            except (IndexError, ValueError) as e:
-                continue
-
-        if not feature_explanations:
-            raise ValueError("No feature explanations could be generated")
-
-        feature_explanations.sort(key=lambda x: abs(x["dropout_impact"]), reverse=True)
+    bundle = bundle or get_active_bundle()
+    if x_input is None:
+        x_input = bundle.preprocessor.transform(user_input)
+    x_input = _ensure_2d(x_input)
+    model = bundle.get_engine(engine)
+    shap_row = get_explanation_cache().get(
+        _cache_key(x_input[0], bundle, model), count_miss=False
+    )
+    if shap_row is None:
+        return None
+    return _build_explanation(shap_row[None], True, 0, x_input[0], user_input)
 
-        return {
-            "prediction": pred,
-            "explanation": {
-                "feature_impacts": feature_explanations,
-                "summary": _compute_summary(feature_explanations),
-            },
+
+def predict_with_pending_explanation(
+    user_input: dict, engine: Optional[str] = None
+) -> Tuple[dict, Optional[dict], ModelBundle]:
+    """
+    Prediction plus the cached explanation (or None) for a single input,
+    and the model version both came from, for callers that explain later.
+    """
+    bundle = get_active_bundle()
+    x_input = _ensure_2d(bundle.preprocessor.transform(user_input))
+    pred = cached_prediction(user_input, engine, bundle)
+    if pred is None:
+        pred = predict_matrix(x_input, bundle, engine)[0]
+        remember_prediction(user_input, pred)
+    return pred, get_cached_explanation(user_input, engine, bundle, x_input), bundle
+
+
+def predict_with_explanation(user_input: dict, engine: Optional[str] = None) -> dict:
+    """
+    Returns model prediction with SHAP explanations for a single input.
+    Both come from the same model version and engine, even across a reload.
+    """
+    bundle = get_active_bundle()
+    x_input = _ensure_2d(bundle.preprocessor.transform(user_input))
+    pred = cached_prediction(user_input, engine, bundle)
+    if pred is None:
+        pred = predict_matrix(x_input, bundle, engine)[0]
+        remember_prediction(user_input, pred)
+
+    return {
+        "prediction": pred,
+        "explanation": explain_user_input(user_input, bundle, engine, x_input),
+    }
+
+
+def _cohort_ranking(shap_array: np.ndarray) -> list:
+    """
+    Rank features by mean |dropout SHAP| across a cohort, largest first.
+    """
+    dropout_shap = shap_array[:, : len(FEATURE_NAMES), 0]
+    mean_abs = np.abs(dropout_shap).mean(axis=0)
+    mean = dropout_shap.mean(axis=0)
+
+    ranking = [
+        {
+            "feature": FEATURE_NAMES[i],
+            "mean_abs_dropout_impact": round(float(mean_abs[i]), 4),
+            "mean_dropout_impact": round(float(mean[i]), 4),
         }
+        for i in range(len(mean_abs))
+    ]
+    ranking.sort(key=lambda x: x["mean_abs_dropout_impact"], reverse=True)
+    return ranking
+
+
+def predict_with_explanation_batch(
+    user_inputs: List[dict], engine: Optional[str] = None
+) -> dict:
+    """
+    Returns predictions with SHAP explanations for a list of inputs.
+
+    The batch is preprocessed once, scored with one predict_matrix call and
+    explained with one explainer call over the rows that miss the cache.
+    Each result has the same shape as predict_with_explanation();
+    cohort_summary ranks features by mean |SHAP| over the batch.
+    """
+    if not user_inputs:
+        return {"results": [], "cohort_summary": {"feature_ranking": []}, "total": 0}
+
+    bundle = get_active_bundle()
+    x_input = _ensure_2d(bundle.preprocessor.transform(user_inputs))
+    preds = predict_matrix(x_input, bundle, engine)
+
+    try:
+        shap_array = explain_rows(x_input, bundle, engine)
     except Exception as e:
+        error = _explanation_error(e)
         return {
-            "prediction": pred,
-            "explanation": {
-                "error": f"Could not generate explanation: {str(e)}",
-                "feature_impacts": [],
-            },
+            "results": [{"prediction": pred, "explanation": error} for pred in preds],
+            "cohort_summary": {"feature_ranking": [], "error": error["error"]},
+            "total": len(preds),
         }
+
+    results = []
+    for i, (pred, user_input) in enumerate(zip(preds, user_inputs)):
+        try:
+            explanation = _build_explanation(
+                shap_array, True, i, x_input[i], user_input
+            )
+        except Exception as e:
+            explanation = _explanation_error(e)
+        results.append({"prediction": pred, "explanation": explanation})
+
+    return {
+        "results": results,
+        "cohort_summary": {"feature_ranking": _cohort_ranking(shap_array)},
+        "total": len(results),
+    }
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_CACHE_ENABLED: bool = (
+    os.getenv("EXPLANATION_CACHE_ENABLED", "true").lower() == "true"
+)
+EXPLANATION_CACHE_SIZE: int = int(os.getenv("EXPLANATION_CACHE_SIZE", "4096"))
+EXPLANATION_CACHE_DB: bool = os.getenv("EXPLANATION_CACHE_DB", "true").lower() == "true"
+EXPLANATION_CACHE_DB_MAX_ENTRIES: int = int(
+    os.getenv("EXPLANATION_CACHE_DB_MAX_ENTRIES", "100000")
+)
+
+# Prune the database tier every this many writes
+_DB_PRUNE_EVERY = 500
+# After a database error, skip the database tier for this long (seconds)
+_DB_RETRY_AFTER = 60.0
+
+
+def make_cache_key(
+    feature_vector: np.ndarray, model_version: str, background_version: str
+) -> str:
+    """
+    Canonical content key for one preprocessed feature vector.
+
+    The vector is hashed as float32 bytes (with -0.0 normalized to 0.0), so
+    any two raw inputs that preprocess to the same model input share a key.
+    """
+    canonical = np.ascontiguousarray(feature_vector, dtype=np.float32) + np.float32(0)
+    digest = hashlib.sha256()
+    digest.update(f"{model_version}|{background_version}|".encode())
+    digest.update(canonical.tobytes())
+    return digest.hexdigest()
+
+
+class ExplanationCache:
+    """
+    Two-tier cache of per-row SHAP values (features x classes).
+
+    The first tier is an in-process LRU; the second is the explanation_cache
+    table, shared across workers and restarts. Database errors never fail a
+    request: the tier is skipped for a while and the value is recomputed.
+    """
+
+    def __init__(self, max_entries: int = 4096, use_db: bool = True):
+        self.max_entries = max(1, max_entries)
+        self.use_db = use_db
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_disabled_until = 0.0
+        self._db_writes = 0
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db_evictions = 0
+        self.db_errors = 0
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[np.ndarray]:
+        return self.get_many([key], count_miss)[0]
+
+    def get_many(
+        self, keys: Sequence[str], count_miss: bool = True
+    ) -> List[Optional[np.ndarray]]:
+        """Values for several keys; the database tier is read in one query."""
+        values: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    values[i] = value
+
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+
+        found = self._db_get_many({keys[i] for i in missing})
+        with self._lock:
+            for i in missing:
+                if keys[i] in found:
+                    self.db_hits += 1
+                elif count_miss:
+                    self.misses += 1
+        for i in missing:
+            value = found.get(keys[i])
+            if value is not None:
+                self._remember(keys[i], value)
+                values[i] = value
+        return values
+
+    def put(self, key: str, value: np.ndarray, model_version: str):
+        self.put_many([(key, value)], model_version)
+
+    def put_many(
+        self, rows: Sequence[Tuple[str, np.ndarray]], model_version: str
+    ):
+        """Store several values; the database tier is written in one insert."""
+        rows = [(key, np.asarray(value, dtype=np.float64)) for key, value in rows]
+        if not rows:
+            return
+        for key, value in rows:
+            self._remember(key, value)
+        self._db_put_many(rows, model_version)
+
+    def clear(self):
+        """Drop the in-process tier (database entries are version-keyed)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, value: np.ndarray):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _db_available(self) -> bool:
+        return self.use_db and time.monotonic() >= self._db_disabled_until
+
+    def _db_failed(self, e: Exception):
+        self.db_errors += 1
+        self._db_disabled_until = time.monotonic() + _DB_RETRY_AFTER
+        logger.warning(f"Explanation cache database tier unavailable: {e}")
+
+    def _db_get_many(self, keys) -> Dict[str, np.ndarray]:
+        if not keys or not self._db_available():
+            return {}
+        try:
+            from ..database.db import SessionLocal
+            from ..models import ExplanationCacheEntry
+
+            db = SessionLocal()
+            try:
+                entries = db.query(
+                    ExplanationCacheEntry.cache_key, ExplanationCacheEntry.shap_values
+                ).filter(ExplanationCacheEntry.cache_key.in_(list(keys)))
+                return {
+                    key: np.asarray(json.loads(shap_values), dtype=np.float64)
+                    for key, shap_values in entries
+                }
+            finally:
+                db.close()
+        except Exception as e:
+            self._db_failed(e)
+            return {}
+
+    def _db_put_many(self, rows: List[Tuple[str, np.ndarray]], model_version: str):
+        if not self._db_available():
+            return
+        try:
+            from ..database.db import SessionLocal
+            from ..models import ExplanationCacheEntry
+
+            db = SessionLocal()
+            try:
+                values = [
+                    {
+                        "cache_key": key,
+                        "model_version": model_version,
+                        "shap_values": json.dumps(value.tolist()),
+                    }
+                    for key, value in dict(rows).items()
+                ]
+                statement = _insert_ignoring_conflicts(db)
+                if statement is None:
+                    for row in values:
+                        db.merge(ExplanationCacheEntry(**row))
+                else:
+                    db.execute(statement, values)
+                db.commit()
+                before = self._db_writes
+                self._db_writes += len(values)
+                if self._db_writes // _DB_PRUNE_EVERY > before // _DB_PRUNE_EVERY:
+                    self._db_prune(db)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        except Exception as e:
+            self._db_failed(e)
+
+    def _db_prune(self, db):
+        """Delete the oldest rows beyond EXPLANATION_CACHE_DB_MAX_ENTRIES."""
+        from ..models import ExplanationCacheEntry
+
+        total = db.query(ExplanationCacheEntry).count()
+        excess = total - EXPLANATION_CACHE_DB_MAX_ENTRIES
+        if excess <= 0:
+            return
+        oldest = (
+            db.query(ExplanationCacheEntry.cache_key)
+            .order_by(ExplanationCacheEntry.created_at.asc())
+            .limit(excess)
+            .subquery()
+        )
+        deleted = (
+            db.query(ExplanationCacheEntry)
+            .filter(ExplanationCacheEntry.cache_key.in_(oldest.select()))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        self.db_evictions += deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "db_evictions": self.db_evictions,
+            "db_errors": self.db_errors,
+            "db_enabled": self.use_db,
+        }
+
+
+def _insert_ignoring_conflicts(db):
+    """INSERT ... ON CONFLICT DO NOTHING for the current dialect, or None"""
+    from ..models import ExplanationCacheEntry
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(ExplanationCacheEntry).on_conflict_do_nothing(
+        index_elements=[ExplanationCacheEntry.cache_key]
+    )
+
+
+_cache: Optional[ExplanationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_explanation_cache() -> ExplanationCache:
+    """Lazily create the process-wide explanation cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExplanationCache(
+                    max_entries=EXPLANATION_CACHE_SIZE, use_db=EXPLANATION_CACHE_DB
+                )
+    return _cache
@@ -0,0 +1,209 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from .explainability import explain_user_input
+from .job_state import load_job, purge_jobs, save_job
+from .model_registry import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_WORKERS: int = int(os.getenv("EXPLANATION_WORKERS", "2"))
+EXPLANATION_QUEUE_LIMIT: int = int(os.getenv("EXPLANATION_QUEUE_LIMIT", "64"))
+EXPLANATION_JOB_TTL_SECONDS: float = float(
+    os.getenv("EXPLANATION_JOB_TTL_SECONDS", "600")
+)
+
+JOB_KIND = "explanation"
+_DONE_STATUSES = ("completed", "failed")
+# Delete expired jobs from the shared table at most this often (seconds)
+_DB_PURGE_INTERVAL = 60.0
+
+
+class ExplanationQueueFull(Exception):
+    """Raised when the background explanation queue is at capacity"""
+
+
+class ExplanationJob:
+    """One background SHAP computation and its outcome"""
+
+    def __init__(
+        self,
+        user_input: dict,
+        engine: Optional[str] = None,
+        bundle: Optional[ModelBundle] = None,
+    ):
+        self.id = str(uuid.uuid4())
+        self.user_input = user_input
+        self.engine = engine
+        # The model version that made the prediction, pinned across reloads
+        self.bundle = bundle
+        self.status = "pending"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.explanation: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in _DONE_STATUSES
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.explanation is not None:
+            data["explanation"] = self.explanation
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class ExplanationJobManager:
+    """
+    Runs explanations on a small dedicated thread pool, separate from the
+    pool that serves /predict, and keeps finished jobs for polling until
+    they expire. Every state change is also written to the shared job table
+    (job_state.py), so lookup() works in any server worker.
+    """
+
+    def __init__(self, workers: int = 2, queue_limit: int = 64, ttl: float = 600):
+        self.queue_limit = max(1, queue_limit)
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="explanation"
+        )
+        self._jobs: Dict[str, ExplanationJob] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_db_purge = 0.0
+
+    def submit(
+        self,
+        user_input: dict,
+        engine: Optional[str] = None,
+        bundle: Optional[ModelBundle] = None,
+    ) -> ExplanationJob:
+        """
+        Queue an explanation; raises ExplanationQueueFull at capacity. The job
+        explains with `bundle` (default: the active version when it runs).
+        """
+        job = ExplanationJob(user_input, engine, bundle)
+        with self._lock:
+            self._purge_expired()
+            if self._in_flight >= self.queue_limit:
+                raise ExplanationQueueFull(
+                    f"{self._in_flight} explanations already queued or running"
+                )
+            self._in_flight += 1
+            self._jobs[job.id] = job
+        # Shared before it can start, so a running state is never overwritten
+        save_job(job.id, JOB_KIND, job.to_dict())
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ExplanationJob]:
+        """A job submitted to this process"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def lookup(self, job_id: str) -> Optional[dict]:
+        """State of a job submitted to any worker, or None if unknown/expired"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return load_job(job_id, JOB_KIND)
+
+    def _run(self, job: ExplanationJob):
+        job.status = "running"
+        job.started_at = time.time()
+        save_job(job.id, JOB_KIND, job.to_dict())
+        try:
+            explanation = explain_user_input(
+                job.user_input, bundle=job.bundle, engine=job.engine
+            )
+            job.explanation = explanation
+            job.status = "failed" if "error" in explanation else "completed"
+            if "error" in explanation:
+                job.error = explanation["error"]
+        except Exception as e:
+            logger.error(f"Explanation job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            job.user_input = None
+            job.bundle = None
+            save_job(job.id, JOB_KIND, job.to_dict())
+            with self._lock:
+                self._in_flight -= 1
+            self._purge_shared()
+        return job
+
+    def _purge_shared(self):
+        """Delete expired jobs of every worker from the shared table"""
+        now = time.monotonic()
+        if now - self._last_db_purge < _DB_PURGE_INTERVAL:
+            return
+        self._last_db_purge = now
+        purge_jobs(JOB_KIND, _DONE_STATUSES, self.ttl)
+
+    def _purge_expired(self):
+        """Forget finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.done and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        """Queue depth and job counts of this process"""
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                "in_flight": self._in_flight,
+                "queue_limit": self.queue_limit,
+                "jobs": statuses,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_manager: Optional[ExplanationJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> ExplanationJobManager:
+    """Lazily create the process-wide explanation job manager"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ExplanationJobManager(
+                    workers=EXPLANATION_WORKERS,
+                    queue_limit=EXPLANATION_QUEUE_LIMIT,
+                    ttl=EXPLANATION_JOB_TTL_SECONDS,
+                )
+    return _manager
+
+
+def shutdown_job_manager():
+    """Stop accepting jobs and cancel the ones still queued"""
+    if _manager is not None:
+        _manager.shutdown()
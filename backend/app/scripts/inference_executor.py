@@ -0,0 +1,378 @@
+"""
+Bounded executor for model inference, with load shedding and deadlines.
+
+Inference endpoints are async and hand their work to a lane of this executor
+instead of Starlette's shared thread pool. Each lane has its own threads,
+queue limit and deadline, so a burst of SHAP explanations queues (and is
+shed) in the "explain" lane while /predict keeps its own threads:
+
+- predict: /predict and the prediction part of async explanations. With
+  micro-batching on, /predict only takes a slot in this lane and awaits the
+  batcher from the event loop, so batches are not capped by its threads.
+- batch: /predict/batch and /predict_with_xai/batch
+- explain: synchronous /predict_with_xai
+
+A lane accepts at most workers + queue requests. Beyond that, submit()
+raises InferenceOverloaded right away, and the endpoint answers 503 with a
+Retry-After estimate. A request whose deadline passes while it waits is
+dropped without running and answered with 504. Clients can shorten the
+lane's deadline with an X-Deadline-Ms header.
+
+Settings per lane (NAME = PREDICT, BATCH or EXPLAIN):
+INFERENCE_<NAME>_WORKERS, INFERENCE_<NAME>_QUEUE and
+INFERENCE_<NAME>_DEADLINE_MS (0 = no deadline).
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from ..metrics import histogram, metric_family, register_collector
+
+# Default (workers, queue, deadline_ms) per lane
+_LANE_DEFAULTS = {
+    # Threads for the predict paths that score on a lane thread: batching
+    # off, async explanations and sweeps
+    "predict": (64, 256, 5000),
+    "batch": (2, 8, 60000),
+    "explain": (4, 16, 15000),
+}
+
+LANE_SETTINGS: Dict[str, tuple] = {
+    lane: (
+        int(os.getenv(f"INFERENCE_{lane.upper()}_WORKERS", str(workers))),
+        int(os.getenv(f"INFERENCE_{lane.upper()}_QUEUE", str(queue_limit))),
+        float(os.getenv(f"INFERENCE_{lane.upper()}_DEADLINE_MS", str(deadline_ms))),
+    )
+    for lane, (workers, queue_limit, deadline_ms) in _LANE_DEFAULTS.items()
+}
+
+# Number of recent requests kept for percentile stats
+_STATS_WINDOW = 2048
+
+# Bounds of the Retry-After estimate, in seconds
+_MIN_RETRY_AFTER = 1
+_MAX_RETRY_AFTER = 30
+
+QUEUE_WAIT_SECONDS = histogram(
+    "ews_inference_queue_wait_seconds",
+    "Time inference requests waited for a lane thread",
+    ("lane",),
+)
+
+
+class InferenceRejected(Exception):
+    """Request not served by the executor; status_code is the HTTP answer"""
+
+    status_code = 503
+
+    def __init__(self, lane: str, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class InferenceOverloaded(InferenceRejected):
+    """The lane already holds workers + queue requests"""
+
+    status_code = 503
+
+
+class DeadlineExceeded(InferenceRejected):
+    """The request's deadline passed before its result was ready"""
+
+    status_code = 504
+
+
+class InferenceLane:
+    """A fixed thread pool with an admission limit and deadline checks."""
+
+    def __init__(self, name: str, workers: int, queue_limit: int, deadline_ms: float):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.deadline_ms = max(0.0, deadline_ms)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix=f"inference-{name}"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._expired = 0
+        self._timed_out = 0
+        self._service_ms: deque = deque(maxlen=_STATS_WINDOW)
+        self._queue_waits_ms: deque = deque(maxlen=_STATS_WINDOW)
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_limit
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (estimate)"""
+        with self._lock:
+            backlog = self._in_flight
+            service = (
+                sum(self._service_ms) / len(self._service_ms)
+                if self._service_ms
+                else 0.0
+            )
+        seconds = math.ceil(backlog * service / 1000.0 / self.workers)
+        return min(_MAX_RETRY_AFTER, max(_MIN_RETRY_AFTER, seconds))
+
+    def _admit(self):
+        """Count one more request in flight; raises InferenceOverloaded when full."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                full = True
+            else:
+                self._in_flight += 1
+                full = False
+        if full:
+            raise InferenceOverloaded(
+                self.name,
+                f"{self.capacity} {self.name} requests already queued or running",
+                self.retry_after(),
+            )
+
+    def submit(self, fn: Callable, args: tuple, deadline: Optional[float]) -> Future:
+        """
+        Queue fn(*args); raises InferenceOverloaded when the lane is full.
+        `deadline` is a time.monotonic() value after which the call is dropped.
+        """
+        self._admit()
+        future = self._executor.submit(self._run, fn, args, time.monotonic(), deadline)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _run(self, fn: Callable, args: tuple, enqueued: float, deadline):
+        started = time.monotonic()
+        waited_ms = (started - enqueued) * 1000.0
+        QUEUE_WAIT_SECONDS.observe(started - enqueued, self.name)
+        if deadline is not None and started >= deadline:
+            with self._lock:
+                self._expired += 1
+                self._queue_waits_ms.append(waited_ms)
+            raise DeadlineExceeded(
+                self.name,
+                f"Deadline passed after {waited_ms:.0f} ms in the {self.name} queue",
+            )
+
+        with self._lock:
+            self._running += 1
+            self._queue_waits_ms.append(waited_ms)
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._service_ms.append((time.monotonic() - started) * 1000.0)
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def _budget(self, timeout_ms: Optional[float]) -> Optional[float]:
+        """Seconds allowed: the lane's deadline, shortened by timeout_ms"""
+        budgets = [b for b in (self.deadline_ms, timeout_ms) if b is not None and b > 0]
+        return min(budgets) / 1000.0 if budgets else None
+
+    async def _await(self, future: Future, budget: Optional[float]):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), budget)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise DeadlineExceeded(
+                self.name, f"No result within the {budget * 1000.0:.0f} ms deadline"
+            ) from None
+
+    async def run(self, fn: Callable, *args, timeout_ms: Optional[float] = None):
+        """
+        Run fn(*args) on this lane and await the result. The deadline is the
+        lane's, shortened by `timeout_ms` when given.
+        """
+        budget = self._budget(timeout_ms)
+        deadline = time.monotonic() + budget if budget is not None else None
+        return await self._await(self.submit(fn, args, deadline), budget)
+
+    async def run_enqueued(
+        self, enqueue: Callable, *args, timeout_ms: Optional[float] = None
+    ):
+        """
+        Admit a request that does its work elsewhere and await the result.
+        enqueue(*args) is called on the event loop and must return a
+        concurrent Future without blocking; no lane thread is held while it
+        runs. Admission and deadline are the same as run().
+        """
+        budget = self._budget(timeout_ms)
+        self._admit()
+        with self._lock:
+            self._running += 1
+        started = time.monotonic()
+        outcome = "failed"
+        try:
+            result = await self._await(enqueue(*args), budget)
+            outcome = "completed"
+            return result
+        except DeadlineExceeded:
+            outcome = "timed_out"
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._running -= 1
+                self._service_ms.append((time.monotonic() - started) * 1000.0)
+                if outcome == "failed":
+                    self._failed += 1
+                elif outcome == "completed":
+                    self._completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            service = np.array(self._service_ms, dtype=float)
+            waits = np.array(self._queue_waits_ms, dtype=float)
+            stats = {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "deadline_ms": self.deadline_ms,
+                "in_flight": self._in_flight,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "expired_in_queue": self._expired,
+                "timed_out": self._timed_out,
+            }
+
+        def _percentiles(values: np.ndarray) -> dict:
+            if values.size == 0:
+                return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {
+                "p50": round(float(p50), 4),
+                "p95": round(float(p95), 4),
+                "p99": round(float(p99), 4),
+                "max": round(float(values.max()), 4),
+            }
+
+        stats["queue_wait_ms"] = _percentiles(waits)
+        stats["service_ms"] = _percentiles(service)
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class InferenceExecutor:
+    """The lanes of one process, created from LANE_SETTINGS"""
+
+    def __init__(self, settings: Dict[str, tuple] = LANE_SETTINGS):
+        self.lanes = {
+            name: InferenceLane(name, *lane_settings)
+            for name, lane_settings in settings.items()
+        }
+
+    def lane(self, name: str) -> InferenceLane:
+        if name not in self.lanes:
+            raise ValueError(f"Unknown inference lane: {name}")
+        return self.lanes[name]
+
+    def stats(self) -> dict:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self):
+        for lane in self.lanes.values():
+            lane.shutdown()
+
+
+_executor: Optional[InferenceExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Lazily create the process-wide inference executor"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor()
+    return _executor
+
+
+async def run_inference(
+    lane: str, fn: Callable, *args, timeout_ms: Optional[float] = None
+):
+    """Run fn(*args) on `lane`; raises InferenceRejected when shed or late."""
+    return (
+        await get_inference_executor().lane(lane).run(fn, *args, timeout_ms=timeout_ms)
+    )
+
+
+async def run_enqueued(
+    lane: str, enqueue: Callable, *args, timeout_ms: Optional[float] = None
+):
+    """Admit a request on `lane` and await the Future enqueue(*args) returns."""
+    return await (
+        get_inference_executor()
+        .lane(lane)
+        .run_enqueued(enqueue, *args, timeout_ms=timeout_ms)
+    )
+
+
+def get_inference_executor_stats() -> dict:
+    return get_inference_executor().stats()
+
+
+_LANE_GAUGES = ("in_flight", "running", "queued")
+_LANE_COUNTERS = ("completed", "failed", "rejected", "expired_in_queue", "timed_out")
+
+
+def _executor_metrics():
+    stats = get_inference_executor_stats()
+    lines = []
+    for key in _LANE_GAUGES:
+        lines += metric_family(
+            f"ews_inference_{key}",
+            "gauge",
+            f"Inference requests {key.replace('_', ' ')} per lane",
+            [({"lane": lane}, lane_stats[key]) for lane, lane_stats in stats.items()],
+        )
+    for key in _LANE_COUNTERS:
+        lines += metric_family(
+            f"ews_inference_{key}_total",
+            "counter",
+            f"Inference requests {key.replace('_', ' ')} per lane",
+            [({"lane": lane}, lane_stats[key]) for lane, lane_stats in stats.items()],
+        )
+    return lines
+
+
+register_collector(_executor_metrics)
+
+
+def shutdown_inference_executor():
+    """Cancel queued inference work (running calls finish)"""
+    if _executor is not None:
+        _executor.shutdown()
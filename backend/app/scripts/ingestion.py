@@ -0,0 +1,256 @@
+"""
+Streaming ingestion of uploaded CSV/Excel student files.
+
+Files are read in chunks of UPLOAD_CHUNK_SIZE rows so memory stays flat
+regardless of file size. Each row is validated against StudentCreate; valid
+rows in a chunk are scored with one predict_batch call and bulk-inserted
+together with their prediction logs in one transaction, after which the
+BatchUpload row is updated with progress. Invalid rows are recorded in the
+batch's error_log (capped at UPLOAD_MAX_ERRORS entries) and never abort the
+batch.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+from uuid import UUID
+
+from pydantic import ValidationError
+
+from ..database.db import SessionLocal
+from ..database.crud import (
+    insert_students_with_logs,
+    prediction_log_row,
+    student_row,
+)
+from ..database.schema import StudentCreate
+from ..models import BatchUpload
+from .prediction import predict_batch
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "5000"))
+UPLOAD_MAX_ERRORS: int = int(os.getenv("UPLOAD_MAX_ERRORS", "1000"))
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+
+# Header spellings accepted in addition to the StudentCreate field names
+_COLUMN_ALIASES = {"previous_qualification_(grade)": "previous_qualification_grade"}
+
+
+def _normalize_column(name) -> str:
+    column = str(name).strip().lower().replace(" ", "_")
+    return _COLUMN_ALIASES.get(column, column)
+
+
+def _iter_csv(path: str, chunk_size: int) -> Iterator[List[dict]]:
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, chunksize=chunk_size, skipinitialspace=True):
+        chunk.columns = [_normalize_column(c) for c in chunk.columns]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield chunk.to_dict("records")
+
+
+def _iter_xlsx(path: str, chunk_size: int) -> Iterator[List[dict]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise RuntimeError(
+            "Reading .xlsx uploads requires openpyxl (pip install openpyxl)"
+        ) from e
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_normalize_column(c) for c in header]
+        chunk = []
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            chunk.append(dict(zip(columns, values)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+
+def _iter_xls(path: str, chunk_size: int) -> Iterator[List[dict]]:
+    # Legacy .xls has no streaming reader; the sheet is loaded once, then chunked
+    import pandas as pd
+
+    frame = pd.read_excel(path)
+    frame.columns = [_normalize_column(c) for c in frame.columns]
+    frame = frame.astype(object).where(frame.notna(), None)
+    for start in range(0, len(frame), chunk_size):
+        yield frame.iloc[start : start + chunk_size].to_dict("records")
+
+
+def iter_row_chunks(
+    path: str, filename: str, chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Iterator[List[dict]]:
+    """Yield the file's data rows as lists of column -> value dicts"""
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == ".csv":
+        return _iter_csv(path, chunk_size)
+    if extension == ".xlsx":
+        return _iter_xlsx(path, chunk_size)
+    if extension == ".xls":
+        return _iter_xls(path, chunk_size)
+    raise ValueError(f"Unsupported file type: {extension or filename}")
+
+
+def _row_errors(row_number: int, error: ValidationError) -> dict:
+    return {
+        "row": row_number,
+        "errors": [
+            {
+                "field": ".".join(str(part) for part in detail["loc"]),
+                "message": detail["msg"],
+            }
+            for detail in error.errors()
+        ],
+    }
+
+
+class _ErrorLog:
+    """Row errors kept for the batch, capped at UPLOAD_MAX_ERRORS entries"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.entries: List[dict] = []
+        self.truncated = False
+
+    def add(self, entry: dict):
+        if len(self.entries) < self.limit:
+            self.entries.append(entry)
+        else:
+            self.truncated = True
+
+    def to_json(self) -> Optional[str]:
+        if not self.entries and not self.truncated:
+            return None
+        return json.dumps({"errors": self.entries, "truncated": self.truncated})
+
+
+def _insert_rows_singly(db, rows: List[tuple], errors) -> int:
+    """
+    Insert (row_number, student_row, log_row) entries one savepoint at a
+    time, so a row the database rejects costs only that row. Returns the
+    number inserted.
+    """
+    inserted = 0
+    for row_number, values, log_values in rows:
+        try:
+            with db.begin_nested():
+                insert_students_with_logs(db, [values], [log_values])
+            inserted += 1
+        except Exception as e:
+            errors.add(
+                {
+                    "row": row_number,
+                    "errors": [{"field": "row", "message": f"not inserted: {e}"}],
+                }
+            )
+    db.commit()
+    return inserted
+
+
+def _process_chunk(db, batch: BatchUpload, rows: List[dict], first_row: int, errors):
+    """Validate, score and insert one chunk; returns (successful, failed)"""
+    valid, row_numbers = [], []
+    for offset, row in enumerate(rows):
+        if not row.get("uploaded_by"):
+            row["uploaded_by"] = batch.uploaded_by
+        try:
+            valid.append(StudentCreate.model_validate(row))
+            row_numbers.append(first_row + offset)
+        except ValidationError as e:
+            errors.add(_row_errors(first_row + offset, e))
+
+    failed = len(rows) - len(valid)
+    if not valid:
+        return 0, failed
+
+    predictions = predict_batch([student.model_dump() for student in valid])
+
+    student_rows, log_rows = [], []
+    for student, prediction in zip(valid, predictions):
+        values = student_row(student, prediction)
+        student_rows.append(values)
+        log_rows.append(
+            prediction_log_row(values["id"], prediction, student.uploaded_by)
+        )
+
+    try:
+        insert_students_with_logs(db, student_rows, log_rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        # Retry row by row so one bad row does not cost its neighbours
+        logger.warning(
+            f"Upload {batch.id}: bulk insert at row {first_row} failed, "
+            f"retrying per row: {e}"
+        )
+        inserted = _insert_rows_singly(
+            db, list(zip(row_numbers, student_rows, log_rows)), errors
+        )
+        return inserted, len(rows) - inserted
+
+    return len(valid), failed
+
+
+def process_upload(batch_id: UUID, path: str, filename: str):
+    """
+    Ingest an uploaded file into students/prediction_logs, recording
+    progress on its BatchUpload row. Runs as a background task and removes
+    the temporary file when done.
+    """
+    db = SessionLocal()
+    errors = _ErrorLog(UPLOAD_MAX_ERRORS)
+    try:
+        batch = db.get(BatchUpload, batch_id)
+        if batch is None:
+            logger.error(f"Upload {batch_id} not found")
+            return
+
+        # Row numbers match the spreadsheet view: the header is row 1
+        next_row = 2
+        try:
+            for rows in iter_row_chunks(path, filename):
+                successful, failed = _process_chunk(db, batch, rows, next_row, errors)
+                next_row += len(rows)
+
+                batch.total_records += len(rows)
+                batch.successful_records += successful
+                batch.failed_records += failed
+                batch.error_log = errors.to_json()
+                db.commit()
+            batch.status = "completed"
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Upload {batch_id} failed: {e}")
+            errors.add({"row": None, "errors": [{"field": "file", "message": str(e)}]})
+            batch.status = "failed"
+
+        batch.error_log = errors.to_json()
+        batch.completed_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.info(
+            f"Upload {batch_id} {batch.status}: {batch.successful_records} inserted, "
+            f"{batch.failed_records} failed"
+        )
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,176 @@
+"""
+Background job state shared by all server workers.
+
+Explanation jobs and re-scores run on a thread of the worker that accepted
+them, but the pre-fork server (app/serve.py) sends the status polls to any
+worker. Each job's client-facing state is therefore written to the
+background_jobs table on every change, and workers that do not own a job
+read it from there.
+
+With JOB_STATE_DB=false the state stays in the owning process, which is only
+correct with a single worker; app/serve.py refuses to fork more than one.
+Database errors never fail a job: they are logged and the job continues with
+its in-process state.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+JOB_STATE_DB: bool = os.getenv("JOB_STATE_DB", "true").lower() == "true"
+
+
+def save_job(job_id: str, kind: str, state: dict):
+    """Insert or replace the shared state of one job"""
+    if not JOB_STATE_DB:
+        return
+    try:
+        from ..database.db import SessionLocal
+        from ..models import BackgroundJob
+
+        db = SessionLocal()
+        try:
+            db.merge(
+                BackgroundJob(
+                    id=job_id,
+                    kind=kind,
+                    status=state.get("status", "unknown"),
+                    state=json.dumps(state),
+                    updated_at=datetime.now(timezone.utc),
+                )
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    except Exception as e:
+        logger.warning(f"Could not save {kind} job {job_id} state: {e}")
+
+
+def load_job(job_id: str, kind: str) -> Optional[dict]:
+    """The shared state of one job, or None if unknown (or unavailable)"""
+    if not JOB_STATE_DB:
+        return None
+    try:
+        from ..database.db import SessionLocal
+        from ..models import BackgroundJob
+
+        db = SessionLocal()
+        try:
+            state = (
+                db.query(BackgroundJob.state)
+                .filter(BackgroundJob.id == job_id, BackgroundJob.kind == kind)
+                .scalar()
+            )
+        finally:
+            db.close()
+    except Exception as e:
+        logger.warning(f"Could not load {kind} job {job_id} state: {e}")
+        return None
+    return json.loads(state) if state is not None else None
+
+
+def claim_job(
+    job_id: str,
+    kind: str,
+    state: dict,
+    active_statuses: Iterable[str],
+    stale_after: float,
+) -> bool:
+    """
+    Take the singleton job `job_id` for this process: False if another
+    process holds it in one of `active_statuses` and updated it within
+    `stale_after` seconds (a job left running by a dead worker goes stale).
+    """
+    if not JOB_STATE_DB:
+        return True
+    try:
+        from ..database.db import SessionLocal
+        from ..models import BackgroundJob
+
+        now = datetime.now(timezone.utc)
+        values = {
+            "status": state.get("status", "unknown"),
+            "state": json.dumps(state),
+            "updated_at": now,
+        }
+        db = SessionLocal()
+        try:
+            # One conditional UPDATE, so two workers cannot both claim the row
+            claimed = (
+                db.query(BackgroundJob)
+                .filter(
+                    BackgroundJob.id == job_id,
+                    or_(
+                        BackgroundJob.status.notin_(list(active_statuses)),
+                        BackgroundJob.updated_at < now - timedelta(seconds=stale_after),
+                    ),
+                )
+                .update(values, synchronize_session=False)
+            )
+            if not claimed:
+                exists = (
+                    db.query(BackgroundJob.id)
+                    .filter(BackgroundJob.id == job_id)
+                    .first()
+                )
+                if exists is not None:
+                    db.rollback()
+                    return False
+                db.add(BackgroundJob(id=job_id, kind=kind, **values))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker inserted the row first
+                db.rollback()
+                return False
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    except Exception as e:
+        logger.warning(f"Could not claim {kind} job {job_id}: {e}")
+        return True
+
+
+def purge_jobs(kind: str, done_statuses: Iterable[str], older_than: float) -> int:
+    """Delete finished jobs of `kind` last updated more than `older_than` s ago"""
+    if not JOB_STATE_DB:
+        return 0
+    try:
+        from ..database.db import SessionLocal
+        from ..models import BackgroundJob
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+        db = SessionLocal()
+        try:
+            deleted = (
+                db.query(BackgroundJob)
+                .filter(
+                    BackgroundJob.kind == kind,
+                    BackgroundJob.status.in_(list(done_statuses)),
+                    BackgroundJob.updated_at < cutoff,
+                )
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return deleted
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    except Exception as e:
+        logger.warning(f"Could not purge {kind} jobs: {e}")
+        return 0
@@ -0,0 +1,529 @@
+"""
+Versioned model artifacts and hot reload.
+
+app/models/manifest.json lists every model version and its artifacts
+(paths relative to the manifest):
+
+    {
+      "active": "nn_b_model_v1",
+      "versions": {
+        "nn_b_model_v1": {
+          "model": "nn_b_model.pkl",
+          "numpy_model": "nn_b_model.npz",
+          "scaler": "scaler.pkl",
+          "background": "background_data.pkl",
+          "xgboost_model": "best_b_xgb_model.json"
+        }
+      }
+    }
+
+A ModelBundle holds everything loaded for one version (model, fused
+preprocessor, SHAP background). Request code takes the active bundle once and
+uses it for the whole request. reload() builds and warms up a new bundle off
+the request path and then replaces the active reference in one assignment, so
+requests that already hold the old bundle finish on it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from ..metrics import counter, gauge, metric_family, register_collector
+from .engines import ENGINES, InferenceEngine, get_engine_class
+from .preprocess import ALL_FEATURES, AffinePreprocessor
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR: Path = Path(__file__).parent.parent / "models"
+
+MODEL_REGISTRY_DIR: str = os.getenv("MODEL_REGISTRY_DIR", str(MODEL_DIR))
+
+# Default engine (see engines.py): "keras" loads the full TensorFlow model;
+# "numpy" loads the exported .npz weights and never imports TensorFlow;
+# "xgboost" serves the gradient-boosted trees
+INFERENCE_ENGINE: str = os.getenv("INFERENCE_ENGINE", "keras").lower()
+
+# Version served at startup; defaults to the manifest's "active" entry
+MODEL_VERSION: Optional[str] = os.getenv("MODEL_VERSION") or None
+
+# When > 0, re-read the manifest this often and follow changes to "active"
+# (keeps several workers on the version set by a persisted reload)
+MODEL_REGISTRY_POLL_SECONDS: float = float(
+    os.getenv("MODEL_REGISTRY_POLL_SECONDS", "0")
+)
+
+MANIFEST_NAME = "manifest.json"
+
+# Used when the registry directory has no manifest (pre-registry layout)
+_LEGACY_MANIFEST = {
+    "active": "nn_b_model_v1",
+    "versions": {
+        "nn_b_model_v1": {
+            "model": "nn_b_model.pkl",
+            "numpy_model": "nn_b_model.npz",
+            "scaler": "scaler.pkl",
+            "background": "background_data.pkl",
+            "xgboost_model": "best_b_xgb_model.json",
+        }
+    },
+}
+
+# SHAP background rows kept per bundle
+_MAX_BACKGROUND_ROWS = 100
+
+MODEL_LOAD_SECONDS = gauge(
+    "ews_model_load_seconds",
+    "Duration of the last load of a model version, including warm-up",
+    ("version",),
+)
+ENGINE_LOAD_SECONDS = gauge(
+    "ews_model_engine_load_seconds",
+    "Duration of the last load of an inference engine for a model version",
+    ("version", "engine"),
+)
+MODEL_LOADS = counter("ews_model_loads_total", "Model versions loaded", ("version",))
+
+
+class ModelBundle:
+    """
+    Everything needed to serve one model version.
+
+    The deployment's default engine is loaded up front; other engines listed
+    in the manifest entry are loaded on first use. Objects derived from the
+    model (engines, SHAP explainers) are built on demand with derived() and
+    live as long as the bundle, so they are dropped together with it after a
+    swap.
+    """
+
+    def __init__(self, version: str, spec: dict, directory: Path, engine: str):
+        self.version = version
+        self.spec = spec
+        self.engine = get_engine_class(engine).name
+        self.loaded_at: Optional[float] = None
+        self._directory = directory
+        self._derived: Dict[str, object] = {}
+        self._derived_lock = threading.Lock()
+
+        self.preprocessor = AffinePreprocessor(self._load("scaler"))
+        self.background: Optional[np.ndarray] = None
+        self.background_version: Optional[str] = None
+        if spec.get("background"):
+            self._load_background()
+        self.get_engine()
+
+    def _path(self, key: str) -> str:
+        if not self.spec.get(key):
+            raise RuntimeError(f"Model version {self.version} has no {key} artifact")
+        return str(self._directory / self.spec[key])
+
+    def _load(self, key: str):
+        path = self._path(key)
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load {key} from {path}: {e}") from e
+
+    def _load_background(self):
+        background = self._load("background")
+        columns = getattr(background, "columns", None)
+        if columns is not None and set(ALL_FEATURES) <= set(columns):
+            # Saved in dataset column order; the model matrix uses ALL_FEATURES
+            background = background[ALL_FEATURES]
+        background = np.asarray(background, dtype=np.float32)
+        if background.ndim == 1:
+            background = background.reshape(1, -1)
+        self.background = background[:_MAX_BACKGROUND_ROWS]
+        self.background_version = hashlib.sha256(
+            np.ascontiguousarray(self.background).tobytes()
+        ).hexdigest()[:12]
+
+    def available_engines(self) -> List[str]:
+        """Engines this version has an artifact for."""
+        return [
+            name for name, engine in ENGINES.items() if self.spec.get(engine.artifact)
+        ]
+
+    def get_engine(self, name: Optional[str] = None) -> InferenceEngine:
+        """The loaded (and warmed-up) engine `name`, default: the deployment's."""
+        engine = get_engine_class(name or self.engine)
+
+        def load():
+            started = time.perf_counter()
+            loaded = engine.load(self._path(engine.artifact))
+            loaded.predict_proba(self.preprocessor.transform([{}]))
+            ENGINE_LOAD_SECONDS.set(
+                time.perf_counter() - started, self.version, engine.name
+            )
+            return loaded
+
+        return self.derived(f"engine:{engine.name}", load)
+
+    def model_tag(self, engine: Optional[str] = None) -> str:
+        """Recorded as PredictionLog.model_version for `engine`'s predictions."""
+        return model_tag(self.version, engine or self.engine)
+
+    def predict_proba(
+        self,
+        X: np.ndarray,
+        batch_size: Optional[int] = None,
+        engine: Optional[str] = None,
+    ):
+        """[dropout, graduate] probabilities for a preprocessed float32 matrix."""
+        return self.get_engine(engine).predict_proba(X, batch_size)
+
+    def derived(self, name: str, factory: Callable[[], object]) -> object:
+        """Build (once) and return an object tied to this bundle's model."""
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = factory()
+                    self._derived[name] = value
+        return value
+
+    def warm_up(self):
+        """Run a forward pass so the first real request does not pay for it."""
+        rows = self.preprocessor.transform([{}])
+        if self.background is not None:
+            rows = np.vstack([rows, np.asarray(self.background, dtype=np.float32)])
+        self.predict_proba(rows)
+        self.loaded_at = time.time()
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "engine": self.engine,
+            "engines": self.available_engines(),
+            "loaded_engines": sorted(
+                name[len("engine:") :]
+                for name in self._derived
+                if name.startswith("engine:")
+            ),
+            "loaded_at": (
+                datetime.fromtimestamp(self.loaded_at, timezone.utc).isoformat()
+                if self.loaded_at
+                else None
+            ),
+            "background_version": self.background_version,
+        }
+
+
+class ModelRegistry:
+    """
+    Reads the manifest, owns the active bundle and performs reloads.
+
+    get_active() is a plain attribute read; only loading and swapping take
+    the lock. Reload hooks run after every swap with the new bundle.
+    """
+
+    def __init__(
+        self,
+        directory: str = MODEL_REGISTRY_DIR,
+        engine: str = INFERENCE_ENGINE,
+        startup_version: Optional[str] = MODEL_VERSION,
+    ):
+        self.directory = Path(directory)
+        self.engine = engine
+        self.startup_version = startup_version
+        self._active: Optional[ModelBundle] = None
+        self._lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self._hooks: List[Callable[[ModelBundle], None]] = []
+        self._warmers: List[Callable[[ModelBundle], None]] = []
+        self._poller: Optional[threading.Thread] = None
+        self._manifest_mtime: Optional[float] = None
+
+        self.reloads = 0
+        self.reloading: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / MANIFEST_NAME
+
+    def manifest(self) -> dict:
+        """Current manifest contents (the legacy layout if there is no file)."""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return json.loads(json.dumps(_LEGACY_MANIFEST))
+        except (OSError, ValueError) as e:
+            raise RuntimeError(
+                f"Failed to read model manifest {self.manifest_path}: {e}"
+            ) from e
+
+    def _write_manifest(self, manifest: dict):
+        """Write the manifest atomically (write + rename)"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+        os.replace(tmp_path, self.manifest_path)
+
+    def spec(self, version: str) -> dict:
+        """Manifest entry for `version`; KeyError if it is not registered."""
+        versions = self.manifest().get("versions", {})
+        if version not in versions:
+            raise KeyError(f"Unknown model version: {version}")
+        return versions[version]
+
+    def artifacts_modified_at(
+        self, version: str, engine: Optional[str] = None
+    ) -> float:
+        """
+        Latest modification time (epoch seconds) of the files that score
+        `version` with `engine`: the scaler and the engine's artifact. Changes
+        when an artifact is replaced in place under the same version.
+        """
+        spec = self.spec(version)
+        keys = ("scaler", get_engine_class(engine or self.engine).artifact)
+        mtimes = [
+            (self.directory / spec[key]).stat().st_mtime
+            for key in keys
+            if spec.get(key) and (self.directory / spec[key]).exists()
+        ]
+        return max(mtimes, default=0.0)
+
+    def load_bundle(self, version: str) -> ModelBundle:
+        """Load and warm up `version` without making it active."""
+        started = time.perf_counter()
+        bundle = ModelBundle(version, self.spec(version), self.directory, self.engine)
+        bundle.warm_up()
+        for warmer in list(self._warmers):
+            warmer(bundle)
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - started, version)
+        MODEL_LOADS.inc(version)
+        return bundle
+
+    @property
+    def active(self) -> Optional[ModelBundle]:
+        """The active bundle, or None before the first load (never loads)."""
+        return self._active
+
+    def get_active(self) -> ModelBundle:
+        """The bundle new requests should use (loaded on first call)."""
+        bundle = self._active
+        if bundle is None:
+            bundle = self.preload()
+        if self._poller is None:
+            self._start_poller()
+        return bundle
+
+    def preload(self) -> ModelBundle:
+        """
+        Load the active bundle without starting any background thread; the
+        pre-fork server (app/serve.py) calls this in the parent process.
+        """
+        with self._lock:
+            if self._active is None:
+                version = self.startup_version or self.manifest()["active"]
+                self._active = self.load_bundle(version)
+                self._manifest_mtime = self._current_mtime()
+            return self._active
+
+    def _after_fork(self):
+        # Only the forking thread survives fork(); a child starts its own
+        # poller and reloads, and must not inherit a lock held by another thread
+        self._lock = threading.Lock()
+        self._poller = None
+        self._reload_thread = None
+        self.reloading = None
+
+    def get_bundle(self, version: Optional[str] = None) -> ModelBundle:
+        """The active bundle if it serves `version`, otherwise a fresh load."""
+        active = self.get_active()
+        if version is None or version == active.version:
+            return active
+        return self.load_bundle(version)
+
+    def register_reload_hook(self, hook: Callable[[ModelBundle], None]):
+        self._hooks.append(hook)
+
+    def register_warmer(self, warmer: Callable[[ModelBundle], None]):
+        """Extra warm-up run on every loaded bundle before it can be served."""
+        if warmer not in self._warmers:
+            self._warmers.append(warmer)
+
+    def reload(self, version: Optional[str] = None, persist: bool = False):
+        """
+        Load `version` (default: the manifest's active entry), warm it up and
+        make it active. With persist=True the manifest's active entry is
+        updated too, so restarts and polling workers pick the same version.
+        """
+        manifest = self.manifest()
+        version = version or manifest["active"]
+        self.spec(version)
+
+        self.reloading = version
+        started = time.perf_counter()
+        try:
+            bundle = self.load_bundle(version)
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            logger.error(f"Model reload to {version} failed: {e}")
+            raise
+        finally:
+            self.reloading = None
+
+        with self._lock:
+            previous = self._active
+            self._active = bundle
+            self.reloads += 1
+            self.last_error = None
+            if persist and manifest.get("active") != version:
+                manifest["active"] = version
+                self._write_manifest(manifest)
+            self._manifest_mtime = self._current_mtime()
+
+        for hook in list(self._hooks):
+            try:
+                hook(bundle)
+            except Exception as e:
+                logger.warning(f"Model reload hook {hook!r} failed: {e}")
+
+        logger.info(
+            f"Model version {version} active "
+            f"(was {previous.version if previous else None}, "
+            f"loaded in {time.perf_counter() - started:.2f}s)"
+        )
+        return bundle
+
+    def reload_async(self, version: Optional[str] = None, persist: bool = False):
+        """
+        reload() on a background thread. Returns False if a reload is
+        already running; raises KeyError for a version not in the manifest.
+        """
+        self.spec(version or self.manifest()["active"])
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+
+            def run():
+                try:
+                    self.reload(version, persist)
+                except Exception:
+                    pass  # recorded in last_error
+
+            self._reload_thread = threading.Thread(
+                target=run, name="model-reload", daemon=True
+            )
+            self._reload_thread.start()
+            return True
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return self.manifest_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def _start_poller(self):
+        if MODEL_REGISTRY_POLL_SECONDS <= 0 or self._poller is not None:
+            return
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self._poll, name="model-registry-poller", daemon=True
+                )
+                self._poller.start()
+
+    def _poll(self):
+        while True:
+            time.sleep(MODEL_REGISTRY_POLL_SECONDS)
+            mtime = self._current_mtime()
+            if mtime is None or mtime == self._manifest_mtime:
+                continue
+            self._manifest_mtime = mtime
+            try:
+                version = self.manifest()["active"]
+                if version != self._active.version:
+                    self.reload(version)
+            except Exception as e:
+                logger.warning(f"Model manifest poll failed: {e}")
+
+    def status(self) -> dict:
+        active = self._active
+        try:
+            manifest = self.manifest()
+        except RuntimeError as e:
+            manifest = {"error": str(e)}
+        return {
+            "active": active.describe() if active else None,
+            "manifest_active": manifest.get("active"),
+            "versions": sorted(manifest.get("versions", {})),
+            "engine": self.engine,
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+def model_tag(version: str, engine: str = INFERENCE_ENGINE) -> str:
+    """
+    Model identifier for predictions of `version` served by `engine`. The
+    keras and numpy engines run the same network and share the version name;
+    other engines serve a different model and are tagged "<version>:<engine>".
+    """
+    engine = get_engine_class(engine).name
+    return version if engine in ("keras", "numpy") else f"{version}:{engine}"
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Lazily create the process-wide registry from the configured settings"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def _reset_registry_after_fork():
+    if _registry is not None:
+        _registry._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_registry_after_fork)
+
+
+def _registry_metrics():
+    registry = get_registry()
+    active = registry.active
+    return metric_family(
+        "ews_model_active_info",
+        "gauge",
+        "Model version and engine serving new requests",
+        [({"version": active.version, "engine": active.engine}, 1)] if active else [],
+    ) + metric_family(
+        "ews_model_reloads_total",
+        "counter",
+        "Model versions swapped in since startup",
+        [({}, registry.reloads)],
+    )
+
+
+register_collector(_registry_metrics)
+
+
+def get_active_bundle() -> ModelBundle:
+    return get_registry().get_active()
+
+
+def get_model_version() -> str:
+    """Version of the model currently serving new requests"""
+    return get_active_bundle().version
@@ -0,0 +1,219 @@
+"""
+Pure-NumPy inference for the dense student-risk network.
+
+The Keras model in nn_b_model.pkl is a stack of Dense, BatchNormalization and
+Dropout layers. At inference time Dropout is the identity and each
+BatchNormalization is a fixed per-unit affine transform, which can be folded
+into the Dense layer that follows it. What remains is a short list of
+(weights, bias, activation) triples that NumPy evaluates directly, so serving
+processes never need to import TensorFlow.
+
+Build the artifact once (requires TensorFlow/Keras):
+
+    cd backend && python -m app.scripts.numpy_engine --verify
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MODEL_DIR: Path = Path(__file__).parent.parent / "models"
+
+KERAS_MODEL_PATH: str = str(MODEL_DIR / "nn_b_model.pkl")
+NUMPY_MODEL_PATH: str = str(MODEL_DIR / "nn_b_model.npz")
+
+Layer = Tuple[np.ndarray, np.ndarray, str]
+
+
+def _relu(x: np.ndarray) -> np.ndarray:
+    return np.maximum(x, 0.0, out=x)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "softmax": _softmax,
+}
+
+
+class NumpyModel:
+    """
+    Forward pass over folded dense layers.
+
+    Exposes the same predict(X, verbose=0) call as the Keras model so it can
+    be swapped in wherever the Keras model is used (including SHAP).
+    """
+
+    def __init__(self, layers: List[Layer]):
+        if not layers:
+            raise ValueError("NumpyModel needs at least one layer")
+        for _, _, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+        self.layers = [
+            (
+                np.ascontiguousarray(weights, dtype=np.float32),
+                np.ascontiguousarray(bias, dtype=np.float32),
+                activation,
+            )
+            for weights, bias, activation in layers
+        ]
+        self.input_dim = self.layers[0][0].shape[0]
+
+    def predict(self, X, verbose: int = 0, batch_size: Optional[int] = None):
+        """Return class probabilities for a 2D input (array or DataFrame)."""
+        x = np.asarray(X, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        for weights, bias, activation in self.layers:
+            x = x @ weights
+            x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    __call__ = predict
+
+    def save(self, path: str):
+        """Write the folded layers to a compact .npz artifact."""
+        arrays = {}
+        for i, (weights, bias, _) in enumerate(self.layers):
+            arrays[f"W{i}"] = weights
+            arrays[f"b{i}"] = bias
+        arrays["activations"] = np.array([layer[2] for layer in self.layers])
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyModel":
+        """Load an artifact written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(a) for a in data["activations"]]
+            layers = [
+                (data[f"W{i}"], data[f"b{i}"], activation)
+                for i, activation in enumerate(activations)
+            ]
+        return cls(layers)
+
+
+def _to_numpy(variable) -> np.ndarray:
+    """Read a Keras variable (or plain array) as float64 NumPy"""
+    if hasattr(variable, "numpy"):
+        variable = variable.numpy()
+    return np.asarray(variable, dtype=np.float64)
+
+
+def fold_keras_model(model) -> NumpyModel:
+    """
+    Convert a Sequential Dense/BatchNormalization/Dropout model into a
+    NumpyModel, folding each BatchNormalization into the next Dense layer.
+    """
+    layers: List[Layer] = []
+    # Pending per-unit affine (scale, shift) from a BatchNormalization layer
+    pending: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+
+        if kind in ("InputLayer", "Dropout", "Flatten"):
+            continue
+
+        if kind == "Dense":
+            weights = layer.get_weights()
+            kernel = np.asarray(weights[0], dtype=np.float64)
+            bias = (
+                np.asarray(weights[1], dtype=np.float64)
+                if layer.use_bias
+                else np.zeros(kernel.shape[1])
+            )
+            if pending is not None:
+                scale, shift = pending
+                bias = shift @ kernel + bias
+                kernel = scale[:, None] * kernel
+                pending = None
+            layers.append((kernel, bias, layer.activation.__name__))
+            continue
+
+        if kind == "BatchNormalization":
+            if layer.axis not in (-1, [-1], 1, [1]):
+                raise ValueError(f"Unsupported BatchNormalization axis: {layer.axis}")
+            mean = _to_numpy(layer.moving_mean)
+            variance = _to_numpy(layer.moving_variance)
+            gamma = _to_numpy(layer.gamma) if layer.scale else np.ones_like(mean)
+            beta = _to_numpy(layer.beta) if layer.center else np.zeros_like(mean)
+            scale = gamma / np.sqrt(variance + layer.epsilon)
+            shift = beta - mean * scale
+            if pending is not None:
+                prev_scale, prev_shift = pending
+                scale, shift = prev_scale * scale, prev_shift * scale + shift
+            pending = (scale, shift)
+            continue
+
+        raise ValueError(f"Unsupported layer for NumPy export: {kind}")
+
+    if pending is not None:
+        scale, shift = pending
+        layers.append((np.diag(scale), shift, "linear"))
+
+    return NumpyModel(layers)
+
+
+def load_numpy_model(path: str = NUMPY_MODEL_PATH) -> NumpyModel:
+    """Load the exported NumPy model, with a hint if it has not been built."""
+    if not Path(path).exists():
+        raise FileNotFoundError(
+            f"{path} not found - build it with `python -m app.scripts.numpy_engine`"
+        )
+    return NumpyModel.load(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Export nn_b_model.pkl to a NumPy .npz inference artifact"
+    )
+    parser.add_argument("--model", default=KERAS_MODEL_PATH, help="Keras model pickle")
+    parser.add_argument("--output", default=NUMPY_MODEL_PATH, help="Output .npz path")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Compare probabilities against Keras on the SHAP background data",
+    )
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    keras_model = joblib.load(args.model)
+    numpy_model = fold_keras_model(keras_model)
+    numpy_model.save(args.output)
+    print(f"Exported {len(numpy_model.layers)} dense layers to {args.output}")
+
+    if args.verify:
+        background = np.asarray(
+            joblib.load(str(MODEL_DIR / "background_data.pkl")), dtype=np.float32
+        )
+        expected = keras_model.predict(background, verbose=0)
+        actual = NumpyModel.load(args.output).predict(background)
+        max_diff = float(np.abs(expected - actual).max())
+        print(f"Max |keras - numpy| probability difference: {max_diff:.3e}")
+        if max_diff > 1e-5:
+            print("Verification failed: outputs differ by more than 1e-5")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,59 +1,108 @@
-import joblib
 import numpy as np
-from .preprocess import preprocess_input
-from pathlib import Path
-from typing import Optional
+import os
+from ..metrics import stage_timer
+from .model_registry import ModelBundle, get_active_bundle
+from .preprocess import raw_feature_vector
+from typing import List, Optional
 
-MODEL_DIR: Path = Path(__file__).parent.parent / "models"
+# Dropout probability cut-offs for the risk categories
+HIGH_RISK_THRESHOLD: float = 0.75
+LOW_RISK_THRESHOLD: float = 0.50
 
-MODEL_PATH: str = str(MODEL_DIR / "nn_b_model.pkl")
+# Rows per forward pass in predict_batch (Keras defaults to 32)
+PREDICT_BATCH_SIZE: int = int(os.getenv("PREDICT_BATCH_SIZE", "4096"))
 
-_model: Optional[object] = None
+
+def _categorize_risk(dropout_prob: float) -> str:
+    """Map a dropout probability onto the low/medium/high risk categories."""
+    if dropout_prob >= HIGH_RISK_THRESHOLD:
+        return "high"
+    elif dropout_prob < LOW_RISK_THRESHOLD:
+        return "low"
+    else:
+        return "medium"
 
 
-def _get_model():
-    """Lazy load the model on first use"""
-    global _model
-    if _model is None:
-        try:
-            import tensorflow as tf
+def _format_prediction(y_proba: np.ndarray, model_version: str, engine: str) -> dict:
+    """Build the prediction response for one row of class probabilities."""
+    y_pred = int(np.argmax(y_proba))
 
-            _model = joblib.load(MODEL_PATH)
-        except Exception as e:
-            raise RuntimeError(f"Failed to load model from {MODEL_PATH}: {e}") from e
-    return _model
+    label = "Graduate" if y_pred == 1 else "Dropout"
 
+    dropout_prob = float(y_proba[0])
 
-def predict(user_input: dict) -> dict:
+    return {
+        "prediction": y_pred,
+        "label": label,
+        "probability": {"dropout": dropout_prob, "graduate": float(y_proba[1])},
+        "risk_category": _categorize_risk(dropout_prob),
+        "model_version": model_version,
+        "engine": engine,
+    }
+
+
+def predict(
+    user_input: dict,
+    bundle: Optional[ModelBundle] = None,
+    engine: Optional[str] = None,
+) -> dict:
     """
     Returns model prediction for a single input along with probability.
-    Keras model outputs probabilities for each class (softmax output).
+    Every engine outputs probabilities for each class (see engines.py).
+    Uses the active registry version and the deployment's engine unless a
+    bundle or engine is given; the result's model_version and engine name
+    what actually scored it. The prediction cache (prediction_cache.py) is
+    consulted by the callers, not here.
 
     Prediction labels:
     - 0: Dropout
     - 1: Graduate
     """
-    model = _get_model()
-    X_input = preprocess_input(user_input)
+    bundle = bundle or get_active_bundle()
+    model = bundle.get_engine(engine)
+    model_version = bundle.model_tag(model.name)
 
-    y_proba = model.predict(X_input, verbose=0)[0]
+    with stage_timer("preprocess"):
+        X_input = bundle.preprocessor.transform_raw(raw_feature_vector(user_input))
 
-    y_pred = int(np.argmax(y_proba))
+    with stage_timer("model_predict"):
+        y_proba = model.predict_proba(X_input)[0]
 
-    label = "Graduate" if y_pred == 1 else "Dropout"
+    return _format_prediction(y_proba, model_version, model.name)
 
-    dropout_prob = float(y_proba[0])
 
-    if dropout_prob >= 0.75:
-        risk_category = "high"
-    elif dropout_prob < 0.50:
-        risk_category = "low"
-    else:
-        risk_category = "medium"
+def predict_batch(
+    user_inputs: List[dict],
+    bundle: Optional[ModelBundle] = None,
+    engine: Optional[str] = None,
+) -> List[dict]:
+    """
+    Returns model predictions for a list of inputs, in input order.
 
-    return {
-        "prediction": y_pred,
-        "label": label,
-        "probability": {"dropout": dropout_prob, "graduate": float(y_proba[1])},
-        "risk_category": risk_category,
-    }
+    The whole batch is preprocessed into one float32 matrix and scored with a
+    single forward pass; each row matches what predict() returns for that input.
+    """
+    if not user_inputs:
+        return []
+
+    bundle = bundle or get_active_bundle()
+    return predict_matrix(bundle.preprocessor.transform(user_inputs), bundle, engine)
+
+
+def predict_matrix(
+    X_input: np.ndarray,
+    bundle: Optional[ModelBundle] = None,
+    engine: Optional[str] = None,
+) -> List[dict]:
+    """
+    Scores an already preprocessed model matrix, for callers that also feed
+    it to the explainer and should not transform the inputs twice.
+    """
+    bundle = bundle or get_active_bundle()
+    model = bundle.get_engine(engine)
+
+    with stage_timer("model_predict"):
+        y_proba = model.predict_proba(X_input, batch_size=PREDICT_BATCH_SIZE)
+
+    model_version = bundle.model_tag(model.name)
+    return [_format_prediction(row, model_version, model.name) for row in y_proba]
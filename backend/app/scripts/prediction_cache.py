@@ -0,0 +1,180 @@
+"""
+Bounded LRU/TTL cache of prediction results.
+
+Dashboards, simulations and re-runs send the same inputs again and again.
+A repeat is answered from here without preprocessing or a forward pass.
+The key is the validated input in canonical form plus the model tag that
+scores it, always built by prediction_key(). Each request path looks the
+cache up once, at its outermost entry point, so hit_rate counts requests.
+The canonical form is raw_feature_vector: the ten feature values in model
+column order, with flags and gender already 0/1. The whole cache is cleared
+when a model reload swaps in a new version.
+"""
+
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..metrics import metric_family, register_collector
+from .model_registry import ModelBundle, get_registry
+from .preprocess import raw_feature_vector
+
+PREDICTION_CACHE_ENABLED: bool = (
+    os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+)
+PREDICTION_CACHE_SIZE: int = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+# Entries older than this are recomputed (0 = keep until evicted or reloaded)
+PREDICTION_CACHE_TTL_SECONDS: float = float(
+    os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300")
+)
+
+
+def prediction_key(user_input: dict, model_tag: str) -> Tuple:
+    """Canonical key for `user_input` scored by the model tagged `model_tag`"""
+    return (model_tag, *raw_feature_vector(user_input))
+
+
+class PredictionCache:
+    """
+    In-process LRU of prediction dicts with an optional time-to-live.
+    Values are deep-copied in and out, so callers may mutate what they get.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max(1, max_entries)
+        self.ttl = max(0.0, ttl)
+        self._entries: "OrderedDict[Tuple, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple) -> Optional[dict]:
+        """A copy of the cached prediction, or None (counted as a miss)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: Tuple, prediction: dict):
+        expires = time.monotonic() + self.ttl
+        prediction = copy.deepcopy(prediction)
+        with self._lock:
+            self._entries[key] = (expires, prediction)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "enabled": PREDICTION_CACHE_ENABLED,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+_cache: Optional[PredictionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Lazily create the process-wide prediction cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache(
+                    max_entries=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL_SECONDS
+                )
+    return _cache
+
+
+def cached_prediction(
+    user_input: dict,
+    engine: Optional[str] = None,
+    bundle: Optional[ModelBundle] = None,
+) -> Optional[dict]:
+    """
+    Cached result for `user_input` under `bundle` (default: the active model
+    version), or None. Never loads a model, so it is safe on the event loop.
+    """
+    bundle = bundle or get_registry().active
+    if not PREDICTION_CACHE_ENABLED or bundle is None:
+        return None
+    return get_prediction_cache().get(
+        prediction_key(user_input, bundle.model_tag(engine))
+    )
+
+
+def remember_prediction(user_input: dict, prediction: dict):
+    """Cache `prediction` under the model version that produced it"""
+    if PREDICTION_CACHE_ENABLED:
+        get_prediction_cache().put(
+            prediction_key(user_input, prediction["model_version"]), prediction
+        )
+
+
+def _invalidate_predictions(bundle: ModelBundle):
+    # Keys carry the model tag, so old entries could never be hit again;
+    # clearing frees them right away
+    get_prediction_cache().clear()
+
+
+get_registry().register_reload_hook(_invalidate_predictions)
+
+
+def get_prediction_cache_stats() -> dict:
+    """Hit rate, size and eviction counters for the prediction cache"""
+    return get_prediction_cache().stats()
+
+
+def _cache_metrics():
+    stats = get_prediction_cache_stats()
+    lines = metric_family(
+        "ews_prediction_cache_entries",
+        "gauge",
+        "Predictions held in the cache",
+        [({}, stats["size"])],
+    )
+    for key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        lines += metric_family(
+            f"ews_prediction_cache_{key}_total",
+            "counter",
+            f"Prediction cache {key}",
+            [({}, stats[key])],
+        )
+    return lines
+
+
+register_collector(_cache_metrics)
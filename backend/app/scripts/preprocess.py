@@ -1,27 +1,8 @@
-import joblib
+import numpy as np
 import pandas as pd
-from pathlib import Path
-from typing import Optional
-
-MODEL_DIR: Path = Path(__file__).parent.parent / "models"
-
-PREPROCESSOR_PATH: str = str(MODEL_DIR / "scaler.pkl")
-
-_scaler: Optional[object] = None
-
-
-def _get_scaler():
-    """Lazy load the scaler on first use"""
-    global _scaler
-    if _scaler is None:
-        try:
-            _scaler = joblib.load(PREPROCESSOR_PATH)
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to load scaler from {PREPROCESSOR_PATH}: {e}"
-            ) from e
-    return _scaler
+from typing import List, Optional, Union
 
+from ..metrics import stage_timer
 
 NUM_FEATURES = [
     "Total_units_approved",
@@ -34,108 +15,151 @@ NUM_FEATURES = [
 BINARY_FEATURES = ["Tuition_fees_up_to_date", "Scholarship_holder", "Debtor", "Gender"]
 
 
-def preprocess_input(user_input: dict) -> pd.DataFrame:
+ALL_FEATURES = NUM_FEATURES + BINARY_FEATURES
+
+# Per-feature input handling, in model column order:
+# (user key, dataset key, default, user range max, dataset range max, kind).
+# Numeric features are linearly mapped from the user range onto the original
+# dataset range before scaling:
+# - Units approved: 0-20 (user input) → 0-23 (dataset range)
+# - Average grade: 0-100 (percentage) → 0-18 (dataset range)
+# - Age: stays as is
+# - Units evaluated: 0-20 (user input) → 0-33 (dataset range)
+# - Units enrolled: 0-20 (user input) → 0-23 (dataset range)
+# - Previous qualification: 0-100 (percentage) → 0-190 (dataset range)
+FEATURE_SPECS = [
+    ("total_units_approved", "Total_units_approved", 0, 20.0, 23.0, "units"),
+    ("average_grade", "Average_grade", 50, 100.0, 18.0, "percentage"),
+    ("age_at_enrollment", "Age_at_enrollment", 20, 1.0, 1.0, "raw"),
+    ("total_units_evaluated", "Total_units_evaluated", 0, 20.0, 33.0, "units"),
+    ("total_units_enrolled", "Total_units_enrolled", 0, 20.0, 23.0, "units"),
+    (
+        "previous_qualification_grade",
+        "Previous_qualification_(grade)",
+        70,
+        100.0,
+        190.0,
+        "percentage",
+    ),
+    ("tuition_fees_up_to_date", "Tuition_fees_up_to_date", 1, 1.0, 1.0, "binary"),
+    ("scholarship_holder", "Scholarship_holder", 1, 1.0, 1.0, "binary"),
+    ("debtor", "Debtor", 0, 1.0, 1.0, "binary"),
+    ("gender", "Gender", 0, 1.0, 1.0, "binary"),
+]
+
+
+def _raw_value(value, kind: str) -> float:
     """
-    Transforms user-friendly input into a format suitable for the model.
+    Coerce one user value to a float in user units.
 
-    Mapping from user input ranges to original dataset ranges:
-    - Average grade: 0-100 (percentage) → 0-18 (dataset range)
-    - Units evaluated: 0-20 (user input) → 0-45 (dataset range)
-    - Units approved: 0-20 (user input) → 0-43 (dataset range)
-    - Units enrolled: 0-20 (user input) → 0-26 (dataset range)
-    - Age: 17-70 (stays as is)
-    - Previous qualification: 0-100 (percentage) → 0-190 (dataset range)
+    Unparseable units fall back to 0 and unparseable percentages to the middle
+    of the range; binary flags go through int() so bad values still raise.
     """
+    if kind == "binary":
+        return float(int(value))
+    if kind == "raw":
+        return float(value)
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0 if kind == "units" else 50.0
 
-    def percentage_to_dataset_range(
-        percentage_value, max_user_range=100.0, max_dataset_range=18.0
-    ):
-        """
-        Convert percentage from user range to dataset range.
-        Formula: (percentage / max_user_range) * max_dataset_range
 
-        Args:
-            percentage_value: The percentage value from user input
-            max_user_range: Maximum value in user input range (default: 100.0 for percentages)
-            max_dataset_range: Maximum value in dataset range (default: 18.0 for average grade)
-        """
-        try:
-            percentage = float(percentage_value)
-            return (percentage / max_user_range) * max_dataset_range
-        except (ValueError, TypeError):
-            return max_dataset_range / 2.0  # Default to middle of range
+def raw_feature_vector(user_input: dict) -> List[float]:
+    """
+    Extract the 10 model features from a user input dict, in model column
+    order and still in user units (before range mapping and scaling).
+    Accepts both snake_case and dataset-style keys.
+    """
+    return [
+        _raw_value(user_input.get(user_key, user_input.get(dataset_key, default)), kind)
+        for user_key, dataset_key, default, _, _, kind in FEATURE_SPECS
+    ]
+
+
+class AffinePreprocessor:
+    """
+    Range mapping and StandardScaler folded into one affine transform.
+
+    For numeric features the model input is
+        ((x / user_max) * dataset_max - mean) / std
+    which is x * scale + offset with scale = dataset_max / (user_max * std)
+    and offset = -mean / std. Binary features pass through (scale 1, offset 0).
+    """
 
-    def units_to_dataset_range(units_value, max_user_range, max_dataset_range):
+    def __init__(self, scaler):
+        mean = getattr(scaler, "mean_", None)
+        std = getattr(scaler, "scale_", None)
+        mean = np.zeros(len(NUM_FEATURES)) if mean is None else np.asarray(mean)
+        std = np.ones(len(NUM_FEATURES)) if std is None else np.asarray(std)
+
+        names = getattr(scaler, "feature_names_in_", None)
+        if names is not None:
+            order = [list(names).index(name) for name in NUM_FEATURES]
+            mean, std = mean[order], std[order]
+
+        scale = np.ones(len(ALL_FEATURES), dtype=np.float64)
+        offset = np.zeros(len(ALL_FEATURES), dtype=np.float64)
+        for i, (_, _, _, user_max, dataset_max, _) in enumerate(
+            FEATURE_SPECS[: len(NUM_FEATURES)]
+        ):
+            scale[i] = dataset_max / (user_max * std[i])
+            offset[i] = -mean[i] / std[i]
+
+        self.scale = scale
+        self.offset = offset
+
+    def transform_raw(self, raw: np.ndarray) -> np.ndarray:
+        """Apply the affine transform to raw user-unit rows."""
+        raw = np.asarray(raw, dtype=np.float64)
+        if raw.ndim == 1:
+            raw = raw.reshape(1, -1)
+        return (raw * self.scale + self.offset).astype(np.float32)
+
+    def transform(self, inputs: Union[dict, List[dict], np.ndarray]) -> np.ndarray:
         """
-        Convert units from user range to dataset range.
-        Formula: (units / max_user_range) * max_dataset_range
+        Accepts a dict, a list of dicts or an array of raw user-unit values
+        (n x 10, model column order) and returns a float32 model matrix.
         """
-        try:
-            units = float(units_value)
-            return (units / max_user_range) * max_dataset_range
-        except (ValueError, TypeError):
-            return 0.0
-
-    processed_input = {
-        "Total_units_approved": units_to_dataset_range(
-            user_input.get(
-                "total_units_approved", user_input.get("Total_units_approved", 0)
-            ),
-            max_user_range=20.0,
-            max_dataset_range=23.0,
-        ),
-        "Average_grade": percentage_to_dataset_range(
-            user_input.get("average_grade", user_input.get("Average_grade", 50)),
-            max_user_range=100.0,
-            max_dataset_range=18.0,
-        ),
-        "Age_at_enrollment": user_input.get(
-            "age_at_enrollment", user_input.get("Age_at_enrollment", 20)
-        ),
-        "Total_units_evaluated": units_to_dataset_range(
-            user_input.get(
-                "total_units_evaluated", user_input.get("Total_units_evaluated", 0)
-            ),
-            max_user_range=20.0,
-            max_dataset_range=33.0,
-        ),
-        "Total_units_enrolled": units_to_dataset_range(
-            user_input.get(
-                "total_units_enrolled", user_input.get("Total_units_enrolled", 0)
-            ),
-            max_user_range=20.0,
-            max_dataset_range=23.0,
-        ),
-        "Previous_qualification_(grade)": percentage_to_dataset_range(
-            user_input.get(
-                "previous_qualification_grade",
-                user_input.get("Previous_qualification_(grade)", 70),
-            ),
-            max_user_range=100.0,
-            max_dataset_range=190.0,
-        ),
-    }
-    processed_input["Tuition_fees_up_to_date"] = int(
-        user_input.get(
-            "tuition_fees_up_to_date", user_input.get("Tuition_fees_up_to_date", 1)
-        )
-    )
-    processed_input["Scholarship_holder"] = int(
-        user_input.get("scholarship_holder", user_input.get("Scholarship_holder", 1))
-    )
-    processed_input["Debtor"] = int(
-        user_input.get("debtor", user_input.get("Debtor", 0))
-    )
-    processed_input["Gender"] = int(
-        user_input.get("gender", user_input.get("Gender", 0))
-    )
-
-    input_df = pd.DataFrame([processed_input])
-
-    scaler = _get_scaler()
-    input_df[NUM_FEATURES] = scaler.transform(input_df[NUM_FEATURES])
-
-    all_features = NUM_FEATURES + BINARY_FEATURES
-    input_df = input_df[all_features]
-
-    return input_df
+        with stage_timer("preprocess"):
+            if isinstance(inputs, dict):
+                raw = [raw_feature_vector(inputs)]
+            elif isinstance(inputs, np.ndarray):
+                raw = inputs
+            else:
+                raw = [raw_feature_vector(user_input) for user_input in inputs]
+            if len(raw) == 0:
+                return np.empty((0, len(ALL_FEATURES)), dtype=np.float32)
+            return self.transform_raw(raw)
+
+
+def preprocess_array(
+    inputs: Union[dict, List[dict], np.ndarray],
+    preprocessor: Optional[AffinePreprocessor] = None,
+) -> np.ndarray:
+    """
+    Transforms user-friendly input into a float32 model matrix without pandas.
+    See AffinePreprocessor.transform for the accepted input shapes. Uses the
+    scaler of the active model version unless a preprocessor is given.
+    """
+    if preprocessor is None:
+        from .model_registry import get_active_bundle
+
+        preprocessor = get_active_bundle().preprocessor
+    return preprocessor.transform(inputs)
+
+
+def preprocess_input(user_input: dict) -> pd.DataFrame:
+    """
+    Transforms user-friendly input into a format suitable for the model.
+    Returns a one-row frame with the model column names.
+    """
+    return preprocess_batch([user_input])
+
+
+def preprocess_batch(user_inputs: List[dict]) -> pd.DataFrame:
+    """
+    Transforms a list of user-friendly inputs into a single model-ready frame,
+    one row per input.
+    """
+    return pd.DataFrame(preprocess_array(user_inputs), columns=ALL_FEATURES)
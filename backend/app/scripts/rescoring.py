@@ -0,0 +1,497 @@
+"""
+Re-score stored students after the model or scaler changes.
+
+Students are streamed in primary-key order, RESCORE_CHUNK_SIZE at a time.
+Each chunk is scored with one predict_batch call and written back in a
+single transaction: a bulk UPDATE of the stored scores, a PredictionLog row
+per student tagged with the model version, and the matching rollup
+adjustments. Students that already have a log for the target model version
+written after its artifacts last changed are skipped (NOT EXISTS on
+prediction_logs), so a run can be repeated or interrupted safely, and an
+artifact replaced in place under the same version is picked up without
+--force.
+
+With more than one worker, the UUID key space is split into equal ranges
+and each range is handled by its own spawned process. Progress is written to
+a JSON checkpoint after every chunk; a later run for the same model version,
+artifacts, worker count and --force setting resumes from it.
+
+    python db_manager.py rescore --workers 4
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import exists
+
+from ..database.db import SessionLocal, engine
+from ..database.crud import (
+    prediction_log_row,
+    student_model_input,
+    update_student_scores,
+)
+from ..models import PredictionLog, Student
+from .prediction import predict_batch
+from .job_state import claim_job, load_job, save_job
+from .model_registry import get_model_version, get_registry
+
+logger = logging.getLogger(__name__)
+
+RESCORE_CHUNK_SIZE: int = int(os.getenv("RESCORE_CHUNK_SIZE", "5000"))
+RESCORE_WORKERS: int = int(os.getenv("RESCORE_WORKERS", "1"))
+RESCORE_CHECKPOINT_PATH: str = os.getenv(
+    "RESCORE_CHECKPOINT_PATH", "rescore_checkpoint.json"
+)
+
+# A running re-score whose shared state is older than this is presumed dead
+# (its worker exited) and may be started again
+RESCORE_STALE_SECONDS: float = float(os.getenv("RESCORE_STALE_SECONDS", "600"))
+
+# PredictionLog.created_by for logs written by this job
+RESCORE_CREATED_BY = "rescoring_job"
+
+# Id and kind of the single re-score row in the shared job table
+_JOB_ID = "rescore"
+_JOB_KIND = "rescore"
+_ACTIVE_STATUSES = ("starting", "running")
+
+_UUID_SPACE = 1 << 128
+
+_FEATURE_COLUMNS = (
+    Student.total_units_approved,
+    Student.average_grade,
+    Student.age_at_enrollment,
+    Student.total_units_evaluated,
+    Student.total_units_enrolled,
+    Student.previous_qualification_grade,
+    Student.tuition_fees_up_to_date,
+    Student.scholarship_holder,
+    Student.debtor,
+    Student.gender,
+)
+
+
+def uuid_partitions(count: int) -> List[Tuple[Optional[UUID], Optional[UUID]]]:
+    """Split the UUID key space into `count` equal [lower, upper) ranges"""
+    count = max(1, count)
+    bounds = [UUID(int=(_UUID_SPACE * i) // count) for i in range(count)]
+    return [
+        (
+            None if i == 0 else bounds[i],
+            None if i == count - 1 else bounds[i + 1],
+        )
+        for i in range(count)
+    ]
+
+
+def _fetch_chunk(
+    db,
+    lower: Optional[UUID],
+    upper: Optional[UUID],
+    after: Optional[UUID],
+    model_version: str,
+    chunk_size: int,
+    force: bool,
+    scored_after: Optional[float] = None,
+):
+    query = db.query(
+        Student.id, Student.created_at, Student.risk_category, *_FEATURE_COLUMNS
+    )
+    if lower is not None:
+        query = query.filter(Student.id >= lower)
+    if upper is not None:
+        query = query.filter(Student.id < upper)
+    if after is not None:
+        query = query.filter(Student.id > after)
+    if not force:
+        scored = [
+            PredictionLog.student_id == Student.id,
+            PredictionLog.model_version == model_version,
+        ]
+        if scored_after:
+            # Logs from before the artifacts changed came from the old files
+            scored.append(
+                PredictionLog.created_at
+                >= datetime.fromtimestamp(scored_after, timezone.utc)
+            )
+        query = query.filter(~exists().where(*scored))
+    return query.order_by(Student.id).limit(chunk_size).all()
+
+
+def rescore_partition(
+    index: int,
+    lower: Optional[UUID],
+    upper: Optional[UUID],
+    model_version: str,
+    after: Optional[UUID] = None,
+    chunk_size: int = RESCORE_CHUNK_SIZE,
+    force: bool = False,
+    scored_after: Optional[float] = None,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Re-score the students with lower <= id < upper, starting after `after`,
+    with the registry artifacts of `model_version`. `scored_after` is the
+    artifacts' modification time; older logs do not count as scored. Calls
+    progress() after each committed chunk.
+    """
+    # Pinned for the whole range, even if the served model is reloaded
+    bundle = get_registry().get_bundle(model_version)
+    if scored_after and bundle.loaded_at and scored_after > bundle.loaded_at:
+        # Artifacts replaced since the serving bundle loaded: use the new files
+        bundle = get_registry().load_bundle(model_version)
+    db = SessionLocal()
+    totals = {"rescored": 0, "changed": 0}
+    try:
+        while True:
+            rows = _fetch_chunk(
+                db,
+                lower,
+                upper,
+                after,
+                bundle.model_tag(),
+                chunk_size,
+                force,
+                scored_after,
+            )
+            if not rows:
+                break
+
+            predictions = predict_batch(
+                [student_model_input(row) for row in rows], bundle
+            )
+            scored_at = datetime.now(timezone.utc)
+
+            score_rows, log_rows, changes = [], [], []
+            for row, prediction in zip(rows, predictions):
+                score_rows.append(
+                    {
+                        "id": row.id,
+                        "risk_score": prediction["probability"]["dropout"],
+                        "risk_category": prediction["risk_category"],
+                        "last_prediction_date": scored_at,
+                    }
+                )
+                log_rows.append(
+                    prediction_log_row(row.id, prediction, RESCORE_CREATED_BY)
+                )
+                changes.append(
+                    (row.created_at, row.risk_category, prediction["risk_category"])
+                )
+
+            try:
+                update_student_scores(db, score_rows, log_rows, changes)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+            after = rows[-1].id
+            changed = sum(1 for _, old, new in changes if old != new)
+            totals["rescored"] += len(rows)
+            totals["changed"] += changed
+            if progress is not None:
+                progress(
+                    {
+                        "partition": index,
+                        "last_id": str(after),
+                        "rescored": len(rows),
+                        "changed": changed,
+                    }
+                )
+        return totals
+    finally:
+        db.close()
+
+
+def _partition_worker(
+    index, lower, upper, model_version, after, chunk_size, force, scored_after, messages
+):
+    """Entry point of a spawned worker process"""
+    try:
+        rescore_partition(
+            index,
+            lower,
+            upper,
+            model_version,
+            after,
+            chunk_size,
+            force,
+            scored_after,
+            progress=messages.put,
+        )
+        messages.put({"partition": index, "done": True})
+    except Exception as e:
+        messages.put({"partition": index, "error": str(e)})
+
+
+def _load_checkpoint(
+    path: str,
+    model_version: str,
+    workers: int,
+    force: bool,
+    artifacts_modified_at: float,
+) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable re-score checkpoint {path}: {e}")
+        return None
+
+    if checkpoint.get("status") == "completed":
+        return None
+    if (
+        checkpoint.get("model_version") != model_version
+        or len(checkpoint.get("partitions", [])) != workers
+    ):
+        logger.warning(
+            f"Checkpoint {path} is for {checkpoint.get('model_version')} with "
+            f"{len(checkpoint.get('partitions', []))} workers; starting over"
+        )
+        return None
+    if bool(checkpoint.get("force")) != force:
+        # force changes which rows are selected, so the saved positions do not apply
+        logger.warning(
+            f"Checkpoint {path} was written with force={checkpoint.get('force')}; "
+            "starting over"
+        )
+        return None
+    if checkpoint.get("artifacts_modified_at") != artifacts_modified_at:
+        logger.warning(
+            f"Checkpoint {path} predates a change to the {model_version} "
+            "artifacts; starting over"
+        )
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(path: str, state: dict):
+    """Write the checkpoint atomically (write + rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_rescore(
+    model_version: Optional[str] = None,
+    workers: int = RESCORE_WORKERS,
+    chunk_size: int = RESCORE_CHUNK_SIZE,
+    checkpoint_path: Optional[str] = RESCORE_CHECKPOINT_PATH,
+    force: bool = False,
+    resume: bool = True,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Re-score every student not yet scored by the current artifacts of
+    `model_version` (a registry version; default: the serving model). Returns
+    the final job state, also written to the checkpoint. on_progress receives
+    the state after every chunk. Raises KeyError for a version missing from
+    the manifest.
+    """
+    model_version = model_version or get_model_version()
+    get_registry().spec(model_version)
+    workers = max(1, workers)
+    if workers > 1 and engine.dialect.name == "sqlite":
+        # SQLite has a single writer, so parallel workers only add lock waits
+        logger.warning("SQLite database: re-scoring with a single worker")
+        workers = 1
+
+    scored_after = get_registry().artifacts_modified_at(model_version)
+    checkpoint = None
+    if resume and checkpoint_path:
+        checkpoint = _load_checkpoint(
+            checkpoint_path, model_version, workers, force, scored_after
+        )
+
+    if checkpoint is not None:
+        state = checkpoint
+        logger.info(f"Resuming re-score for {model_version} from {checkpoint_path}")
+    else:
+        state = {
+            "model_version": model_version,
+            "force": force,
+            "artifacts_modified_at": scored_after,
+            "partitions": [
+                {
+                    "index": i,
+                    "lower": str(lower) if lower else None,
+                    "upper": str(upper) if upper else None,
+                    "last_id": None,
+                    "status": "pending",
+                    "rescored": 0,
+                    "changed": 0,
+                }
+                for i, (lower, upper) in enumerate(uuid_partitions(workers))
+            ],
+        }
+    state.update({"status": "running", "started_at": time.time(), "finished_at": None})
+
+    def record(message: dict):
+        partition = state["partitions"][message["partition"]]
+        if "error" in message:
+            partition["status"] = "failed"
+            partition["error"] = message["error"]
+            logger.error(
+                f"Re-score partition {partition['index']} failed: {message['error']}"
+            )
+        elif message.get("done"):
+            partition["status"] = "completed"
+        else:
+            partition["status"] = "running"
+            partition["last_id"] = message["last_id"]
+            partition["rescored"] += message["rescored"]
+            partition["changed"] += message["changed"]
+        state["rescored"] = sum(p["rescored"] for p in state["partitions"])
+        state["changed"] = sum(p["changed"] for p in state["partitions"])
+        if checkpoint_path:
+            _save_checkpoint(checkpoint_path, state)
+        if on_progress is not None:
+            on_progress(state)
+
+    pending = [p for p in state["partitions"] if p["status"] != "completed"]
+    for partition in pending:
+        partition["status"] = "pending"
+        partition.pop("error", None)
+    jobs = [
+        (
+            p["index"],
+            UUID(p["lower"]) if p["lower"] else None,
+            UUID(p["upper"]) if p["upper"] else None,
+            model_version,
+            UUID(p["last_id"]) if p["last_id"] else None,
+            chunk_size,
+            force,
+            scored_after,
+        )
+        for p in pending
+    ]
+
+    if workers == 1:
+        for job in jobs:
+            try:
+                rescore_partition(*job, progress=record)
+                record({"partition": job[0], "done": True})
+            except Exception as e:
+                record({"partition": job[0], "error": str(e)})
+    else:
+        # spawn: workers must not inherit the parent's DB connections or
+        # TensorFlow state; each opens its own pool and loads the model once
+        context = multiprocessing.get_context("spawn")
+        messages = context.Queue()
+        processes = [
+            context.Process(
+                target=_partition_worker,
+                args=(*job, messages),
+                name=f"rescore-{job[0]}",
+            )
+            for job in jobs
+        ]
+        for process in processes:
+            process.start()
+
+        finished = set()
+
+        def handle(message: dict):
+            record(message)
+            if message.get("done") or "error" in message:
+                finished.add(message["partition"])
+
+        while len(finished) < len(processes):
+            try:
+                handle(messages.get(timeout=1.0))
+                continue
+            except queue.Empty:
+                pass
+            # A worker that died without reporting (e.g. killed) fails its range
+            dead = [
+                (job[0], process)
+                for job, process in zip(jobs, processes)
+                if job[0] not in finished and not process.is_alive()
+            ]
+            if dead:
+                while True:
+                    try:
+                        handle(messages.get(timeout=0.5))
+                    except queue.Empty:
+                        break
+                for index, process in dead:
+                    if index not in finished:
+                        handle(
+                            {
+                                "partition": index,
+                                "error": f"worker exited with code {process.exitcode}",
+                            }
+                        )
+
+        for process in processes:
+            process.join()
+
+    failed = any(p["status"] == "failed" for p in state["partitions"])
+    state["status"] = "failed" if failed else "completed"
+    state["finished_at"] = time.time()
+    state["elapsed_seconds"] = round(state["finished_at"] - state["started_at"], 2)
+    state.setdefault("rescored", 0)
+    state.setdefault("changed", 0)
+    if checkpoint_path:
+        _save_checkpoint(checkpoint_path, state)
+    logger.info(
+        f"Re-score for {model_version} {state['status']}: {state['rescored']} "
+        f"students re-scored, {state['changed']} changed category, "
+        f"{state['elapsed_seconds']}s"
+    )
+    return state
+
+
+_job_state: Optional[dict] = None
+_job_thread: Optional[threading.Thread] = None
+_job_lock = threading.Lock()
+
+
+def start_rescore_job(**kwargs) -> bool:
+    """
+    Run run_rescore on a background thread (admin endpoint). Returns False
+    if a re-score is already running in this or any other server worker.
+    """
+    global _job_state, _job_thread
+    with _job_lock:
+        if _job_thread is not None and _job_thread.is_alive():
+            return False
+        starting = {"status": "starting"}
+        if not claim_job(
+            _JOB_ID, _JOB_KIND, starting, _ACTIVE_STATUSES, RESCORE_STALE_SECONDS
+        ):
+            return False
+        _job_state = starting
+
+        def progress(state: dict):
+            global _job_state
+            _job_state = json.loads(json.dumps(state))
+            save_job(_JOB_ID, _JOB_KIND, _job_state)
+
+        def run():
+            try:
+                progress(run_rescore(on_progress=progress, **kwargs))
+            except Exception as e:
+                logger.error(f"Re-score job failed: {e}")
+                progress({"status": "failed", "error": str(e)})
+
+        _job_thread = threading.Thread(target=run, name="rescore-job", daemon=True)
+        _job_thread.start()
+        return True
+
+
+def get_rescore_status() -> Optional[dict]:
+    """State of the current or last re-score, started by any server worker"""
+    return load_job(_JOB_ID, _JOB_KIND) or _job_state
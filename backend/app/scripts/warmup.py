@@ -0,0 +1,143 @@
+"""
+Opt-in model warm-up at startup, and the readiness state behind /ready.
+
+Without warm-up, the first request after a deploy pays for the TensorFlow
+import, model unpickling, graph tracing and explainer construction. With
+MODEL_WARMUP=true, startup loads the active model version on a background
+thread. It then runs predictions at a few batch sizes and one explanation per
+configured engine, and starts the prediction batcher and explanation workers.
+/ready reports not-ready until that has finished, while /health keeps
+answering.
+
+The same warm-up is registered with the model registry, so a hot reload warms
+the new version before it is swapped in.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import List, Optional
+
+from .model_registry import ModelBundle, get_registry
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "false").lower() == "true"
+
+# Engines to preload (comma separated); default: the deployment's engine
+MODEL_WARMUP_ENGINES: List[str] = [
+    engine.strip().lower()
+    for engine in os.getenv("MODEL_WARMUP_ENGINES", "").split(",")
+    if engine.strip()
+]
+
+# Also build the SHAP explainers and run one explanation per engine
+MODEL_WARMUP_EXPLANATIONS: bool = (
+    os.getenv("MODEL_WARMUP_EXPLANATIONS", "true").lower() == "true"
+)
+
+# Batch shapes run through predict_batch (Keras traces a graph per shape)
+_WARMUP_BATCH_SIZES = (1, 64)
+
+_state: dict = {"status": "disabled" if not MODEL_WARMUP else "pending"}
+_state_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def _set_state(**values):
+    global _state
+    with _state_lock:
+        _state = {**_state, **values}
+
+
+def warm_bundle(bundle: ModelBundle) -> List[str]:
+    """
+    Preload every configured engine of `bundle` and exercise prediction and
+    explanation once; returns the engines warmed. Prediction failures
+    propagate. Explanation failures are only logged, since explanations have
+    fallbacks.
+    """
+    warmed = getattr(bundle, "warmed_engines", None)
+    if warmed is not None:
+        return warmed
+
+    from .prediction import predict_batch
+    from .explainability import explain_instance
+
+    engines = MODEL_WARMUP_ENGINES or [bundle.engine]
+    for engine in engines:
+        started = time.perf_counter()
+        for size in _WARMUP_BATCH_SIZES:
+            predict_batch([{}] * size, bundle, engine)
+        if MODEL_WARMUP_EXPLANATIONS:
+            try:
+                explain_instance(bundle.preprocessor.transform([{}]), bundle, engine)
+            except Exception as e:
+                logger.warning(
+                    f"Explanation warm-up for {bundle.version}/{engine} failed: {e}"
+                )
+        logger.info(
+            f"Warmed up {bundle.version}/{engine} in "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+    bundle.warmed_engines = engines
+    return engines
+
+
+def _run():
+    started = time.perf_counter()
+    _set_state(status="warming", started_at=time.time())
+    try:
+        bundle = get_registry().get_active()
+        engines = warm_bundle(bundle)
+
+        from .batching import BATCHING_ENABLED, get_batcher
+        from .explanation_jobs import get_job_manager
+
+        if BATCHING_ENABLED:
+            get_batcher().start()
+        get_job_manager()
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {e}")
+        _set_state(
+            status="failed",
+            error=str(e),
+            finished_at=time.time(),
+            seconds=round(time.perf_counter() - started, 3),
+        )
+        return
+
+    _set_state(
+        status="ready",
+        model_version=bundle.version,
+        engines=engines,
+        finished_at=time.time(),
+        seconds=round(time.perf_counter() - started, 3),
+    )
+    logger.info(f"Model warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+def start_warmup() -> bool:
+    """
+    Start the background warm-up (called from the startup event). Returns
+    False when MODEL_WARMUP is off or a warm-up has already been started.
+    """
+    global _thread
+    if not MODEL_WARMUP:
+        return False
+    get_registry().register_warmer(warm_bundle)
+    with _state_lock:
+        if _thread is not None:
+            return False
+        _thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+    _thread.start()
+    return True
+
+
+def get_warmup_state() -> dict:
+    """Warm-up status; "ready" means warm-up is done or was not requested"""
+    with _state_lock:
+        state = dict(_state)
+    state["ready"] = state["status"] in ("ready", "disabled")
+    return state
@@ -0,0 +1,426 @@
+"""
+Pre-fork multi-worker server.
+
+    cd backend && python -m app.serve --workers 8
+
+The parent process imports the app and loads the active model version once:
+engine weights, the fused scaler, the SHAP background and, with
+MODEL_WARMUP=true, the warmed-up engines and explainers. It then freezes the
+garbage collector so those objects are not written again, binds the listening
+socket and forks the workers. The workers share these memory pages
+copy-on-write instead of each loading its own copy. The parent serves no
+requests. It restarts workers that die and stops all of them on SIGTERM or
+SIGINT.
+
+GET /admin/workers reports RSS and PSS for the parent and every worker.
+With SERVE_MEMORY_REPORT_SECONDS > 0 the parent also logs them periodically.
+PSS splits shared pages between the processes that map them, so the sum of
+PSS is the real footprint. Each added worker should only add roughly its
+private_mb.
+
+TensorFlow is not fork-safe once its thread pools exist. With
+INFERENCE_ENGINE=keras each worker therefore loads the model itself after
+the fork, and only the imports are shared.
+
+Workers share no memory after the fork. With more than one worker:
+
+- explanation job and re-score state lives in the database (job_state.py),
+  so a status poll can land on any worker; the server refuses to start with
+  JOB_STATE_DB=false;
+- /admin/models/reload always persists the version to the manifest, and
+  every worker polls the manifest (every MODEL_REGISTRY_POLL_SECONDS, or
+  SERVE_REGISTRY_POLL_SECONDS when that is 0), so all of them, including
+  restarted ones, load the same version.
+"""
+
+import os
+import gc
+import sys
+import time
+import json
+import signal
+import socket
+import logging
+import argparse
+from typing import Dict, List, Optional
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SERVE_HOST: str = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT: int = int(os.getenv("PORT", "8000"))
+
+# Worker processes (WEB_CONCURRENCY is the usual platform setting)
+SERVE_WORKERS: int = int(
+    os.getenv("SERVE_WORKERS", os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+)
+
+# Load the model in the parent before forking (shared copy-on-write)
+SERVE_PRELOAD: bool = os.getenv("SERVE_PRELOAD", "true").lower() == "true"
+
+# Seconds workers get to finish in-flight requests on shutdown
+SERVE_GRACEFUL_TIMEOUT: float = float(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+
+# When > 0, the parent logs per-worker memory this often
+SERVE_MEMORY_REPORT_SECONDS: float = float(
+    os.getenv("SERVE_MEMORY_REPORT_SECONDS", "0")
+)
+
+# Manifest poll interval forced on workers when several of them serve
+SERVE_REGISTRY_POLL_SECONDS: float = float(
+    os.getenv("SERVE_REGISTRY_POLL_SECONDS", "5")
+)
+
+# Engines whose runtime cannot be used in a forked child once initialised
+_FORK_UNSAFE_ENGINES = ("keras",)
+
+# Workers that exit sooner than this after starting delay their restart
+_MIN_WORKER_UPTIME = 5.0
+
+# Set in the parent before forking; workers inherit them
+_parent_pid: Optional[int] = None
+_preloaded: bool = False
+_workers: int = 1
+
+
+_SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_mb",
+    "Shared_Dirty": "shared_mb",
+    "Private_Clean": "private_mb",
+    "Private_Dirty": "private_mb",
+}
+
+
+def process_memory(pid: int) -> Optional[Dict[str, float]]:
+    """
+    RSS, PSS, shared and private memory of `pid` in MB, from
+    /proc/<pid>/smaps_rollup (RSS only from /proc/<pid>/status on older
+    kernels). None if the process is gone or /proc is unavailable.
+    """
+    totals: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                key = _SMAPS_FIELDS.get(parts[0].rstrip(":"))
+                if key and len(parts) >= 2:
+                    totals[key] = totals.get(key, 0.0) + int(parts[1])
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        totals["rss_mb"] = int(line.split()[1])
+        except OSError:
+            return None
+    if not totals:
+        return None
+    return {key: round(kb / 1024.0, 1) for key, kb in totals.items()}
+
+
+def _child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return sorted(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def worker_memory_report() -> dict:
+    """
+    Memory of the serving processes: the pre-fork parent and all of its
+    workers, or just this process when it was not started by app.serve.
+    """
+    if _parent_pid is None:
+        processes = [{"pid": os.getpid(), "role": "worker"}]
+        mode = "single"
+    else:
+        processes = [{"pid": _parent_pid, "role": "parent"}] + [
+            {"pid": pid, "role": "worker"} for pid in _child_pids(_parent_pid)
+        ]
+        mode = "prefork"
+
+    report = []
+    for process in processes:
+        memory = process_memory(process["pid"])
+        if memory is not None:
+            report.append({**process, **memory})
+
+    workers = [process for process in report if process["role"] == "worker"]
+    return {
+        "mode": mode,
+        "preloaded": _preloaded,
+        "this_pid": os.getpid(),
+        "workers": len(workers),
+        "processes": report,
+        "total_rss_mb": round(sum(p.get("rss_mb", 0.0) for p in report), 1),
+        "total_pss_mb": round(sum(p.get("pss_mb", 0.0) for p in report), 1),
+        "mean_worker_private_mb": (
+            round(sum(p.get("private_mb", 0.0) for p in workers) / len(workers), 1)
+            if workers
+            else None
+        ),
+    }
+
+
+def serving_workers() -> int:
+    """Workers serving the app: the pre-fork worker count, or 1"""
+    return _workers if _parent_pid is not None else 1
+
+
+def _check_multi_worker(workers: int):
+    """Refuse process-local job state with several workers; enable polling"""
+    if workers <= 1:
+        return
+    from .scripts import model_registry
+    from .scripts.job_state import JOB_STATE_DB
+
+    if not JOB_STATE_DB:
+        raise RuntimeError(
+            "JOB_STATE_DB=false keeps explanation and re-score jobs in one "
+            "process, so polls to other workers would miss them; run with "
+            "--workers 1 or enable JOB_STATE_DB"
+        )
+    if model_registry.MODEL_REGISTRY_POLL_SECONDS <= 0:
+        # Module setting read when each worker starts its poller
+        model_registry.MODEL_REGISTRY_POLL_SECONDS = SERVE_REGISTRY_POLL_SECONDS
+        logger.info(
+            f"Polling the model manifest every {SERVE_REGISTRY_POLL_SECONDS}s "
+            "so model reloads reach every worker"
+        )
+
+
+def preload_model():
+    """
+    Load (and, with MODEL_WARMUP=true, warm up) the active model version in
+    the current process. Returns the bundle, or None when the engine is not
+    fork-safe and each worker has to load its own.
+    """
+    from .scripts.model_registry import get_registry
+    from .scripts.warmup import MODEL_WARMUP, warm_bundle
+
+    registry = get_registry()
+    if registry.engine in _FORK_UNSAFE_ENGINES:
+        logger.warning(
+            f"The {registry.engine} engine is not fork-safe; "
+            "each worker loads its own copy of the model"
+        )
+        return None
+    bundle = registry.preload()
+    if MODEL_WARMUP:
+        warm_bundle(bundle)
+    return bundle
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, log_level: str):
+    """Body of a forked worker; never returns"""
+    status = 0
+    try:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+
+        from .database.db import engine
+
+        # Connections must not be shared with the parent or other workers
+        engine.dispose(close=False)
+
+        from .main import app
+
+        config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException as e:
+        logger.error(f"Worker {os.getpid()} failed: {e}")
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+class PreforkServer:
+    """Forks `workers` uvicorn workers on one shared socket and keeps them running"""
+
+    def __init__(
+        self,
+        workers: int = SERVE_WORKERS,
+        host: str = SERVE_HOST,
+        port: int = SERVE_PORT,
+        preload: bool = SERVE_PRELOAD,
+        log_level: str = "info",
+        memory_report_seconds: float = SERVE_MEMORY_REPORT_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.preload = preload
+        self.log_level = log_level
+        self.memory_report_seconds = memory_report_seconds
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+        self._sock: Optional[socket.socket] = None
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(self._sock, self.log_level)
+        self._children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        global _parent_pid, _preloaded, _workers
+
+        # Importing the app in the parent shares the imported modules too
+        from .main import app  # noqa: F401
+
+        _check_multi_worker(self.workers)
+
+        if self.preload:
+            started = time.perf_counter()
+            _preloaded = preload_model() is not None
+            if _preloaded:
+                logger.info(
+                    f"Preloaded the model in {time.perf_counter() - started:.2f}s"
+                )
+
+        # Objects created so far are never collected, so the collector does
+        # not write to (and un-share) their pages in the workers
+        gc.collect()
+        gc.freeze()
+
+        self._sock = _bind(self.host, self.port)
+        _parent_pid = os.getpid()
+        _workers = self.workers
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info(
+            f"Serving on http://{self.host}:{self.port} with {self.workers} "
+            f"workers (parent {_parent_pid})"
+        )
+
+        for _ in range(self.workers):
+            self._spawn()
+        try:
+            self._supervise()
+        finally:
+            self._stop_workers()
+            self._sock.close()
+
+    def _supervise(self):
+        next_report = time.monotonic() + self.memory_report_seconds
+        while not self._stopping:
+            time.sleep(0.5)
+            for pid in list(self._children):
+                try:
+                    done, status = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done, status = pid, 0
+                if done == 0 or self._stopping:
+                    continue
+                uptime = time.monotonic() - self._children.pop(pid)
+                logger.warning(
+                    f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}"
+                    f" after {uptime:.1f}s; restarting"
+                )
+                if uptime < _MIN_WORKER_UPTIME:
+                    time.sleep(1.0)
+                self._spawn()
+
+            if self.memory_report_seconds > 0 and time.monotonic() >= next_report:
+                next_report = time.monotonic() + self.memory_report_seconds
+                logger.info(f"Worker memory: {json.dumps(worker_memory_report())}")
+
+    def _stop_workers(self):
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + SERVE_GRACEFUL_TIMEOUT
+        while self._children and time.monotonic() < deadline:
+            for pid in list(self._children):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    self._children.pop(pid)
+            time.sleep(0.1)
+        for pid in self._children:
+            logger.warning(f"Worker {pid} did not stop in time; killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._children.clear()
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker server")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument(
+        "--no-preload",
+        action="store_true",
+        help="Load the model in every worker instead of once in the parent",
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--memory-report-seconds",
+        type=float,
+        default=SERVE_MEMORY_REPORT_SECONDS,
+        help="Log per-worker memory this often (0 = off)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    PreforkServer(
+        workers=args.workers,
+        host=args.host,
+        port=args.port,
+        preload=SERVE_PRELOAD and not args.no_preload,
+        log_level=args.log_level,
+        memory_report_seconds=args.memory_report_seconds,
+    ).run()
+
+
+if __name__ == "__main__":
+    # Run the importable module (not __main__), so the parent state set in
+    # run() is the one the app's /admin/workers endpoint reads
+    from app import serve
+
+    serve.main()
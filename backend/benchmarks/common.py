@@ -0,0 +1,91 @@
+"""
+Helpers shared by the benchmark scripts: percentile summaries, reproducible
+prediction inputs and a database seeded with mock students.
+"""
+
+import os
+import sys
+import random
+import tempfile
+import contextlib
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentiles(values, digits: int = 4) -> dict:
+    """p50/p95/p99/max (and mean) of `values`, rounded to `digits`"""
+    import numpy as np
+
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "mean": round(float(np.mean(values)), digits),
+        "p50": round(float(p50), digits),
+        "p95": round(float(p95), digits),
+        "p99": round(float(p99), digits),
+        "max": round(float(max(values)), digits),
+    }
+
+
+def random_inputs(count: int, seed: int = 0):
+    """`count` valid prediction inputs, the same for the same seed"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "total_units_approved": int(rng.integers(0, 21)),
+            "average_grade": float(rng.uniform(0, 100)),
+            "age_at_enrollment": int(rng.integers(17, 60)),
+            "total_units_evaluated": int(rng.integers(0, 21)),
+            "total_units_enrolled": int(rng.integers(0, 21)),
+            "previous_qualification_grade": float(rng.uniform(0, 100)),
+            "tuition_fees_up_to_date": int(rng.integers(0, 2)),
+            "scholarship_holder": int(rng.integers(0, 2)),
+            "debtor": int(rng.integers(0, 2)),
+            "gender": int(rng.integers(0, 2)),
+        }
+        for _ in range(count)
+    ]
+
+
+def use_local_database(name: str = "ews_benchmark.sqlite", fresh: bool = False):
+    """
+    Point DATABASE_URL at a SQLite file in the temp directory unless one is
+    configured (e.g. an ephemeral PostgreSQL). Call before importing the app.
+    """
+    if os.getenv("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    path = Path(tempfile.gettempdir()) / name
+    if fresh and path.exists():
+        path.unlink()
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return os.environ["DATABASE_URL"]
+
+
+def seed_students(count: int, seed: int = 0) -> int:
+    """
+    Create the tables and top the database up to `count` students with
+    create_mock_data.py (seeded, so a fresh database gets the same rows).
+    Returns the number of students afterwards.
+    """
+    from app.database.db import create_tables, SessionLocal
+    from app.database.create_mock_data import create_mock_students, seed_database
+    from app.models import Student
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        existing = db.query(Student).count()
+    finally:
+        db.close()
+    if existing < count:
+        random.seed(seed)
+        # create_mock_data reports progress on stdout; keep stdout for results
+        with contextlib.redirect_stdout(sys.stderr):
+            seed_database(create_mock_students(count - existing))
+        existing = count
+    return existing
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Event-loop responsiveness under concurrent /students list queries.
+
+Fires concurrent GET /students and /students/at-risk requests at the app
+(in-process, over ASGI) while a probe coroutine measures how late the event
+loop wakes it up. With database calls offloaded to worker threads, probe lag
+stays near zero even when every query is slow; a blocking query on the loop
+shows up directly as probe lag.
+
+Runs against DATABASE_URL, or a local SQLite file seeded with mock data:
+
+    cd backend && python benchmarks/event_loop_responsiveness.py \\
+        --requests 200 --concurrency 20 --simulated-latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from common import percentiles, seed_students, use_local_database
+
+
+async def _probe(stop: asyncio.Event, interval: float, lags: list):
+    """Sleep for `interval` repeatedly and record how late each wake-up is"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - started - interval) * 1000.0)
+
+
+async def _run(args) -> dict:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    paths = ["/students?limit=100", "/students/at-risk?limit=100"]
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000.0)
+
+        stop = asyncio.Event()
+        lags: list = []
+        probe = asyncio.create_task(_probe(stop, args.probe_interval_ms / 1000.0, lags))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await probe
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "simulated_latency_ms": args.simulated_latency_ms,
+        "throughput_rps": round(args.requests / elapsed, 2),
+        "request_latency_ms": percentiles(latencies, 3),
+        "event_loop_lag_ms": percentiles(lags, 3),
+    }
+
+
+def _prepare_database(args):
+    """Point DATABASE_URL at a seeded SQLite file unless one is configured"""
+    use_local_database()
+    seed_students(args.seed)
+
+    from app.database.db import engine
+
+    if args.simulated_latency_ms > 0:
+        from sqlalchemy import event
+
+        delay = args.simulated_latency_ms / 1000.0
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _slow_query(*_):
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1000, help="Students to seed")
+    parser.add_argument(
+        "--simulated-latency-ms",
+        type=float,
+        default=20.0,
+        help="Sleep added to every query to emulate a slow database",
+    )
+    parser.add_argument("--probe-interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    _prepare_database(args)
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Latency, throughput and memory of the inference engines (keras, numpy, xgboost).
+
+Each engine is measured in its own child process, so resident memory reflects
+that engine alone (TensorFlow is never imported by the numpy or xgboost
+children). Per engine it reports the load and warm-up time, RSS before and
+after loading, single-row predict() latency, predict_batch() throughput at a
+few batch sizes, and per-row SHAP explanation latency (exact TreeSHAP for
+tree engines, the configured SHAP_ENGINE otherwise; cache bypassed).
+
+Engines whose dependencies or artifacts are missing are reported as skipped:
+
+    cd backend && python benchmarks/inference_engines.py \\
+        --engines numpy xgboost --single 2000 --batch-sizes 1000 10000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import BACKEND_DIR, percentiles, random_inputs
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def measure_engine(args) -> dict:
+    """Measurements for one engine, run inside the child process"""
+    rss_start = _rss_mb()
+
+    from app.scripts.model_registry import ModelRegistry
+    from app.scripts.prediction import predict, predict_batch
+
+    registry = ModelRegistry(engine=args.engine)
+    version = args.model_version or registry.manifest()["active"]
+
+    started = time.perf_counter()
+    bundle = registry.load_bundle(version)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = _rss_mb()
+
+    inputs = random_inputs(max(args.single, max(args.batch_sizes), args.explain))
+
+    latencies = []
+    for user_input in inputs[: args.single]:
+        started = time.perf_counter()
+        predict(user_input, bundle)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+
+    throughput = {}
+    for size in args.batch_sizes:
+        batch = inputs[:size]
+        runs = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            predict_batch(batch, bundle)
+            runs.append(time.perf_counter() - started)
+        throughput[str(size)] = round(size / min(runs), 1)
+
+    explain_ms = None
+    if args.explain > 0:
+        from app.scripts.explainability import explain_instance
+
+        rows = bundle.preprocessor.transform(inputs[: args.explain])
+        explain_instance(rows[:1], bundle)  # build the explainer
+        started = time.perf_counter()
+        explain_instance(rows, bundle)
+        explain_ms = round((time.perf_counter() - started) * 1000.0 / args.explain, 3)
+
+    return {
+        "engine": args.engine,
+        "model_version": bundle.model_tag(),
+        "load_seconds": round(load_seconds, 3),
+        "rss_mb": {
+            "start": rss_start,
+            "loaded": rss_loaded,
+            "after_run": _rss_mb(),
+            "model_delta": round(rss_loaded - rss_start, 1),
+        },
+        "single_row_latency_ms": percentiles(latencies),
+        "batch_throughput_rows_per_s": throughput,
+        "explain_ms_per_row": explain_ms,
+    }
+
+
+def _run_child(engine: str, args) -> dict:
+    command = [
+        sys.executable,
+        __file__,
+        "--child",
+        "--engines",
+        engine,
+        "--single",
+        str(args.single),
+        "--repeats",
+        str(args.repeats),
+        "--explain",
+        str(args.explain),
+        "--batch-sizes",
+        *[str(size) for size in args.batch_sizes],
+    ]
+    if args.model_version:
+        command += ["--model-version", args.model_version]
+    env = dict(os.environ, INFERENCE_ENGINE=engine)
+    result = subprocess.run(
+        command, capture_output=True, text=True, cwd=BACKEND_DIR, env=env
+    )
+    if result.returncode != 0:
+        lines = (result.stderr or result.stdout).strip().splitlines()
+        return {"engine": engine, "skipped": lines[-1] if lines else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engines", nargs="+", default=["keras", "numpy", "xgboost"])
+    parser.add_argument("--model-version", default=None)
+    parser.add_argument("--single", type=int, default=1000, help="predict() calls")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per batch size")
+    parser.add_argument(
+        "--explain", type=int, default=20, help="Rows explained (0 to skip)"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.engine = args.engines[0]
+        print(json.dumps(measure_engine(args)))
+        return
+
+    results = [_run_child(engine, args) for engine in args.engines]
+    print(json.dumps({"engines": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite with a stored baseline and a regression check.
+
+Measures throughput and p50/p95/p99 latency of:
+
+- preprocess_input: the pandas preprocessing path, one input per call
+- preprocess_array: the fused preprocessor, one input per call
+- predict: predict() for one input (prediction cache off)
+- predict_batch_<n>: predict_batch() on n inputs per call
+- predict_with_explanation: prediction plus SHAP (explanation cache off)
+- students_list, students_at_risk: GET /students and /students/at-risk
+  over ASGI, with --concurrency requests in flight
+
+Inputs come from a fixed seed. Every scenario runs --rounds timed rounds
+and keeps the median of each statistic, which damps one-off stalls. The
+database is a fresh SQLite file seeded by
+create_mock_data.py, or DATABASE_URL when set (e.g. an ephemeral PostgreSQL,
+topped up to --students rows). Results are written as JSON. With
+--baseline, every scenario the baseline also has is compared with it: a
+latency percentile more than --threshold above the baseline (and more than
+--min-delta-ms), or throughput more than --threshold below it, is a
+regression, and the exit status is 1.
+
+    cd backend && python benchmarks/suite.py --output results.json \\
+        --baseline benchmarks/baseline.json --threshold 0.2
+
+Record a new baseline on the machine that runs the comparison:
+
+    cd backend && python benchmarks/suite.py --output benchmarks/baseline.json
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+from common import (
+    BACKEND_DIR,
+    percentiles,
+    random_inputs,
+    seed_students,
+    use_local_database,
+)
+
+SCENARIOS = [
+    "preprocess_input",
+    "preprocess_array",
+    "predict",
+    "predict_batch",
+    "predict_with_explanation",
+    "students_list",
+    "students_at_risk",
+]
+
+# Compared with the baseline; latencies must not rise, throughput not fall
+_LATENCY_KEYS = ("p50", "p95", "p99")
+
+
+def _median_of_rounds(rounds: list) -> dict:
+    """One result from several rounds: the median of every statistic"""
+    import numpy as np
+
+    result = dict(rounds[0])
+    result["rounds"] = len(rounds)
+    result["throughput_per_s"] = round(
+        float(np.median([r["throughput_per_s"] for r in rounds])), 1
+    )
+    result["latency_ms"] = {
+        key: round(float(np.median([r["latency_ms"][key] for r in rounds])), 4)
+        for key in rounds[0]["latency_ms"]
+    }
+    return result
+
+
+def _measure(fn, iterations: int, warmup: int, rounds: int, items: int = 1) -> dict:
+    """Call fn(i) `iterations` times per round after `warmup` calls; time each"""
+    for i in range(warmup):
+        fn(i)
+    results = []
+    for _ in range(rounds):
+        gc.collect()
+        latencies = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            call_started = time.perf_counter()
+            fn(i)
+            latencies.append((time.perf_counter() - call_started) * 1000.0)
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "iterations": iterations,
+                "items_per_call": items,
+                "throughput_per_s": iterations * items / elapsed,
+                "latency_ms": percentiles(latencies),
+            }
+        )
+    return _median_of_rounds(results)
+
+
+async def _measure_http(
+    path: str, requests: int, concurrency: int, warmup: int, rounds: int
+) -> dict:
+    """GET `path` `requests` times per round, `concurrency` at a time"""
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one(latencies: list):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000.0)
+
+        await asyncio.gather(*(one([]) for _ in range(warmup)))
+        for _ in range(rounds):
+            gc.collect()
+            latencies: list = []
+            started = time.perf_counter()
+            await asyncio.gather(*(one(latencies) for _ in range(requests)))
+            elapsed = time.perf_counter() - started
+            results.append(
+                {
+                    "iterations": requests,
+                    "concurrency": concurrency,
+                    "throughput_per_s": requests / elapsed,
+                    "latency_ms": percentiles(latencies),
+                }
+            )
+    return _median_of_rounds(results)
+
+
+def run_scenarios(args) -> dict:
+    from app.scripts.model_registry import get_active_bundle
+    from app.scripts.preprocess import preprocess_input
+    from app.scripts.prediction import predict, predict_batch
+    from app.scripts.explainability import predict_with_explanation
+
+    bundle = get_active_bundle()
+    inputs = random_inputs(max(args.iterations, max(args.batch_sizes)), args.seed)
+    count = len(inputs)
+    results = {}
+
+    def wanted(name: str) -> bool:
+        return name in args.scenarios
+
+    if wanted("preprocess_input"):
+        results["preprocess_input"] = _measure(
+            lambda i: preprocess_input(inputs[i % count]),
+            args.iterations,
+            args.warmup,
+            args.rounds,
+        )
+    if wanted("preprocess_array"):
+        results["preprocess_array"] = _measure(
+            lambda i: bundle.preprocessor.transform(inputs[i % count]),
+            args.iterations,
+            args.warmup,
+            args.rounds,
+        )
+    if wanted("predict"):
+        results["predict"] = _measure(
+            lambda i: predict(inputs[i % count], bundle),
+            args.iterations,
+            args.warmup,
+            args.rounds,
+        )
+    if wanted("predict_batch"):
+        for size in args.batch_sizes:
+            batch = inputs[:size]
+            results[f"predict_batch_{size}"] = _measure(
+                lambda i: predict_batch(batch, bundle),
+                args.batch_repeats,
+                1,
+                args.rounds,
+                items=size,
+            )
+    if wanted("predict_with_explanation"):
+        results["predict_with_explanation"] = _measure(
+            lambda i: predict_with_explanation(inputs[i % count]),
+            args.explain_iterations,
+            min(args.warmup, 5),
+            args.rounds,
+        )
+
+    paths = {
+        "students_list": f"/students?limit={args.page_size}",
+        "students_at_risk": f"/students/at-risk?limit={args.page_size}",
+    }
+    for name, path in paths.items():
+        if wanted(name):
+            results[name] = asyncio.run(
+                _measure_http(
+                    path, args.requests, args.concurrency, args.warmup, args.rounds
+                )
+            )
+    return results
+
+
+def compare(
+    results: dict, baseline: dict, threshold: float, min_delta_ms: float
+) -> dict:
+    """Per-scenario changes against `baseline` and the regressions among them"""
+    changes = {}
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        scenario = {}
+        for key in _LATENCY_KEYS:
+            old, new = before["latency_ms"][key], result["latency_ms"][key]
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold and new - old > min_delta_ms
+            scenario[f"latency_{key}"] = {
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regression": regressed,
+            }
+        old, new = before["throughput_per_s"], result["throughput_per_s"]
+        change = (new - old) / old if old else 0.0
+        scenario["throughput"] = {
+            "baseline": old,
+            "current": new,
+            "change": round(change, 4),
+            "regression": change < -threshold,
+        }
+        changes[name] = scenario
+        regressions += [
+            f"{name}.{metric}" for metric, row in scenario.items() if row["regression"]
+        ]
+    return {
+        "threshold": threshold,
+        "min_delta_ms": min_delta_ms,
+        "scenarios": changes,
+        "regressions": regressions,
+    }
+
+
+def _environment(args, students: int) -> dict:
+    from app.scripts.model_registry import get_active_bundle
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=BACKEND_DIR,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    bundle = get_active_bundle()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "engine": bundle.engine,
+        "model_version": bundle.model_tag(),
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "students": students,
+        "seed": args.seed,
+    }
+
+
+def _print_summary(results: dict, comparison: dict):
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        line = (
+            f"{name:<26} {result['throughput_per_s']:>12.1f}/s  "
+            f"p50 {latency['p50']:.4f}  p95 {latency['p95']:.4f}  "
+            f"p99 {latency['p99']:.4f} ms"
+        )
+        scenario = (comparison or {}).get("scenarios", {}).get(name)
+        if scenario:
+            worst = max(scenario.values(), key=lambda row: abs(row["change"]))
+            flag = (
+                "REGRESSION" if any(r["regression"] for r in scenario.values()) else ""
+            )
+            line += f"  (max change {worst['change']:+.1%}) {flag}"
+        print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=SCENARIOS,
+        default=SCENARIOS,
+        help="Scenarios to run (default: all)",
+    )
+    parser.add_argument(
+        "--engine",
+        default=os.getenv("INFERENCE_ENGINE", "numpy"),
+        help="Inference engine (default: INFERENCE_ENGINE or numpy)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=5,
+        help="Timed rounds per scenario; the median of each statistic is kept",
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--batch-repeats", type=int, default=20)
+    parser.add_argument("--explain-iterations", type=int, default=20)
+    parser.add_argument("--students", type=int, default=1000, help="Students to seed")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--output", default=None, help="JSON file (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCHMARK_REGRESSION_THRESHOLD", "0.2")),
+        help="Allowed relative slowdown (default: 0.2)",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.05,
+        help="Ignore latency increases smaller than this",
+    )
+    parser.add_argument(
+        "--no-fail", action="store_true", help="Exit 0 even when regressions are found"
+    )
+    args = parser.parse_args()
+
+    # Settings are read at import time, so set them before importing the app.
+    # Both caches are off: the suite measures the work, not cache hits.
+    os.environ["INFERENCE_ENGINE"] = args.engine
+    os.environ["PREDICTION_CACHE_ENABLED"] = "false"
+    os.environ["EXPLANATION_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("MODEL_WARMUP", "false")
+    use_local_database("ews_benchmark_suite.sqlite", fresh=True)
+    students = seed_students(args.students, args.seed)
+
+    results = run_scenarios(args)
+    report = {"environment": _environment(args, students), "scenarios": results}
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline, args.threshold, args.min_delta_ms)
+        report["comparison"] = comparison
+
+    _print_summary(results, comparison)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if comparison and comparison["regressions"]:
+        print(
+            f"Regressions beyond {args.threshold:.0%}: "
+            + ", ".join(comparison["regressions"]),
+            file=sys.stderr,
+        )
+        if not args.no_fail:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
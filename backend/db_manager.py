@@ -66,7 +66,13 @@ def check_db():
         inspector = inspect(engine)
         tables = inspector.get_table_names()
 
-        expected_tables = ["students", "prediction_logs", "batch_uploads"]
+        expected_tables = [
+            "students",
+            "prediction_logs",
+            "batch_uploads",
+            "explanation_cache",
+            "risk_rollups",
+        ]
 
         logger.info("Database tables:")
         for table in expected_tables:
@@ -81,6 +87,70 @@ def check_db():
         return False
 
 
+def rebuild_stats():
+    """Recompute the dashboard rollup table from students and prediction logs."""
+    from app.database.db import SessionLocal
+    from app.database.crud import rebuild_rollups
+
+    logger.info("Rebuilding dashboard rollups...")
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollups(db)
+        logger.info(f"Dashboard rollups rebuilt ({rows} rows)")
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to rebuild dashboard rollups: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def rescore(args):
+    """Re-score stored students with the current model."""
+    import argparse
+
+    from app.scripts.rescoring import (
+        RESCORE_CHECKPOINT_PATH,
+        RESCORE_CHUNK_SIZE,
+        RESCORE_WORKERS,
+        run_rescore,
+    )
+
+    parser = argparse.ArgumentParser(prog="db_manager.py rescore")
+    parser.add_argument("--workers", type=int, default=RESCORE_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument(
+        "--model-version",
+        default=None,
+        help="Registry version to score with (default: the active one)",
+    )
+    parser.add_argument("--checkpoint", default=RESCORE_CHECKPOINT_PATH)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Also re-score students already scored by this model version",
+    )
+    parser.add_argument(
+        "--no-resume", action="store_true", help="Ignore an existing checkpoint"
+    )
+    options = parser.parse_args(args)
+
+    try:
+        state = run_rescore(
+            model_version=options.model_version,
+            workers=options.workers,
+            chunk_size=options.chunk_size,
+            checkpoint_path=options.checkpoint,
+            force=options.force,
+            resume=not options.no_resume,
+        )
+    except KeyError as e:
+        logger.error(f"Re-score not started: {e}")
+        return False
+    return state["status"] == "completed"
+
+
 def main():
     """Main CLI interface."""
     if len(sys.argv) < 2:
@@ -90,6 +160,8 @@ def main():
         print("  reset   - Reset database (drop tables)")
         print("  check   - Check database status")
         print("  test    - Test database connection")
+        print("  rebuild-stats - Recompute the dashboard rollup table")
+        print("  rescore [--workers N] [--force] [--no-resume] - Re-score students")
         return
 
     command = sys.argv[1].lower()
@@ -105,6 +177,11 @@ def main():
             logger.info("Database connection successful!")
         else:
             logger.error("Database connection failed!")
+    elif command == "rebuild-stats":
+        rebuild_stats()
+    elif command == "rescore":
+        if not rescore(sys.argv[2:]):
+            sys.exit(1)
     else:
         logger.error(f"Unknown command: {command}")
 
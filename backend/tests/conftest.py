@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The engine is created at import time, so point it at a throwaway SQLite
+# file before anything imports app.database.db
+_db_dir = tempfile.mkdtemp(prefix="ews-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/test.db")
+os.environ.setdefault("EXPLANATION_CACHE_DB", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+from app.database import db as database
+from app.scripts import explanation_jobs
+from app.scripts.explanation_jobs import ExplanationJobManager
+from app.scripts.job_state import claim_job, load_job, save_job
+
+ACTIVE = ("starting", "running")
+
+
+def test_explanation_job_is_visible_to_other_workers(monkeypatch):
+    database.create_tables()
+    monkeypatch.setattr(
+        explanation_jobs,
+        "explain_user_input",
+        lambda user_input, bundle=None, engine=None: {"feature_impacts": []},
+    )
+
+    # Two managers stand in for two server workers
+    owner, other = ExplanationJobManager(), ExplanationJobManager()
+    try:
+        job = owner.submit({"age_at_enrollment": 20})
+        job.future.result(timeout=10)
+
+        assert other.get(job.id) is None
+        state = other.lookup(job.id)
+        assert state["status"] == "completed"
+        assert state["explanation"] == {"feature_impacts": []}
+        assert other.lookup("missing") is None
+    finally:
+        owner.shutdown()
+        other.shutdown()
+
+
+def test_only_one_worker_can_claim_a_running_job():
+    database.create_tables()
+
+    assert claim_job("claim-test", "rescore", {"status": "starting"}, ACTIVE, 600)
+    assert not claim_job("claim-test", "rescore", {"status": "starting"}, ACTIVE, 600)
+
+    save_job("claim-test", "rescore", {"status": "completed"})
+    assert claim_job("claim-test", "rescore", {"status": "starting"}, ACTIVE, 600)
+    assert load_job("claim-test", "rescore") == {"status": "starting"}
+
+    # A job nobody updated within stale_after is taken over
+    assert claim_job("claim-test", "rescore", {"status": "running"}, ACTIVE, -1)
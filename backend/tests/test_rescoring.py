@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+from app.database import db as database
+from app.models import PredictionLog, Student
+from app.scripts.rescoring import _fetch_chunk, _load_checkpoint
+
+from test_rollups import _student
+
+
+def _log(student_id, created_at):
+    return {
+        "student_id": student_id,
+        "risk_score": 0.5,
+        "risk_category": "medium",
+        "model_version": "v1",
+        "created_at": created_at,
+    }
+
+
+def test_logs_older_than_the_artifacts_do_not_count_as_scored():
+    database.drop_tables()
+    database.create_tables()
+
+    replaced_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    stale, fresh = _student("medium"), _student("medium")
+    session = database.SessionLocal()
+    try:
+        session.execute(insert(Student), [stale, fresh])
+        session.execute(
+            insert(PredictionLog),
+            [
+                _log(stale["id"], replaced_at - timedelta(days=1)),
+                _log(fresh["id"], replaced_at + timedelta(minutes=5)),
+            ],
+        )
+        session.commit()
+
+        def pending(**kwargs):
+            rows = _fetch_chunk(session, None, None, None, "v1", 100, **kwargs)
+            return {row.id for row in rows}
+
+        # Keyed on the version alone, both look done
+        assert pending(force=False) == set()
+        assert pending(force=False, scored_after=replaced_at.timestamp()) == {
+            stale["id"]
+        }
+        assert pending(force=True, scored_after=replaced_at.timestamp()) == {
+            stale["id"],
+            fresh["id"],
+        }
+    finally:
+        session.close()
+
+
+def test_checkpoint_is_discarded_when_force_or_artifacts_change(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(
+        json.dumps(
+            {
+                "status": "running",
+                "model_version": "v1",
+                "force": False,
+                "artifacts_modified_at": 100.0,
+                "partitions": [{"index": 0}, {"index": 1}],
+            }
+        )
+    )
+
+    assert _load_checkpoint(str(path), "v1", 2, False, 100.0) is not None
+    assert _load_checkpoint(str(path), "v1", 2, True, 100.0) is None
+    assert _load_checkpoint(str(path), "v1", 2, False, 200.0) is None
@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from sqlalchemy import insert
+
+from app.database import db as database
+from app.database.crud import get_risk_distribution
+from app.models import RiskRollup, Student
+
+
+def _student(risk_category):
+    return {
+        "id": uuid4(),
+        "age_at_enrollment": 20,
+        "gender": "female",
+        "total_units_approved": 10,
+        "average_grade": 12.5,
+        "total_units_evaluated": 12,
+        "total_units_enrolled": 12,
+        "previous_qualification_grade": 130,
+        "uploaded_by": "test",
+        "created_at": datetime.now(timezone.utc),
+        "risk_score": 0.5,
+        "risk_category": risk_category,
+    }
+
+
+def test_create_tables_backfills_rollups_for_existing_students():
+    database.drop_tables()
+    database.create_tables()
+
+    # A database from before the rollups: students, but no rollup rows
+    session = database.SessionLocal()
+    try:
+        session.execute(
+            insert(Student),
+            [_student("high"), _student("high"), _student("low")],
+        )
+        session.query(RiskRollup).delete()
+        session.commit()
+        assert get_risk_distribution(session)["total"] == 0
+    finally:
+        session.close()
+
+    database.create_tables()
+
+    session = database.SessionLocal()
+    try:
+        distribution = get_risk_distribution(session)
+    finally:
+        session.close()
+    counts = {
+        row["risk_category"]: row["count"] for row in distribution["distribution"]
+    }
+    assert distribution["total"] == 3
+    assert counts["high"] == 2
+    assert counts["low"] == 1
+
+
+def test_create_tables_leaves_populated_rollups_alone():
+    database.drop_tables()
+    database.create_tables()
+
+    session = database.SessionLocal()
+    try:
+        session.execute(insert(Student), [_student("medium")])
+        session.commit()
+    finally:
+        session.close()
+
+    # Rollups exist but are stale: startup must not rebuild them
+    database.create_tables()
+    session = database.SessionLocal()
+    try:
+        session.query(RiskRollup).delete()
+        session.add(
+            RiskRollup(
+                bucket_date=datetime.now(timezone.utc).date(),
+                risk_category="low",
+                student_count=5,
+                prediction_count=0,
+                risk_score_sum=0.0,
+            )
+        )
+        session.commit()
+    finally:
+        session.close()
+
+    database.create_tables()
+    session = database.SessionLocal()
+    try:
+        assert get_risk_distribution(session)["total"] == 5
+    finally:
+        session.close()
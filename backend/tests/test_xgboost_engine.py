@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import xgboost
+
+from app.scripts.engines import XGBoostEngine
+
+MODELS = Path(__file__).resolve().parents[1] / "app" / "models"
+
+# One preprocessed background row, ALL_FEATURES order
+ROW = np.array(
+    [
+        [
+            -1.5339765548706055,
+            -2.165949821472168,
+            -0.6939730644226074,
+            -2.134927749633789,
+            -2.713085651397705,
+            0.7876553535461426,
+            1.0,
+            0.0,
+            0.0,
+            0.0,
+        ]
+    ],
+    dtype=np.float32,
+)
+# Graduate probability of ROW under xgboost 3.1.0, which trained the model
+GRADUATE = 0.6187276
+
+
+def _artifact():
+    with open(MODELS / "manifest.json") as f:
+        manifest = json.load(f)
+    spec = manifest["versions"][manifest["active"]]
+    return MODELS / spec[XGBoostEngine.artifact]
+
+
+def test_shipped_xgboost_artifact_loads_with_its_base_score():
+    engine = XGBoostEngine.load(str(_artifact()))
+
+    probabilities = engine.predict_proba(ROW)
+    direct = engine.booster.inplace_predict(engine.to_model_order(ROW))
+
+    assert probabilities.shape == (1, 2)
+    np.testing.assert_allclose(probabilities[:, 1], direct, rtol=1e-6)
+    np.testing.assert_allclose(probabilities.sum(axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(probabilities[0, 1], GRADUATE, rtol=1e-5)
+
+
+def test_shipped_xgboost_artifact_matches_the_sklearn_wrapper():
+    classifier = xgboost.XGBClassifier()
+    classifier.load_model(str(_artifact()))
+    engine = XGBoostEngine.load(str(_artifact()))
+
+    np.testing.assert_allclose(
+        classifier.predict_proba(engine.to_model_order(ROW)),
+        engine.predict_proba(ROW),
+        rtol=1e-6,
+    )
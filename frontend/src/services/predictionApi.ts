@@ -18,6 +18,29 @@ export interface AtRiskStudentsResponse {
   total: number;
   skip: number;
   limit: number;
+  next_cursor?: string | null;
+}
+
+// Grid values use the backend encoding (see FormDataConverter.toBackendFormat)
+export interface SweepAxis {
+  feature: keyof PredictionInput;
+  values?: number[];
+  start?: number;
+  stop?: number;
+  step?: number;
+}
+
+export interface SweepResponse {
+  base: PredictionWithExplanationResponse["prediction"];
+  axes: { feature: keyof PredictionInput; values: number[] }[];
+  // One axis: a risk curve; two axes: rows indexed [first axis][second axis]
+  dropout_probability: number[] | number[][];
+  risk_category: string[] | string[][];
+  thresholds: { high: number; low: number };
+  points: number;
+  model_version: string;
+  engine: string;
+  explanation?: PredictionWithExplanationResponse["explanation"];
 }
 
 export class FormDataConverter {
@@ -152,6 +175,17 @@ export interface RetryOptions {
   backoffMultiplier: number;
 }
 
+// How often a pending background explanation is polled
+const EXPLANATION_POLL_INTERVAL_MS = 500;
+
+// GET /explanations/{job_id}, and the pending form of `explanation`
+interface ExplanationJobStatus {
+  job_id?: string;
+  status?: string;
+  explanation?: PredictionWithExplanationResponse["explanation"];
+  error?: string;
+}
+
 export class PredictionApiService {
   private baseUrl: string;
   private defaultTimeout: number;
@@ -233,7 +267,7 @@ export class PredictionApiService {
         const backendInput = FormDataConverter.toBackendFormat(formData);
 
         const response = await this.fetchWithTimeout(
-          `${this.baseUrl}/predict_with_xai`,
+          `${this.baseUrl}/predict_with_xai?async_explanation=true`,
           {
             method: "POST",
             headers: { "Content-Type": "application/json" },
@@ -284,7 +318,10 @@ export class PredictionApiService {
           continue;
         }
 
-        const data = await response.json();
+        const data = await this.resolveExplanation(
+          await response.json(),
+          timeout
+        );
 
         if (!FormDataConverter.validateApiResponse(data)) {
           throw new PredictionApiError(
@@ -377,6 +414,54 @@ export class PredictionApiService {
     }
   }
 
+  /**
+   * /predict_with_xai answers with the prediction right away. Unless the
+   * explanation was cached, `explanation` is a pending job
+   * ({status, job_id, status_url}); poll it until it finishes or `timeout`
+   * passes. The prediction is kept even if the explanation fails.
+   */
+  private async resolveExplanation(
+    data: unknown,
+    timeout: number
+  ): Promise<unknown> {
+    const job = (data as { explanation?: ExplanationJobStatus } | null)
+      ?.explanation;
+    if (!job?.job_id || !["pending", "running"].includes(job.status ?? "")) {
+      return data;
+    }
+
+    const deadline = Date.now() + timeout;
+    let error = "Explanation is taking longer than expected";
+    while (Date.now() < deadline) {
+      await this.delay(EXPLANATION_POLL_INTERVAL_MS);
+      try {
+        const response = await this.fetchWithTimeout(
+          `${this.baseUrl}/explanations/${job.job_id}`,
+          { method: "GET" },
+          Math.max(1, deadline - Date.now())
+        );
+        const status: ExplanationJobStatus = await response.json();
+        if (!response.ok) {
+          error = status?.error || `Explanation job failed (${response.status})`;
+          break;
+        }
+        if (status.status === "completed" || status.status === "failed") {
+          return {
+            ...(data as object),
+            explanation: status.explanation || {
+              feature_impacts: [],
+              error: status.error || "Explanation failed",
+            },
+          };
+        }
+      } catch {
+        error = "Unable to fetch the explanation";
+        break;
+      }
+    }
+    return { ...(data as object), explanation: { feature_impacts: [], error } };
+  }
+
   async healthCheck(): Promise<boolean> {
     try {
       const response = await this.fetchWithTimeout(
@@ -442,13 +527,60 @@ export class PredictionApiService {
     return await response.json();
   }
 
+  async simulateSweep(
+    formData: PredictionFormData,
+    axes: SweepAxis[],
+    explain: boolean = false
+  ): Promise<SweepResponse> {
+    const response = await this.fetchWithTimeout(
+      `${this.baseUrl}/simulate/sweep`,
+      {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          base: FormDataConverter.toBackendFormat(formData),
+          axes,
+          explain,
+        }),
+      },
+      this.defaultTimeout
+    );
+
+    let data: SweepResponse | ApiErrorResponse;
+    try {
+      data = await response.json();
+    } catch {
+      data = {
+        error: "HTTP Error",
+        message: `Sweep failed with status ${response.status}`,
+      };
+    }
+    // Invalid axes come back as an error body with status 200
+    if (!response.ok || "error" in data) {
+      const errorData = data as ApiErrorResponse;
+      throw new PredictionApiError(
+        this.getErrorMessage(errorData, response.status),
+        errorData,
+        response.status === 503 || response.status === 504
+          ? ErrorType.SERVER_ERROR
+          : ErrorType.VALIDATION_ERROR,
+        response.status === 503
+      );
+    }
+    return data;
+  }
+
   async fetchAtRiskStudents(
     skip: number = 0,
-    limit: number = 100
+    limit: number = 100,
+    cursor?: string
   ): Promise<AtRiskStudentsResponse> {
     try {
+      const query = cursor
+        ? `cursor=${encodeURIComponent(cursor)}&limit=${limit}`
+        : `skip=${skip}&limit=${limit}`;
       const response = await this.fetchWithTimeout(
-        `${this.baseUrl}/students/at-risk?skip=${skip}&limit=${limit}`,
+        `${this.baseUrl}/students/at-risk?${query}`,
         { method: "GET" },
         this.defaultTimeout
       );
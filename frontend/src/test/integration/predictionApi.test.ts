@@ -91,7 +91,7 @@ describe("PredictionApiService Integration Tests", () => {
       expect(fetchMock).toHaveBeenCalledTimes(1);
 
       expect(fetchMock).toHaveBeenCalledWith(
-        "https://ews-mcr0.onrender.com/predict_with_xai",
+        "https://ews-mcr0.onrender.com/predict_with_xai?async_explanation=true",
         expect.objectContaining({
           method: "POST",
           headers: { "Content-Type": "application/json" },
@@ -116,6 +116,75 @@ describe("PredictionApiService Integration Tests", () => {
 
       expect(result).toEqual(mockResponse);
     });
+
+    it("should poll a pending explanation job until it completes", async () => {
+      const mockFormData: PredictionFormData = {
+        age_at_enrollment: 20,
+        gender: "female",
+        total_units_approved: 15,
+        average_grade: 75,
+        total_units_evaluated: 18,
+        total_units_enrolled: 20,
+        previous_qualification_grade: 80,
+        tuition_fees_up_to_date: true,
+        scholarship_holder: false,
+        debtor: false,
+      };
+
+      const prediction = {
+        prediction: 1,
+        label: "Graduate",
+        probability: { dropout: 0.2, graduate: 0.8 },
+        risk_category: "low",
+      };
+      const explanation = {
+        feature_impacts: [
+          {
+            feature: "average_grade",
+            dropout_impact: -0.1,
+            graduate_impact: 0.1,
+            interpretation: "Protective factor",
+          },
+        ],
+      };
+
+      fetchMock
+        .mockResolvedValueOnce({
+          ok: true,
+          status: 200,
+          json: async () => ({
+            prediction,
+            explanation: {
+              status: "pending",
+              job_id: "job-1",
+              status_url: "/explanations/job-1",
+              feature_impacts: [],
+            },
+          }),
+        })
+        .mockResolvedValueOnce({
+          ok: true,
+          status: 200,
+          json: async () => ({ job_id: "job-1", status: "running" }),
+        })
+        .mockResolvedValueOnce({
+          ok: true,
+          status: 200,
+          json: async () => ({
+            job_id: "job-1",
+            status: "completed",
+            explanation,
+          }),
+        });
+
+      const result = await apiService.predictWithExplanation(mockFormData);
+
+      expect(fetchMock).toHaveBeenCalledTimes(3);
+      expect(fetchMock.mock.calls[2][0]).toBe(
+        "https://ews-mcr0.onrender.com/explanations/job-1"
+      );
+      expect(result).toEqual({ prediction, explanation });
+    });
   });
 
   describe("createStudentWithPrediction", () => {
@@ -112,6 +112,7 @@ interface StudentsResponse {
   total: number;
   skip: number;
   limit: number;
+  next_cursor?: string | null;
 }
 
 export default function StudentsView() {